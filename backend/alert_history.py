@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import logging
+import threading
+import clock
+
+logger = logging.getLogger(__name__)
+
+# --- HISTORY SETTINGS ---
+ALERT_HISTORY_RETENTION = int(os.getenv('ALERT_HISTORY_RETENTION', '86400'))  # ids older than this are pruned
+ALERT_HISTORY_PRUNE_SECONDS = 3600
+
+
+class AlertHistory:
+    """
+    alert_history held in a dict (runner_key -> (last_alert_time, last_edge,
+    last_book_price, last_lay_price)) so dedupe checks never touch SQLite.
+    record() only marks the entry dirty; flush() writes the cycle's sends in one
+    transaction on a single long-lived WAL connection. Entries older than the
+    retention window are pruned from both.
+    """
+
+    def __init__(self, path, retention=ALERT_HISTORY_RETENTION):
+        self.path = path
+        self.retention = retention
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS alert_history (
+                id TEXT PRIMARY KEY,
+                last_alert_time REAL,
+                last_edge REAL,
+                last_book_price REAL,
+                last_lay_price REAL
+            )
+        ''')
+        self.conn.commit()
+        self.entries = {row[0]: row[1:] for row in self.conn.execute('SELECT * FROM alert_history')}
+        self.dirty = set()
+        self.last_prune = 0
+        self.prune()
+
+    def get(self, runner_key):
+        return self.entries.get(runner_key)
+
+    def record(self, runner_key, edge, book_price, lay_price, now=None):
+        with self.lock:
+            self.entries[runner_key] = (now or clock.now(), edge, book_price, lay_price)
+            self.dirty.add(runner_key)
+
+    def count_since(self, ts):
+        with self.lock:
+            return sum(1 for entry in self.entries.values() if entry[0] > ts)
+
+    def flush(self):
+        """Writes entries recorded since the last flush. Returns rows written (0 on error: they stay dirty)."""
+        with self.lock:
+            if not self.dirty:
+                return 0
+            rows = [(key,) + self.entries[key] for key in self.dirty if key in self.entries]
+            try:
+                with self.conn:
+                    self.conn.executemany('''
+                        INSERT OR REPLACE INTO alert_history
+                        (id, last_alert_time, last_edge, last_book_price, last_lay_price)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', rows)
+            except Exception as e:
+                logger.error(f"❌ DB Write Failed! Alerts may duplicate after a restart. Error: {e}")
+                return 0
+            self.dirty.clear()
+            logger.info(f"✅ {len(rows)} alerts saved to memory")
+            return len(rows)
+
+    def prune(self, now=None):
+        """Drops ids whose last alert is past the retention window (at most once per ALERT_HISTORY_PRUNE_SECONDS)."""
+        now = now or clock.now()
+        if now - self.last_prune < ALERT_HISTORY_PRUNE_SECONDS:
+            return 0
+        cutoff = now - self.retention
+        with self.lock:
+            self.last_prune = now
+            expired = [key for key, entry in self.entries.items() if entry[0] < cutoff]
+            for key in expired:
+                del self.entries[key]
+                self.dirty.discard(key)
+            try:
+                with self.conn:
+                    self.conn.execute('DELETE FROM alert_history WHERE last_alert_time < ?', (cutoff,))
+            except Exception as e:
+                logger.error(f"DB Prune Error: {e}")
+        return len(expired)
@@ -0,0 +1,91 @@
+import math
+from datetime import datetime
+
+import clock
+from subscriptions import BOOKMAKER_COLUMNS
+
+# --- SCAN SETTINGS ---
+START_CACHE_MAX = 10000   # parsed start_time strings kept (a few hundred distinct in practice)
+
+
+def _price(value):
+    return float(value or 0)
+
+
+class SteamerScanner:
+    """
+    Applies the steamer gates (volume, not started, exchange spread, bookmaker
+    price advantage) and the commission-adjusted edge to a batch of
+    market_feed-shaped rows, cheapest gates first.
+
+    Each bookmaker's price is gated on its own. scan() returns one hit per
+    row with at least one bookmaker through, in row order:
+    (index, back_price, lay_price, spread_pct, books), books being
+    [(bookmaker, book_price, edge, price_diff_pct)] best price first (ties in
+    BOOKMAKER_COLUMNS order). A plain loop: pulling values out of the row
+    dicts is most of the cost, so NumPy columns built per scan don't pay off
+    (bench_alert_scanner.py).
+    """
+
+    def __init__(self, min_volume, max_spread, min_price_advantage, commission, edge_threshold):
+        self.min_volume = min_volume
+        self.max_spread = max_spread
+        self.min_price_advantage = min_price_advantage
+        self.commission = commission
+        self.edge_threshold = edge_threshold
+        self.start_epochs = {}   # start_time string -> epoch (nan if unparseable / naive)
+
+    def start_epoch(self, start_time_str):
+        epoch = self.start_epochs.get(start_time_str)
+        if epoch is None:
+            try:
+                start_dt = datetime.fromisoformat(start_time_str.replace("Z", "+00:00"))
+                # Naive times can't be compared with an aware now: they pass the start gate
+                epoch = start_dt.timestamp() if start_dt.tzinfo else math.nan
+            except Exception:
+                epoch = math.nan
+            if len(self.start_epochs) >= START_CACHE_MAX:
+                self.start_epochs.clear()
+            self.start_epochs[start_time_str] = epoch
+        return epoch
+
+    def edge(self, book_odds, lay_odds):
+        if not book_odds or not lay_odds or book_odds <= 1.01 or lay_odds <= 1.01:
+            return -1.0
+        implied_back = 1.0 / book_odds
+        implied_lay_net = 1.0 / (lay_odds * (1.0 - self.commission))
+        return implied_lay_net - implied_back
+
+    def scan(self, rows, now=None):
+        now = (now or clock.now_utc()).timestamp()
+        hits = []
+        for i, row in enumerate(rows):
+            if row.get('market_status') != 'OPEN' or row.get('in_play'): continue
+
+            vol = row.get('volume')
+            if vol is None or vol < self.min_volume: continue
+
+            start_time_str = row.get('start_time')
+            if start_time_str and now >= self.start_epoch(start_time_str): continue   # nan never compares
+
+            lay_price = _price(row.get('lay_price'))
+            back_price = _price(row.get('back_price'))
+
+            if back_price <= 1.01 or lay_price <= 1.01: continue
+
+            spread_pct = (lay_price - back_price) / back_price
+            if spread_pct > self.max_spread: continue
+
+            books = []
+            for bookmaker, column in BOOKMAKER_COLUMNS.items():
+                book_price = _price(row.get(column))
+                price_diff_pct = (book_price - lay_price) / lay_price
+                if price_diff_pct < self.min_price_advantage: continue
+
+                edge = self.edge(book_price, lay_price)
+                if edge >= self.edge_threshold:
+                    books.append((bookmaker, book_price, edge, price_diff_pct))
+            if books:
+                books.sort(key=lambda b: -b[1])   # stable: ties keep column order
+                hits.append((i, back_price, lay_price, spread_pct, books))
+        return hits
@@ -0,0 +1,349 @@
+import os
+import sys
+import math
+import time
+import random
+from datetime import datetime, timezone, timedelta
+from itertools import repeat
+from operator import itemgetter
+
+# Local benchmark for SteamerScanner on synthetic market_feed rows: the original
+# per-row gates vs the shipped loop vs NumPy columns kept by the RowStore (re-read
+# per changed row, not shipped), checking all three return identical hits (the
+# scanner's best-priced bookmaker against the original max-price gates) and that
+# every bookmaker through carries its own price and edge. Then the engine's alert
+# path over 20 cycles of price moves, where the columns also pay for their syncs.
+# Usage: python backend/bench_alert_scanner.py [rows ...]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+import numpy as np
+
+from alert_scanner import SteamerScanner
+from row_store import RowStore
+from subscriptions import BOOKMAKER_COLUMNS
+
+# Same gates as telegram_alerts defaults (imported directly it would need the Telegram env)
+GATES = dict(min_volume=200.0, max_spread=0.04, min_price_advantage=0.02, commission=0.02, edge_threshold=0.003)
+
+# ==========================================
+# SYNTHETIC ROWS
+# ==========================================
+def make_rows(n_rows, now, seed=11):
+    rng = random.Random(seed)
+    starts = [(now + timedelta(minutes=m)).isoformat().replace("+00:00", "Z") for m in range(-120, 2880, 15)]
+    starts += ["", None, "not-a-date", "2030-01-01T00:00:00"]   # missing, bad and naive start times
+    rows = []
+    for i in range(n_rows):
+        back = round(rng.uniform(1.0, 6.0), 2)
+        lay = round(back * rng.uniform(1.0, 1.06), 2)
+        book = lay * rng.uniform(0.9, 1.06)
+        rows.append({
+            'market_id': f"1.{i // 2}",
+            'selection_id': i,
+            'runner_name': f"R{i}",
+            'market_status': 'OPEN' if rng.random() < 0.95 else 'SUSPENDED',
+            'in_play': rng.random() < 0.05,
+            'volume': None if rng.random() < 0.05 else rng.uniform(0, 5000),
+            'start_time': rng.choice(starts),
+            'back_price': back if rng.random() < 0.97 else None,
+            'lay_price': lay,
+            'price_paddy': round(book, 2) if rng.random() < 0.8 else None,
+            'price_bet365': round(book * rng.uniform(0.97, 1.03), 2) if rng.random() < 0.8 else 0,
+        })
+    return rows
+
+# ==========================================
+# REFERENCE (ORIGINAL) IMPLEMENTATION
+# ==========================================
+def _price(value):
+    return float(value or 0)
+
+def scan_loop(scanner, rows, now):
+    hits = []
+    for i, row in enumerate(rows):
+        if row.get('market_status') != 'OPEN' or row.get('in_play'): continue
+
+        vol = row.get('volume')
+        if vol is None or vol < scanner.min_volume: continue
+
+        start_time_str = row.get('start_time')
+        if start_time_str:
+            try:
+                start_dt = datetime.fromisoformat(start_time_str.replace("Z", "+00:00"))
+                if now >= start_dt: continue
+            except: pass
+
+        p_paddy = _price(row.get('price_paddy'))
+        p_ladbrokes = _price(row.get('price_bet365'))
+        book_price = max(p_paddy, p_ladbrokes)
+        lay_price = _price(row.get('lay_price'))
+        back_price = _price(row.get('back_price'))
+
+        if back_price <= 1.01 or lay_price <= 1.01: continue
+
+        spread_pct = (lay_price - back_price) / back_price
+        if spread_pct > scanner.max_spread: continue
+
+        price_diff_pct = (book_price - lay_price) / lay_price
+        if price_diff_pct < scanner.min_price_advantage: continue
+
+        edge = scanner.edge(book_price, lay_price)
+        if edge >= scanner.edge_threshold:
+            hits.append((i, book_price, back_price, lay_price, edge, price_diff_pct, p_paddy >= p_ladbrokes))
+    return hits
+
+def best_book(hits):
+    """Scanner hits in the original shape: the best-priced bookmaker only."""
+    return [(i, books[0][1], back_price, lay_price, books[0][2], books[0][3], books[0][0] == 'paddypower')
+            for i, back_price, lay_price, _, books in hits]
+
+def check_books(scanner, rows, hits):
+    """Each listed bookmaker passes the gates at its own price; each unlisted one fails them."""
+    for i, _, lay_price, _, books in hits:
+        listed = {name: (price, edge) for name, price, edge, _ in books}
+        for name, column in BOOKMAKER_COLUMNS.items():
+            price = float(rows[i].get(column) or 0)
+            edge = scanner.edge(price, lay_price)
+            passes = (price - lay_price) / lay_price >= scanner.min_price_advantage and edge >= scanner.edge_threshold
+            if passes != (name in listed) or (passes and listed[name] != (price, edge)):
+                return False
+    return True
+
+# ==========================================
+# PERSISTENT NUMPY COLUMNS (NOT SHIPPED)
+# ==========================================
+COLUMN_FIELDS = ('live', 'volume', 'start', 'back_price', 'lay_price', *BOOKMAKER_COLUMNS.values())
+PRICE_FIELDS = COLUMN_FIELDS[3:]
+_row_key = itemgetter('market_id', 'runner_name')
+
+class FeedColumns:
+    """
+    The gated columns of every stored row as one float matrix, a slot per
+    (market_id, runner_name). The store marks rows whose content changed;
+    sync() re-reads just those in one batch, so a scan never walks row dicts.
+    """
+    def __init__(self, scanner, capacity=1024):
+        self.scanner = scanner
+        self.data = np.zeros((capacity, len(COLUMN_FIELDS)))
+        self.slots = {}             # feed key -> row of data
+        self.free = []
+        self.size = 0
+        self.stale = set()
+
+    def sync(self, rows):
+        slots, values = [], []
+        for key in self.stale:
+            row = rows.get(key)
+            if row is None:
+                slot = self.slots.pop(key, None)
+                if slot is not None:
+                    self.free.append(slot)
+                continue
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self._allocate(key)
+            slots.append(slot)
+            values.append(self._values(row))
+        self.stale = set()
+        if slots:
+            self.data[np.array(slots, dtype=np.intp)] = np.array(values, dtype=float)
+
+    def _allocate(self, key):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.size
+            self.size += 1
+            if slot >= len(self.data):
+                self.data = np.concatenate([self.data, np.zeros_like(self.data)])
+        self.slots[key] = slot
+        return slot
+
+    def _values(self, row):
+        get = row.get
+        start_time_str = get('start_time')
+        volume = get('volume')
+        return [1.0 if get('market_status') == 'OPEN' and not get('in_play') else 0.0,
+                math.nan if volume is None else float(volume),
+                self.scanner.start_epoch(start_time_str) if start_time_str else math.nan,
+                *[float(get(field) or 0) for field in PRICE_FIELDS]]
+
+class ColumnarStore(RowStore):
+    """RowStore that marks content changes (and prunes) for its FeedColumns."""
+    def __init__(self, scanner):
+        super().__init__(None)
+        self.columns = FeedColumns(scanner)
+
+    def update(self, row):
+        super().update(row)
+        key = (row.get('market_id'), row.get('runner_name'))
+        if key in self.changed:
+            self.columns.stale.add(key)
+
+    def prune(self, live):
+        self.columns.stale.update(k for k, row in self.rows.items() if not live(row))
+        super().prune(live)
+
+    def sync_columns(self):
+        with self.lock:
+            self.columns.sync(self.rows)
+        return self.columns
+
+def scan_columns(scanner, rows, now, columns):
+    """SteamerScanner.scan over the synced columns of rows: one mask, Python work only for the hits."""
+    if not rows:
+        return []
+    now = now.timestamp()
+    idx = np.fromiter(map(columns.slots.get, map(_row_key, rows), repeat(-1)), dtype=np.intp, count=len(rows))
+    live, vol, start, back, lay, *prices = columns.data[idx].T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread_pct = (lay - back) / back
+        mask = ((idx >= 0) & (live > 0) & (vol >= scanner.min_volume) & ~(now >= start)
+                & (back > 1.01) & (lay > 1.01) & ~(spread_pct > scanner.max_spread))
+        implied_lay_net = 1.0 / (lay * (1.0 - scanner.commission))
+        books = []
+        for price in prices:
+            price_diff_pct = (price - lay) / lay
+            edge = np.where(price > 1.01, implied_lay_net - 1.0 / price, -1.0)
+            books.append((~(price_diff_pct < scanner.min_price_advantage) & (edge >= scanner.edge_threshold),
+                          price, edge, price_diff_pct))
+    mask &= np.logical_or.reduce([through for through, _, _, _ in books])
+
+    hit_idx = np.flatnonzero(mask)
+    per_book = [(name, ok[hit_idx].tolist(), price[hit_idx].tolist(), edge[hit_idx].tolist(), diff[hit_idx].tolist())
+                for name, (ok, price, edge, diff) in zip(BOOKMAKER_COLUMNS, books)]
+    hits = []
+    for n, (i, back_price, lay_price, spread) in enumerate(zip(hit_idx.tolist(), back[hit_idx].tolist(),
+                                                                lay[hit_idx].tolist(), spread_pct[hit_idx].tolist())):
+        through = sorted(((name, price[n], edge[n], diff[n]) for name, ok, price, edge, diff in per_book if ok[n]),
+                         key=lambda b: -b[1])
+        hits.append((i, back_price, lay_price, spread, through))
+    return hits
+
+# ==========================================
+# ENGINE WORKLOAD
+# ==========================================
+def price_moves(rows, cycle, rng, share=0.2):
+    """What a poll + spy cycle does to the store: ~share of rows move, a few suspend / go in play."""
+    moves = []
+    for row in rng.sample(rows, int(len(rows) * share)):
+        back = round(rng.uniform(1.0, 6.0), 2)
+        lay = round(back * rng.uniform(1.0, 1.06), 2)
+        book = lay * rng.uniform(0.9, 1.06)
+        moves.append({'market_id': row['market_id'], 'runner_name': row['runner_name'],
+                      'back_price': back, 'lay_price': lay, 'volume': rng.uniform(0, 5000),
+                      'price_paddy': round(book, 2), 'price_bet365': round(book * rng.uniform(0.97, 1.03), 2),
+                      'market_status': 'OPEN' if rng.random() < 0.98 else 'SUSPENDED',
+                      'last_updated': f"cycle {cycle}"})
+    return moves
+
+def run_workload(rows, now, cycles=20, rescan_every=10):
+    """
+    The engine's alert path on two RowStores fed the same updates: changed rows
+    scanned every cycle, every row every rescan_every cycles (ALERT_RESCAN_SECONDS
+    over the 6s poll), with a prune + relist in the middle. The columnar side
+    pays for marking rows on update and for sync_columns() before each scan.
+    """
+    scanner = SteamerScanner(**GATES)
+    plain, columnar = RowStore(None), ColumnarStore(scanner)
+    rng = random.Random(5)
+    timings = {'update_plain': 0.0, 'update_columns': 0.0, 'scan_loop': 0.0, 'sync': 0.0, 'scan_columns': 0.0}
+    scanned = hits = 0
+
+    def clocked(name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[name] += time.perf_counter() - started
+        return result
+
+    clocked('update_plain', plain.update_many, rows)
+    clocked('update_columns', columnar.update_many, rows)
+    for cycle in range(cycles):
+        if cycle == cycles // 2:
+            # Markets leave the catalogue; as many new ones are listed (slots are reused)
+            gone = {row['market_id'] for row in rng.sample(rows, len(rows) // 20)}
+            for store in (plain, columnar):
+                store.prune(lambda row: row['market_id'] not in gone)
+            listed = [dict(row, market_id=f"2.{cycle}.{row['market_id']}") for row in rows if row['market_id'] in gone]
+            clocked('update_plain', plain.update_many, listed)
+            clocked('update_columns', columnar.update_many, listed)
+            rows = [row for row in rows if row['market_id'] not in gone] + listed
+
+        moves = price_moves(rows, cycle, rng)
+        clocked('update_plain', plain.update_many, moves)
+        clocked('update_columns', columnar.update_many, moves)
+
+        full = cycle % rescan_every == 0
+        batches = [store.all_rows() if full else store.take_changed() for store in (plain, columnar)]
+        if full:
+            plain.take_changed(), columnar.take_changed()
+        expected = clocked('scan_loop', scanner.scan, batches[0], now)
+        columns = clocked('sync', columnar.sync_columns)
+        got = clocked('scan_columns', scan_columns, scanner, batches[1], now, columns)
+        if got != expected:
+            print(f"❌ Columnar hits differ from the loop in cycle {cycle}")
+            return None
+        scanned += len(batches[0])
+        hits += len(got)
+    return timings, scanned, hits
+
+# ==========================================
+# RUN
+# ==========================================
+def timed(fn, rows, now, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hits = fn(rows, now)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return hits, best
+
+def run_bench(sizes=(10000, 100000), repeat=3):
+    now = datetime.now(timezone.utc)
+    for n_rows in sizes:
+        rows = make_rows(n_rows, now)
+        scanner = SteamerScanner(**GATES)
+        store = ColumnarStore(scanner)
+        store.update_many(rows)
+        started = time.perf_counter()
+        columns = store.sync_columns()
+        load_time = time.perf_counter() - started
+
+        ref_hits, ref_time = timed(lambda r, t: scan_loop(scanner, r, t), rows, now, repeat)
+        hits, scan_time = timed(scanner.scan, rows, now, repeat)
+        col_hits, col_time = timed(lambda r, t: scan_columns(scanner, r, t, columns), rows, now, repeat)
+
+        print(f"📊 {n_rows} rows -> {len(hits)} hits ({sum(len(h[4]) > 1 for h in hits)} through at both bookmakers)")
+        print(f"   original loop   {ref_time * 1000:8.1f}ms  ({n_rows / ref_time:,.0f} rows/s)")
+        print(f"   SteamerScanner  {scan_time * 1000:8.1f}ms  (x{ref_time / scan_time:.1f}, per-row loop)")
+        print(f"   numpy columns   {col_time * 1000:8.1f}ms  (x{ref_time / col_time:.1f}; "
+              f"first sync of every row {load_time * 1000:.1f}ms)")
+        if best_book(hits) != ref_hits or col_hits != hits:
+            print("❌ Scanner hits differ from the original loop")
+            return 1
+        if not check_books(scanner, rows, hits):
+            print("❌ A bookmaker's own price/edge was not gated on its own")
+            return 1
+
+        result = run_workload(rows, now)
+        if result is None:
+            return 1
+        timings, scanned, n_hits = result
+        loop_total = timings['update_plain'] + timings['scan_loop']
+        col_total = timings['update_columns'] + timings['sync'] + timings['scan_columns']
+        print(f"   engine, 20 cycles ({scanned} rows scanned, {n_hits} hits): "
+              f"loop {timings['scan_loop'] * 1000:.1f}ms scanning; columns {timings['sync'] * 1000:.1f}ms sync + "
+              f"{timings['scan_columns'] * 1000:.1f}ms scanning, "
+              f"+{(timings['update_columns'] - timings['update_plain']) * 1000:.1f}ms on store updates")
+        print(f"   engine total (updates + alert path): loop {loop_total * 1000:.1f}ms, "
+              f"columns {col_total * 1000:.1f}ms (x{loop_total / col_total:.2f})")
+
+    print("✅ SteamerScanner and the columnar scan match the original per-row loop")
+    return 0
+if __name__ == "__main__":
+    sizes = tuple(int(a) for a in sys.argv[1:]) or (10000, 100000)
+    sys.exit(run_bench(sizes))
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import random
+import threading
+
+# Local benchmark for BookDispatcher against a stubbed betting endpoint with injected latency.
+# Usage: python backend/bench_book_dispatch.py [markets] [latency_ms] [workers]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from book_dispatcher import BookDispatcher, MAX_REQUEST_WEIGHT, plan_batches, request_weight
+
+# ==========================================
+# STUB ENDPOINT
+# ==========================================
+class StubBook:
+    def __init__(self, market_id):
+        self.market_id = market_id
+        self.total_matched = random.Random(market_id).randint(0, 50000)
+
+class StubBetting:
+    """Stands in for trading.betting: sleeps per call and enforces the weight limit."""
+    def __init__(self, latency, jitter=0.0, fail_every=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_every = fail_every
+        self.calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def list_market_book(self, market_ids, price_projection=None):
+        weight = request_weight(price_projection.get('priceData', []) if price_projection else [])
+        if weight * len(market_ids) > MAX_REQUEST_WEIGHT:
+            raise ValueError(f"TOO_MUCH_DATA: {weight * len(market_ids)} > {MAX_REQUEST_WEIGHT}")
+
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+            if self.fail_every and call_no % self.fail_every == 0:
+                raise ConnectionError("stub: injected failure")
+            return [StubBook(m_id) for m_id in market_ids]
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+# ==========================================
+# RUN
+# ==========================================
+def run_bench(markets=500, latency=0.12, workers=4):
+    price_data = ['EX_BEST_OFFERS', 'EX_TRADED']
+    projection = {'priceData': price_data, 'virtualise': True}
+    market_ids = [f"1.{200000000 + i}" for i in range(markets)]
+    batches = plan_batches(market_ids, request_weight(price_data))
+
+    print(f"📦 {markets} markets -> {len(batches)} requests (weight {request_weight(price_data)}/market)")
+
+    baseline = None
+    for n in (1, workers):
+        stub = StubBetting(latency, jitter=latency / 2)
+        dispatcher = BookDispatcher(workers=n)
+        results = dispatcher.fetch(stub, batches, projection)
+        ids = [[b.market_id for b in books] for books in results]
+        print(f"   workers={n}: {dispatcher.last_latency:.2f}s (max in flight {stub.max_in_flight})")
+        if baseline is None:
+            baseline = ids
+        elif ids != baseline:
+            print("❌ Concurrent results differ from serial order")
+            return 1
+
+    stub = StubBetting(latency, fail_every=7)
+    results = BookDispatcher(workers=workers).fetch(stub, batches, projection)
+    failed = sum(1 for r in results if r is None)
+    print(f"   injected failures: {failed} batches dropped, {len(results) - failed} kept in order")
+    print("✅ Concurrent results match serial order")
+    return 0
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    markets = int(args[0]) if len(args) > 0 else 500
+    latency = args[1] / 1000 if len(args) > 1 else 0.12
+    workers = int(args[2]) if len(args) > 2 else 4
+    sys.exit(run_bench(markets, latency, workers))
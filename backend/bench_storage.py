@@ -0,0 +1,224 @@
+import os
+import sys
+import time
+import random
+import logging
+
+# Local check of the storage layer against local_postgrest.LocalPostgrest: the
+# LocalPostgrest builder and the real postgrest-py client (served from SQLite)
+# leave identical tables and reads for the engine's query shapes, RowStore's
+# grouped batches keep every column where a mixed batch NULLs them, and keyset
+# pagination reads past db-max-rows. Then requests / rows / time with injected
+# latency for batch sizes, change-only vs full writes, and page sizes.
+# Usage: python backend/bench_storage.py [rows] [latency_ms] [cycles]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from local_postgrest import LocalPostgrest
+from row_store import RowStore
+from feed_reader import iter_feed_rows, SPY_COLUMNS, ALERT_COLUMNS
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Unchanged rows keep their last written last_updated (FeedWriter), so it is not compared
+STORE_COLUMNS = ('sport', 'market_id', 'event_name', 'runner_name', 'competition', 'back_price', 'lay_price',
+                 'volume', 'start_time', 'in_play', 'market_status', 'price_pinnacle', 'price_bet365', 'price_paddy')
+
+# ==========================================
+# PRODUCERS
+# ==========================================
+def exchange_rows(n_rows, cycle, rng):
+    rows = []
+    for i in range(n_rows):
+        # ~20% of rows move each cycle; every 7th market goes in play from cycle 3
+        price = round(2.0 + (cycle if rng.random() < 0.2 else 0) * 0.01 + i * 0.001, 3)
+        market = i // 2
+        rows.append({'sport': 'NFL' if market % 2 else 'NBA', 'market_id': f"1.{market}",
+                     'event_name': f"Home {market} v Away {market}", 'runner_name': f"R{i % 2}",
+                     'competition': 'League', 'back_price': price, 'lay_price': round(price + 0.02, 3),
+                     'volume': float(1000 + i), 'start_time': f"2026-10-16T{18 + market % 5}:00:00+00:00",
+                     'in_play': market % 7 == 0 and cycle >= 3,
+                     'market_status': 'OPEN', 'last_updated': f"2026-10-16T12:00:{cycle:02d}+00:00"})
+    return rows
+
+def spy_rows(n_rows, cycle):
+    # Bookmaker columns for every third runner (the rest never matched)
+    return [{'market_id': f"1.{i // 2}", 'runner_name': f"R{i % 2}", 'price_pinnacle': round(2.1 + cycle * 0.01, 2),
+             'price_bet365': 2.05, 'price_paddy': None if i % 6 == 0 else 2.0}
+            for i in range(0, n_rows, 3)]
+
+def run_feed(db, n_rows, cycles, batch_size=200, full=False):
+    """The engine's market_feed writes; full=True re-sends every row every cycle instead of changes only."""
+    store = RowStore(db, batch_size=batch_size, flush_seconds=0)
+    rng = random.Random(7)
+    for cycle in range(cycles):
+        update_time = f"2026-10-16T12:00:{cycle:02d}+00:00"
+        store.update_many(exchange_rows(n_rows, cycle, rng))
+        store.update_many(spy_rows(n_rows, cycle))
+        if cycle == cycles - 1:
+            store.set_status([f"1.{m}" for m in range(0, n_rows // 2, 5)], 'CLOSED')
+        if full:
+            rows = store.all_rows()
+            for batch in store._batches(rows):
+                db.table('market_feed').upsert(batch, on_conflict='market_id, runner_name').execute()
+            store.dirty = set()
+        else:
+            store.flush(update_time=update_time)
+    return store
+
+def run_reads(db):
+    """The engine's market_feed reads plus a snapshot insert and retention delete."""
+    reads = {
+        'spy': list(iter_feed_rows(db, SPY_COLUMNS, filters=[('neq', 'market_status', 'CLOSED')])),
+        'alerts': list(iter_feed_rows(db, ALERT_COLUMNS, filters=[('eq', 'in_play', False)], page_size=300)),
+        'markets': db.table('market_feed').select('market_id,runner_name,back_price')
+                     .in_('market_id', ['1.1', '1.2', '1.404']).order('price_paddy', desc=True)
+                     .order('id').execute().data,
+    }
+    snapshots = [{'selection_key': f"1.{i}|R0", 'ts': f"2026-10-16T12:{i % 60:02d}:00.250000+00:00",
+                  'market_id': f"1.{i}", 'back_price': 2.0 + i / 100, 'mid_price': 2.01} for i in range(120)]
+    db.table('market_snapshots').insert(snapshots).execute()
+    reads['retention'] = db.table('market_snapshots').delete().lt('ts', '2026-10-16T12:30:00Z').execute().data
+    reads['closed'] = db.table('market_feed').update({'market_status': 'CLOSED'}).lte(
+        'start_time', '2026-10-16 19:00:00+00:00').neq('market_status', 'CLOSED').execute().data
+    return reads
+
+def strip(rows, drop=('id',)):
+    return [{k: v for k, v in row.items() if k not in drop} for row in rows]
+
+# ==========================================
+# CHECKS
+# ==========================================
+def check_equivalence(n_rows, cycles):
+    """Same workload through the builder stand-in and through the real client: same tables, same reads."""
+    builder = LocalPostgrest(':memory:', seed=0)
+    http = LocalPostgrest(':memory:', seed=0)
+    client = http.rest_client()
+
+    stores = [run_feed(builder, n_rows, cycles), run_feed(client, n_rows, cycles)]
+    expected = sorted((tuple(row.get(c) for c in STORE_COLUMNS) for row in stores[0].all_rows()),
+                      key=lambda r: (r[1], r[3]))
+    for label, db in (('builder', builder), ('client', http)):
+        table = sorted((tuple(row[c] for c in STORE_COLUMNS) for row in db.dump('market_feed')),
+                       key=lambda r: (r[1], r[3]))
+        if table != expected:
+            diff = sum(1 for a, b in zip(table, expected) if a != b) + abs(len(table) - len(expected))
+            print(f"❌ {label}: market_feed differs from the RowStore in {diff} rows")
+            return 1
+
+    reads = [run_reads(builder), run_reads(client)]
+    for name in reads[0]:
+        if reads[0][name] != reads[1][name]:
+            print(f"❌ '{name}' differs between the builder and the real client")
+            return 1
+    for name in ('market_feed', 'market_snapshots'):
+        if builder.dump(name) != http.dump(name):
+            print(f"❌ {name} differs between the builder and the real client after reads/writes")
+            return 1
+    print(f"   equivalence: {len(expected)} rows = RowStore, "
+          f"{', '.join(f'{k} {len(v)}' for k, v in reads[0].items())} identical via builder and client")
+
+    # One request per column set: a mixed batch NULLs the columns a row lacks
+    key = {'market_id': '1.1', 'runner_name': 'R1'}
+    before = [r for r in http.dump('market_feed') if r['market_id'] == '1.1' and r['runner_name'] == 'R1'][0]
+    mixed = [dict(key, back_price=3.3), {'market_id': '1.3', 'runner_name': 'R1', 'price_pinnacle': 2.5}]
+    if len(stores[0]._batches(mixed)) != 2:
+        print("❌ RowStore put rows with different column sets into one batch")
+        return 1
+    client.table('market_feed').upsert(mixed, on_conflict='market_id, runner_name').execute()
+    after = [r for r in http.dump('market_feed') if r['market_id'] == '1.1' and r['runner_name'] == 'R1'][0]
+    if before['price_pinnacle'] is None or after['price_pinnacle'] is not None:
+        print("❌ Mixed-key upsert did not NULL the missing columns (PostgREST does)")
+        return 1
+    print("   mixed column sets: one request NULLs missing columns; RowStore sends one batch per column set")
+    return 0
+
+def check_pagination(n_rows, max_rows=1000):
+    db = LocalPostgrest(':memory:', max_rows=max_rows, seed=0)
+    client = db.rest_client()
+    run_feed(db, n_rows, 1, batch_size=500)
+    total = len(db.dump('market_feed'))
+    single = len(client.table('market_feed').select('id').execute().data)
+    paged = {size: len(list(iter_feed_rows(client, ['market_id'], page_size=size)))
+             for size in (max_rows // 4, max_rows, max_rows * 5)}
+    if total > max_rows and single != max_rows:
+        print(f"❌ Single select returned {single} rows, expected the {max_rows} cap")
+        return 1
+    if any(n != total for n in paged.values()):
+        print(f"❌ Keyset pagination lost rows under the {max_rows} cap: {paged} of {total}")
+        return 1
+    print(f"   pagination: single select {single}/{total} rows (max_rows {max_rows}); "
+          f"keyset pages {', '.join(str(s) for s in paged)} read all {total}")
+    return 0
+
+# ==========================================
+# BENCHMARKS
+# ==========================================
+def timed(db, work):
+    started = time.time()
+    result = work()
+    return result, time.time() - started, sum(db.requests.values()), sum(db.rows_sent.values())
+
+def bench_writes(n_rows, cycles, latency):
+    print(f"🐢 market_feed writes: {n_rows} rows, {cycles} cycles, {latency * 1000:.0f}ms per request")
+    tables = {}
+    for label, batch_size, full in (('batch 50', 50, False), ('batch 200', 200, False), ('batch 500', 500, False),
+                                    ('full rewrite 200', 200, True)):
+        db = LocalPostgrest(':memory:', latency=latency, row_latency=latency / 2000, seed=0)
+        _, elapsed, requests, sent = timed(db, lambda: run_feed(db, n_rows, cycles, batch_size, full))
+        # Insert order (ids) follows the batching, so rows are compared on their natural key
+        tables[label] = sorted(strip(db.dump('market_feed'), drop=('id', 'last_updated')),
+                               key=lambda r: (r['market_id'], r['runner_name']))
+        print(f"   {label:<17} {requests:>5} requests {sent:>7} rows sent {elapsed:>6.2f}s")
+    if any(t != tables['batch 200'] for t in tables.values()):
+        print("❌ Batch size / change-only writes changed the final market_feed")
+        return 1
+    return 0
+
+def bench_reads(n_rows, latency, max_rows=1000):
+    print(f"🐢 market_feed reads: {latency * 1000:.0f}ms per request, max_rows {max_rows}")
+    db = LocalPostgrest(':memory:', max_rows=max_rows, seed=0)
+    run_feed(db, n_rows, 1, batch_size=500)
+    db.latency, db.row_latency = latency, latency / 2000
+    expected = [{c: row[c] for c in SPY_COLUMNS} for row in db.dump('market_feed')]
+
+    def offset_pages(size):
+        rows, start = [], 0
+        while True:
+            page = db.table('market_feed').select(','.join(SPY_COLUMNS)).order('id').range(start, start + size - 1) \
+                .execute().data
+            if not page:
+                return rows
+            rows.extend(page)
+            start += len(page)
+
+    for size in (250, max_rows, max_rows * 5):
+        for label, read in (('keyset', lambda: list(iter_feed_rows(db, SPY_COLUMNS, page_size=size))),
+                            ('offset', lambda: offset_pages(size))):
+            before = sum(db.requests.values())
+            started = time.time()
+            rows = read()
+            elapsed = time.time() - started
+            if rows != expected:
+                print(f"❌ {label} pages of {size} read {len(rows)}/{len(expected)} rows")
+                return 1
+            print(f"   {label} page {size:<5} {sum(db.requests.values()) - before:>3} requests {elapsed:>6.2f}s")
+    return 0
+
+def run_bench(n_rows=2000, latency=0.03, cycles=8):
+    print(f"🔍 LocalPostgrest vs postgrest-py client: {n_rows} rows, {cycles} cycles")
+    for check in (lambda: check_equivalence(min(n_rows, 600), cycles), lambda: check_pagination(max(n_rows, 2500))):
+        if check():
+            return 1
+    if bench_writes(n_rows, cycles, latency) or bench_reads(n_rows, latency):
+        return 1
+    print("✅ Local storage matches the real client's behaviour; write and read costs above")
+    return 0
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    n_rows = int(args[0]) if len(args) > 0 else 2000
+    latency = args[1] / 1000 if len(args) > 1 else 0.03
+    cycles = int(args[2]) if len(args) > 2 else 8
+    sys.exit(run_bench(n_rows, latency, cycles))
@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import random
+import logging
+
+# Load test for alert fan-out: SubscriptionIndex routing vs a linear scan over
+# thousands of subscribers (same recipients required), then the shared
+# TelegramSender draining the fan-out against a stub endpoint while keeping
+# per-chat spacing and the global rate, and a chat answered with 429 only
+# holding up itself.
+# Usage: python backend/bench_subscriptions.py [subscribers] [candidates]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from subscriptions import Subscription, SubscriptionIndex, BOOKMAKERS
+from telegram_delivery import TelegramSender
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SPORTS = ['Basketball', 'NFL', 'MMA', 'Soccer', 'Baseball', 'Ice Hockey']
+
+# ==========================================
+# SYNTHETIC SUBSCRIBERS / CANDIDATES
+# ==========================================
+def make_subscriptions(n_subs, rng):
+    subs = []
+    for i in range(n_subs):
+        sports = rng.sample(SPORTS, rng.randint(1, 2)) if rng.random() < 0.8 else None
+        bookmakers = [rng.choice(BOOKMAKERS)] if rng.random() < 0.3 else None
+        subs.append(Subscription(f"{100000 + i}", sports, bookmakers, min_edge=rng.choice([0.003, 0.005, 0.01, 0.02, 0.04]),
+                                 min_volume=rng.choice([200, 500, 1000, 5000]), max_spread=rng.choice([0.02, 0.04])))
+    return subs
+
+def make_candidates(n_candidates, rng):
+    return [(rng.choice(SPORTS), rng.choice(BOOKMAKERS), rng.uniform(0.003, 0.03),
+             rng.uniform(200, 8000), rng.uniform(0, 0.04)) for _ in range(n_candidates)]
+
+# ==========================================
+# STUB SENDER
+# ==========================================
+class StubResponse:
+    def __init__(self, status_code=200, retry_after=None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def json(self):
+        return {"ok": False, "parameters": {"retry_after": self.retry_after}}
+
+class StubSender(TelegramSender):
+    """TelegramSender with the HTTP call replaced by a timestamp log; limited chats get one 429 each."""
+    def __init__(self, *args, limited=None, **kwargs):
+        super().__init__('stub', *args, **kwargs)
+        self.log = []
+        self.limited = dict(limited or {})   # chat_id -> retry_after for its first send
+
+    def _send(self, chat_id, payload):
+        self.last_sent[chat_id] = self.last_any = time.time()
+        if chat_id in self.limited:
+            return StubResponse(429, self.limited.pop(chat_id))
+        self.log.append((chat_id, self.last_any))
+        return StubResponse()
+
+def check_rate_limited_chat(retry_after=1.0):
+    """A 429 for one chat holds that chat for retry_after; the other chats keep being served."""
+    sender = StubSender(chat_interval=0.05, global_rate=2000.0, limited={'busy': retry_after})
+    for n in range(5):
+        for chat_id in ('busy', 'a', 'b', 'c'):
+            sender.enqueue(chat_id, f"alert {n}", keys=[f"{n}:{chat_id}"])
+    started = time.time()
+    sender.start()
+    sender.stop(timeout=30)
+
+    others_done = max(ts for chat_id, ts in sender.log if chat_id != 'busy') - started
+    busy = [ts - started for chat_id, ts in sender.log if chat_id == 'busy']
+    print(f"   429     other chats done in {others_done:.2f}s; rate-limited chat resumed at "
+          f"{busy[0] if busy else float('nan'):.2f}s (retry_after {retry_after:g}s), {len(busy)}/5 delivered")
+    if len(sender.log) != 20 or others_done >= retry_after or not busy or busy[0] < retry_after:
+        print("❌ A per-chat 429 held up other chats or was not honoured")
+        return 1
+    return 0
+
+# ==========================================
+# RUN
+# ==========================================
+def run_bench(n_subs=5000, n_candidates=5000):
+    rng = random.Random(19)
+    subs = make_subscriptions(n_subs, rng)
+    candidates = make_candidates(n_candidates, rng)
+
+    started = time.perf_counter()
+    index = SubscriptionIndex(subs)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    linear = [sorted(s.chat_id for s in subs if s.accepts(*c)) for c in candidates]
+    linear_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [sorted(s.chat_id for s in index.match(*c)) for c in candidates]
+    index_time = time.perf_counter() - started
+
+    fanout = sum(len(r) for r in indexed)
+    print(f"👥 {n_subs} subscribers, {n_candidates} candidates -> {fanout} deliveries "
+          f"({len(index.buckets)} buckets, built in {build * 1000:.1f}ms)")
+    print(f"   linear  {linear_time * 1e6 / n_candidates:8.1f}µs/candidate")
+    print(f"   indexed {index_time * 1e6 / n_candidates:8.1f}µs/candidate (x{linear_time / index_time:.1f})")
+    if indexed != linear:
+        print("❌ Indexed routing differs from the linear scan")
+        return 1
+
+    # Shared queue: ~4000 deliveries of fan-out, scaled-down limits so it runs in seconds
+    chat_interval, global_rate = 0.05, 2000.0
+    sender = StubSender(chat_interval=chat_interval, global_rate=global_rate, max_queue=10 ** 6)
+    queued = 0
+    for n, recipients in enumerate(indexed):
+        if queued >= 4000:
+            break
+        for chat_id in recipients:
+            queued += sender.enqueue(chat_id, f"alert {n}", keys=[f"{n}:{chat_id}"])
+    started = time.time()
+    sender.start()
+    sender.stop(timeout=120)
+    elapsed = time.time() - started
+
+    last = {}
+    too_close = 0
+    for chat_id, ts in sender.log:
+        if chat_id in last and ts - last[chat_id] < chat_interval - 0.005:
+            too_close += 1
+        last[chat_id] = ts
+    rate = len(sender.log) / elapsed
+    print(f"   sender  {len(sender.log)}/{queued} sent to {len(last)} chats in {elapsed:.2f}s "
+          f"({rate:,.0f}/s, limit {global_rate:,.0f}/s), {too_close} per-chat spacing violations")
+    if len(sender.log) != queued or too_close or rate > global_rate * 1.05 or sender.in_flight:
+        print("❌ Shared queue lost messages or broke a rate limit")
+        return 1
+    if check_rate_limited_chat():
+        return 1
+
+    print("✅ Indexed routing matches the linear scan; shared queue respects both limits and per-chat 429s")
+    return 0
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    n_subs = args[0] if len(args) > 0 else 5000
+    n_candidates = args[1] if len(args) > 1 else 5000
+    sys.exit(run_bench(n_subs, n_candidates))
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+
+# Local check of WriteBehind against a stand-in for a slow PostgREST: producer cycle
+# time with inline vs write-behind flushing, final DB state = latest row state, and
+# backpressure once the queue is full.
+# Usage: python backend/bench_write_behind.py [rows] [latency_ms] [cycles]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from row_store import RowStore
+from write_behind import WriteBehind
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ==========================================
+# STAND-IN POSTGREST
+# ==========================================
+class SlowQuery:
+    def __init__(self, db, table, op, payload=None):
+        self.db = db
+        self.table = table
+        self.op = op
+        self.payload = payload
+
+    def lt(self, column, value):
+        return self
+
+    def execute(self):
+        time.sleep(self.db.latency + random.uniform(0, self.db.latency / 2))
+        with self.db.lock:
+            self.db.requests += 1
+            if self.op == 'upsert':
+                for row in self.payload:
+                    self.db.feed[(row['market_id'], row['runner_name'])] = dict(row)
+            elif self.op == 'insert':
+                self.db.snapshots.extend(self.payload)
+
+class SlowTable:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def upsert(self, rows, on_conflict=None):
+        return SlowQuery(self.db, self.name, 'upsert', rows)
+
+    def insert(self, rows):
+        return SlowQuery(self.db, self.name, 'insert', rows)
+
+    def delete(self):
+        return SlowQuery(self.db, self.name, 'delete')
+
+class SlowPostgrest:
+    """Stands in for the supabase client: every request sleeps `latency` seconds."""
+    def __init__(self, latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.feed = {}
+        self.snapshots = []
+
+    def table(self, name):
+        return SlowTable(self, name)
+
+# ==========================================
+# PRODUCER
+# ==========================================
+def make_rows(n_rows, cycle, rng):
+    rows = []
+    for i in range(n_rows):
+        # ~20% of rows move each cycle
+        price = round(2.0 + (cycle if rng.random() < 0.2 else 0) * 0.01 + i * 0.001, 3)
+        rows.append({'market_id': f"1.{i // 2}", 'runner_name': f"R{i % 2}", 'back_price': price,
+                     'lay_price': round(price + 0.02, 3), 'last_updated': str(cycle)})
+    return rows
+
+def run_producer(n_rows, cycles, db, inline, max_pending=5000):
+    store = RowStore(db, flush_seconds=0.5)
+    writer = WriteBehind(db, store, max_pending=max_pending)
+    if not inline:
+        writer.start()
+
+    rng = random.Random(7)
+    latest = {}
+    cycle_times = []
+    for cycle in range(cycles):
+        started = time.time()
+        rows = make_rows(n_rows, cycle, rng)
+        latest.update({(r['market_id'], r['runner_name']): r for r in rows})
+        writer.update_many(rows)
+        writer.insert('market_snapshots', rows[:10])
+        if inline:
+            writer._write(list(writer.ops))
+            writer.ops.clear()
+        cycle_times.append(time.time() - started)
+        time.sleep(0.05)
+
+    if not inline:
+        writer.stop()
+    return cycle_times, latest, writer
+
+def run_bench(n_rows=400, latency=0.3, cycles=12):
+    print(f"🐢 Stand-in PostgREST: {latency * 1000:.0f}ms per request, {n_rows} rows, {cycles} cycles")
+
+    results = {}
+    for inline in (True, False):
+        db = SlowPostgrest(latency)
+        cycle_times, latest, _ = run_producer(n_rows, cycles, db, inline)
+        label = 'inline' if inline else 'write-behind'
+        results[label] = max(cycle_times)
+        print(f"   {label:<13} producer cycle max {max(cycle_times):.3f}s avg {sum(cycle_times) / len(cycle_times):.3f}s "
+              f"({db.requests} requests, {len(db.snapshots)} snapshot rows)")
+
+        stale = [k for k, row in latest.items() if db.feed.get(k, {}).get('back_price') != row['back_price']]
+        if stale:
+            print(f"❌ {label}: {len(stale)} rows not at their latest state")
+            return 1
+        if len(db.snapshots) != cycles * 10:
+            print(f"❌ {label}: snapshot rows lost ({len(db.snapshots)} != {cycles * 10})")
+            return 1
+
+    if results['write-behind'] >= latency:
+        print("❌ Producer still waits on Supabase latency")
+        return 1
+
+    # Backpressure: a tiny queue makes the producer wait instead of growing without bound
+    db = SlowPostgrest(latency)
+    cycle_times, _, writer = run_producer(n_rows, 3, db, inline=False, max_pending=n_rows // 2)
+    print(f"   backpressure (max {n_rows // 2} pending): producer cycle max {max(cycle_times):.3f}s, "
+          f"final depth {writer.depth()}")
+    if max(cycle_times) < latency:
+        print("❌ Full queue did not hold the producer back")
+        return 1
+
+    print("✅ Write-behind keeps the producer off the Supabase latency path; final state matches")
+    return 0
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    n_rows = int(args[0]) if len(args) > 0 else 400
+    latency = args[1] / 1000 if len(args) > 1 else 0.3
+    cycles = int(args[2]) if len(args) > 2 else 12
+    sys.exit(run_bench(n_rows, latency, cycles))
@@ -0,0 +1,184 @@
+import os
+import logging
+from datetime import timezone, timedelta
+from betfairlightweight import filters
+import clock
+
+logger = logging.getLogger(__name__)
+
+# --- CATALOGUE SETTINGS ---
+# Full refresh picks up start time changes and drops markets that left the window.
+# Discovery is a cheap id-only listing; full projections are fetched for new ids only.
+CATALOGUE_REFRESH_SECONDS = int(os.getenv('CATALOGUE_REFRESH_SECONDS', '900'))
+CATALOGUE_DISCOVERY_SECONDS = int(os.getenv('CATALOGUE_DISCOVERY_SECONDS', '60'))
+CATALOGUE_MAX_RESULTS = 500
+CATALOGUE_PROJECTION = ['MARKET_START_TIME', 'EVENT', 'COMPETITION', 'RUNNER_METADATA']
+CATALOGUE_ID_BATCH = 100
+
+
+def build_market_filter(sport_conf):
+    """MATCH_ODDS markets for one SPORTS_CONFIG entry, starting now-1d .. now+90d."""
+    now_utc = clock.now_utc()
+    filter_args = {
+        'market_type_codes': ['MATCH_ODDS'],
+        'market_start_time': {
+            'from': (now_utc - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'to': (now_utc + timedelta(days=90)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+    }
+
+    if 'competition_id' in sport_conf:
+        filter_args['competition_ids'] = [sport_conf['competition_id']]
+    else:
+        filter_args['event_type_ids'] = [sport_conf['betfair_id']]
+        if 'text_query' in sport_conf:
+            filter_args['text_query'] = sport_conf['text_query']
+
+    return filters.market_filter(**filter_args)
+
+
+def catalogue_key(sport_conf):
+    return (sport_conf['name'], sport_conf.get('betfair_id'), sport_conf.get('competition_id'), sport_conf.get('text_query'))
+
+
+class CatalogueCache:
+    """
+    market_id -> catalogue and (market_id, selection_id) -> runner lookups shared
+    by every fetch_betfair cycle, so the hot loop only pays for list_market_book.
+    """
+
+    def __init__(self):
+        self.markets = {}        # market_id -> MarketCatalogue
+        self.runners = {}        # (market_id, selection_id) -> RunnerCatalogue
+        self.config_ids = {}     # catalogue_key -> [market_id] (FIRST_TO_START order)
+        self.refreshed_at = {}   # catalogue_key -> last full refresh
+        self.discovered_at = {}  # catalogue_key -> last id-only discovery
+
+    def market(self, market_id):
+        return self.markets.get(market_id)
+
+    def runner(self, market_id, selection_id):
+        return self.runners.get((market_id, selection_id))
+
+    def market_ids(self, trading, sport_conf):
+        """Cached market ids for one config, refreshing on the slow cadence."""
+        key = catalogue_key(sport_conf)
+        now = clock.now()
+
+        try:
+            if now - self.refreshed_at.get(key, 0) >= CATALOGUE_REFRESH_SECONDS:
+                self._full_refresh(trading, sport_conf, key)
+            elif now - self.discovered_at.get(key, 0) >= CATALOGUE_DISCOVERY_SECONDS:
+                self._discover(trading, sport_conf, key)
+        except Exception as e:
+            if key not in self.config_ids:
+                raise
+            logger.error(f"Catalogue refresh failed for {sport_conf['name']} (serving cached): {e}")
+
+        return self.config_ids.get(key, [])
+
+    def _full_refresh(self, trading, sport_conf, key):
+        markets = trading.betting.list_market_catalogue(
+            filter=build_market_filter(sport_conf),
+            max_results=CATALOGUE_MAX_RESULTS,
+            market_projection=CATALOGUE_PROJECTION,
+            sort='FIRST_TO_START'
+        )
+        self.config_ids[key] = [m.market_id for m in markets]
+        self.add(markets)
+        self._prune()
+        self.refreshed_at[key] = self.discovered_at[key] = clock.now()
+
+        # DIAGNOSTIC LOG: Check what we actually found
+        logger.info(f"🔎 SEARCH {sport_conf['name']}: Found {len(markets)} markets (catalogue refresh)")
+
+    def _discover(self, trading, sport_conf, key):
+        # No projection -> ids only, no runner metadata weight
+        listed = trading.betting.list_market_catalogue(
+            filter=build_market_filter(sport_conf),
+            max_results=CATALOGUE_MAX_RESULTS,
+            sort='FIRST_TO_START'
+        )
+        listed_ids = [m.market_id for m in listed]
+        new_ids = [m_id for m_id in listed_ids if m_id not in self.markets]
+
+        for pos in range(0, len(new_ids), CATALOGUE_ID_BATCH):
+            batch = new_ids[pos:pos + CATALOGUE_ID_BATCH]
+            self.add(trading.betting.list_market_catalogue(
+                filter=filters.market_filter(market_ids=batch),
+                max_results=len(batch),
+                market_projection=CATALOGUE_PROJECTION
+            ))
+
+        self.config_ids[key] = [m_id for m_id in listed_ids if m_id in self.markets]
+        self._prune()
+        self.discovered_at[key] = clock.now()
+
+        if new_ids:
+            logger.info(f"🔎 SEARCH {sport_conf['name']}: +{len(new_ids)} new markets ({len(listed_ids)} listed)")
+
+    def add(self, markets):
+        for m in markets:
+            self.markets[m.market_id] = m
+            for r in m.runners or []:
+                self.runners[(m.market_id, r.selection_id)] = r
+
+    def _prune(self):
+        live_ids = set()
+        for ids in self.config_ids.values():
+            live_ids.update(ids)
+        for m_id in [m_id for m_id in self.markets if m_id not in live_ids]:
+            del self.markets[m_id]
+        for r_key in [r_key for r_key in self.runners if r_key[0] not in live_ids]:
+            del self.runners[r_key]
+
+
+def merge_catalogue_book(catalogue, sport_conf, book, best_price_map, now_utc, update_time):
+    """Folds one market book into best_price_map (highest-volume market per event/runner wins)."""
+    market_info = catalogue.market(book.market_id)
+    if not market_info:
+        return
+
+    start_dt = market_info.market_start_time
+    if start_dt.tzinfo is None:
+        start_dt = start_dt.replace(tzinfo=timezone.utc)
+
+    seconds_to_start = (start_dt - now_utc).total_seconds()
+    volume = book.total_matched or 0
+
+    # Ignore markets with < £10 matched if they are starting soon
+    if volume < 10 and seconds_to_start < 3600:
+        return
+
+    comp_name = market_info.competition.name if market_info.competition else "Unknown League"
+
+    for runner in book.runners:
+        if runner.status != 'ACTIVE':
+            continue
+
+        runner_details = catalogue.runner(book.market_id, runner.selection_id)
+        if not runner_details:
+            continue
+
+        name = runner_details.runner_name
+        back = runner.ex.available_to_back[0].price if runner.ex.available_to_back else 0.0
+        lay = runner.ex.available_to_lay[0].price if runner.ex.available_to_lay else 0.0
+
+        dedup_key = f"{market_info.event.name}_{name}"
+        current_best = best_price_map.get(dedup_key)
+
+        if not current_best or volume > current_best['volume']:
+            best_price_map[dedup_key] = {
+                "sport": sport_conf['name'],
+                "market_id": book.market_id,
+                "event_name": market_info.event.name,
+                "runner_name": name,
+                "competition": comp_name,
+                "back_price": back,
+                "lay_price": lay,
+                "volume": int(volume),
+                "start_time": market_info.market_start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "in_play": book.inplay,
+                "market_status": book.status,
+                "last_updated": update_time
+            }
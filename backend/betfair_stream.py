@@ -0,0 +1,276 @@
+import os
+import json
+import queue
+import logging
+import threading
+from types import SimpleNamespace
+from datetime import timezone
+import clock
+from betfairlightweight import filters, StreamListener
+from betfairlightweight.streaming import HistoricalGeneratorStream
+
+logger = logging.getLogger(__name__)
+
+# --- STREAM SETTINGS ---
+# Best back/lay (1 level), traded volume and the market definition (status / in-play)
+STREAM_FIELDS = ['EX_BEST_OFFERS', 'EX_TRADED_VOL', 'EX_MARKET_DEF']
+STREAM_LADDER_LEVELS = 1
+STREAM_CONFLATE_MS = int(os.getenv('STREAM_CONFLATE_MS', '0')) or None
+# Betfair caps markets per connection (200 unless the account's limit was raised)
+STREAM_MAX_MARKETS = int(os.getenv('STREAM_MAX_MARKETS', '200'))
+
+
+def definition_catalogue(market_id, definition):
+    """Catalogue-shaped metadata from a stream market definition (recorded/historic data carries names)."""
+    if definition is None or not definition.event_name:
+        return None
+    runners = [
+        SimpleNamespace(selection_id=r.selection_id, runner_name=r.name)
+        for r in definition.runners if r.name
+    ]
+    if not runners:
+        return None
+    return SimpleNamespace(
+        market_id=market_id,
+        market_start_time=definition.market_time,
+        event=SimpleNamespace(name=definition.event_name),
+        competition=None,
+        runners=runners
+    )
+
+
+class RecordingListener(StreamListener):
+    """
+    StreamListener that also appends every raw message to a file. Market
+    definitions are enriched with event/runner names from the catalogue (live
+    definitions carry none), so a recording replays offline on its own.
+    """
+
+    def __init__(self, record_path=None, catalogue=None, **kwargs):
+        super().__init__(**kwargs)
+        self.catalogue = catalogue
+        self.record_file = open(record_path, 'a') if record_path else None
+
+    def on_data(self, raw_data):
+        if self.record_file:
+            try:
+                self.record_file.write(self._enrich(raw_data).rstrip('\n') + '\n')
+                self.record_file.flush()
+            except Exception as e:
+                logger.error(f"Stream record failed: {e}")
+        return super().on_data(raw_data)
+
+    def _enrich(self, raw_data):
+        if self.catalogue is None or '"marketDefinition"' not in raw_data:
+            return raw_data
+        data = json.loads(raw_data)
+        for mc in data.get('mc', []):
+            definition = mc.get('marketDefinition')
+            market_info = self.catalogue.market(mc.get('id'))
+            if not definition or not market_info:
+                continue
+            definition.setdefault('eventName', market_info.event.name)
+            for r in definition.get('runners', []):
+                runner_info = self.catalogue.runner(mc['id'], r.get('id'))
+                if runner_info:
+                    r.setdefault('name', runner_info.runner_name)
+        return json.dumps(data)
+
+
+class ExchangeStream:
+    """
+    Exchange Stream API ingestion. The subscription is the catalogue's routed
+    market ids (soonest first, capped at STREAM_MAX_MARKETS) and is renewed
+    when refresh_routes() changes them. The listener keeps the order-book cache
+    up to date from deltas; apply() turns changed market books into the same
+    rows fetch_betfair builds, and only returns rows whose best back/lay,
+    volume, status or in-play flag moved.
+    """
+
+    def __init__(self, sports_config, catalogue, merge_book):
+        self.sports_config = sports_config
+        self.catalogue = catalogue
+        self.merge_book = merge_book    # (sport_conf, book, best_price_map, now_utc, update_time)
+        self.routes = {}                # market_id -> sport_conf
+        self.market_rows = {}           # market_id -> {dedup_key: row}
+        self.key_markets = {}           # dedup_key -> {market_id}
+        self.best_rows = {}             # dedup_key -> row currently published
+        self.emitted = {}               # dedup_key -> signature of the last emitted row
+        self.subscribed = []            # market ids of the current subscription
+        self.listener = None
+        self.stream = None
+        self.thread = None
+        self.record_path = None
+
+    # --- ROUTING ---
+    def refresh_routes(self, trading):
+        """Market -> config routing from the catalogue (also keeps catalogue metadata warm)."""
+        routes = {}
+        for sport_conf in self.sports_config:
+            try:
+                for market_id in self.catalogue.market_ids(trading, sport_conf):
+                    routes.setdefault(market_id, sport_conf)
+            except Exception as e:
+                logger.error(f"Stream routing failed for {sport_conf['name']}: {e}")
+        if routes:
+            self.routes = routes
+
+        if self.thread is not None and self.thread.is_alive() and self._market_ids() != self.subscribed:
+            # New subscription on the same connection: the server sends a fresh image for every market
+            try:
+                self._subscribe()
+            except Exception as e:
+                logger.error(f"Stream resubscribe failed: {e}")
+
+    def _market_ids(self):
+        def start_time(market_id):
+            market_info = self.catalogue.market(market_id)
+            start = getattr(market_info, 'market_start_time', None)
+            return (start is None, start.isoformat() if start else '', market_id)
+
+        market_ids = sorted(self.routes, key=start_time)
+        if len(market_ids) > STREAM_MAX_MARKETS:
+            logger.warning(f"📡 {len(market_ids)} routed markets, streaming the first {STREAM_MAX_MARKETS} to start")
+        return market_ids[:STREAM_MAX_MARKETS]
+
+    def _subscribe(self, resume=False):
+        market_ids = self._market_ids()
+        # Resume from the last clk only for the same market set, so the cache only receives deltas
+        resume = resume and market_ids == self.subscribed
+        self.stream.subscribe_to_markets(
+            market_filter=filters.streaming_market_filter(market_ids=market_ids),
+            market_data_filter=filters.streaming_market_data_filter(fields=STREAM_FIELDS, ladder_levels=STREAM_LADDER_LEVELS),
+            initial_clk=self.listener.initial_clk if resume else None,
+            clk=self.listener.clk if resume else None,
+            conflate_ms=STREAM_CONFLATE_MS
+        )
+        self.subscribed = market_ids
+        logger.info(f"📡 Stream subscribed: {len(market_ids)} MATCH_ODDS markets")
+
+    def _route(self, book):
+        sport_conf = self.routes.get(book.market_id)
+        if sport_conf is not None:
+            return sport_conf
+
+        # Offline / recorded data: seed metadata from the definition, route by event type
+        definition = book.market_definition
+        if definition is None:
+            return None
+        if self.catalogue.market(book.market_id) is None:
+            market_info = definition_catalogue(book.market_id, definition)
+            if market_info is None:
+                return None
+            self.catalogue.add([market_info])
+        for sport_conf in self.sports_config:
+            if str(sport_conf.get('betfair_id')) == str(definition.event_type_id):
+                self.routes[book.market_id] = sport_conf
+                return sport_conf
+        return None
+
+    # --- LIVE STREAM ---
+    def start(self, trading, record_path=None):
+        self.record_path = record_path
+        if self.listener is None:
+            self.listener = RecordingListener(
+                record_path=record_path,
+                catalogue=self.catalogue,
+                output_queue=queue.Queue(),
+                max_latency=None
+            )
+
+        if not self.routes:
+            # An empty marketIds filter would not narrow anything; ensure_running() retries after the next refresh
+            logger.warning("📡 No routed markets yet, stream not started")
+            return
+        self.stream = trading.streaming.create_stream(listener=self.listener)
+        self._subscribe(resume=True)
+        self.thread = threading.Thread(target=self.stream.start, name='betfair-stream', daemon=True)
+        self.thread.start()
+
+    def ensure_running(self, trading):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        logger.error("📡 Stream connection lost, resubscribing...")
+        try:
+            self.start(trading, self.record_path)
+        except Exception as e:
+            logger.error(f"Stream resubscribe failed: {e}")
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+
+    def drain(self, timeout):
+        """Market books queued since the last call, latest per market (waits up to timeout)."""
+        try:
+            batches = [self.listener.output_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                batches.append(self.listener.output_queue.get_nowait())
+            except queue.Empty:
+                break
+        latest = {}
+        for batch in batches:
+            for book in batch:
+                latest[book.market_id] = book
+        return list(latest.values())
+
+    # --- REPLAY ---
+    def replay(self, file_path):
+        """Feeds a recorded stream through the same cache + apply() path. Yields changed rows per message."""
+        listener = StreamListener(max_latency=None)
+        stream = HistoricalGeneratorStream(file_path, listener, 'marketSubscription', 0)
+        for market_books in stream.get_generator()():
+            publish_time = market_books[0].publish_time if market_books else None
+            update_time = (publish_time.replace(tzinfo=timezone.utc) if publish_time else clock.now_utc())
+            yield self.apply(market_books, update_time.isoformat(), now_utc=update_time)
+
+    # --- CHANGE DETECTION ---
+    def apply(self, market_books, update_time, now_utc=None):
+        now_utc = now_utc or clock.now_utc()
+        touched = set()
+
+        for book in market_books:
+            sport_conf = self._route(book)
+            if sport_conf is None:
+                continue
+
+            rows = {}
+            self.merge_book(sport_conf, book, rows, now_utc, update_time)
+
+            old_rows = self.market_rows.get(book.market_id, {})
+            for key in old_rows.keys() - rows.keys():
+                self.key_markets.get(key, set()).discard(book.market_id)
+            for key in rows:
+                self.key_markets.setdefault(key, set()).add(book.market_id)
+            touched.update(old_rows.keys())
+            touched.update(rows.keys())
+
+            if rows:
+                self.market_rows[book.market_id] = rows
+            else:
+                self.market_rows.pop(book.market_id, None)
+
+        changed = []
+        for key in sorted(touched):
+            candidates = [self.market_rows[m_id][key] for m_id in self.key_markets.get(key, ())]
+            if not candidates:
+                self.best_rows.pop(key, None)
+                continue
+            # Highest-volume market wins; ties keep the row already published
+            current = self.best_rows.get(key)
+            best = max(candidates, key=lambda r: (r['volume'], current is not None and r['market_id'] == current['market_id']))
+            self.best_rows[key] = best
+
+            signature = (best['market_id'], best['back_price'], best['lay_price'], best['volume'],
+                         best['in_play'], best['market_status'])
+            if self.emitted.get(key) != signature:
+                self.emitted[key] = signature
+                changed.append(best)
+
+        return changed
+
+    def current_rows(self):
+        return list(self.best_rows.values())
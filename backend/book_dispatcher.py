@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- BETFAIR REQUEST WEIGHTS (listMarketBook) ---
+# sum(weight) * number of markets must stay <= 200 per request
+MAX_REQUEST_WEIGHT = 200
+NO_PROJECTION_WEIGHT = 2
+PRICE_DATA_WEIGHTS = {
+    'SP_AVAILABLE': 3,
+    'SP_TRADED': 7,
+    'EX_BEST_OFFERS': 5,
+    'EX_ALL_OFFERS': 17,
+    'EX_TRADED': 17,
+}
+# Combinations Betfair prices below the plain sum
+COMBINED_WEIGHTS = {
+    frozenset(['EX_BEST_OFFERS', 'EX_TRADED']): 20,
+    frozenset(['EX_ALL_OFFERS', 'EX_TRADED']): 32,
+}
+
+BOOK_WORKERS = int(os.getenv('BOOK_WORKERS', '4'))
+
+
+def request_weight(price_data):
+    """Per-market weight of a listMarketBook call (default best-offers depth of 3)."""
+    price_data = set(price_data or [])
+    if not price_data:
+        return NO_PROJECTION_WEIGHT
+
+    weight = 0
+    for combo, combo_weight in COMBINED_WEIGHTS.items():
+        if combo <= price_data:
+            weight += combo_weight
+            price_data -= combo
+            break
+    weight += sum(PRICE_DATA_WEIGHTS.get(p, 0) for p in price_data)
+    return weight
+
+
+def plan_batches(market_ids, weight):
+    """Packs market ids into batches that stay within the request weight limit."""
+    size = max(1, MAX_REQUEST_WEIGHT // max(1, weight))
+    return [market_ids[pos:pos + size] for pos in range(0, len(market_ids), size)]
+
+
+class BookDispatcher:
+    """
+    Runs planned listMarketBook batches on a bounded thread pool. Results come
+    back in plan order, so whatever merges them sees the same sequence as a
+    serial walk.
+    """
+
+    def __init__(self, workers=BOOK_WORKERS):
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='books')
+        self.last_latency = 0.0
+
+    def _fetch_one(self, betting, batch, price_projection):
+        try:
+            return betting.list_market_book(market_ids=batch, price_projection=price_projection)
+        except Exception as e:
+            logger.error(f"list_market_book failed for {len(batch)} markets: {e}")
+            return None
+
+    def fetch(self, betting, batches, price_projection):
+        """Returns one entry per batch: its market books, or None if the call failed."""
+        started = time.time()
+        if self.workers == 1 or len(batches) <= 1:
+            results = [self._fetch_one(betting, b, price_projection) for b in batches]
+        else:
+            futures = [self.pool.submit(self._fetch_one, betting, b, price_projection) for b in batches]
+            results = [f.result() for f in futures]
+        self.last_latency = time.time() - started
+        return results
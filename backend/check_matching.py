@@ -0,0 +1,172 @@
+import os
+import sys
+import random
+from datetime import datetime, timezone, timedelta
+
+# Parity check: matching.RunnerIndex vs the original outcomes x active_rows loop in run_spy.
+# Random slates vary sport, the NCAA flag, strict mode, the time window, aliases and
+# substring fallbacks (including several substring hits, where DB order decides).
+# Usage: python backend/check_matching.py [--cases N] [--seed S]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from sports_config import ALIAS_MAP
+from normalization import normalize
+from matching import RunnerIndex, STRICT_TOLERANCE_SECONDS, RELAXED_TOLERANCE_SECONDS
+
+# ==========================================
+# REFERENCE (ORIGINAL) IMPLEMENTATION
+# ==========================================
+def legacy_check_match(name_a, name_b, alias_map):
+    if not name_a or not name_b: return False
+    if name_a == name_b: return True
+    if name_a in alias_map and name_b in alias_map[name_a]: return True
+    if name_b in alias_map and name_a in alias_map[name_b]: return True
+    if len(name_a) > 4 and name_a in name_b: return True
+    if len(name_b) > 4 and name_b in name_a: return True
+    return False
+
+def legacy_match(active_rows, sport, api_start, norm_name, api_home, api_away, alias_map):
+    strict_mode = sport.get('strict_mode', True)
+    for row in active_rows:
+        if row['sport'] != sport['name']:
+            continue
+
+        is_ncaa_api = 'ncaaf' in sport['odds_api_key'].lower()
+        event_name_raw = str(row.get('event_name') or "").upper()
+        comp_name_raw = str(row.get('competition') or "").upper()
+        sport_label = str(row.get('sport') or "").upper()
+        is_ncaa_db = any(x in event_name_raw or x in comp_name_raw or x in sport_label for x in ['NCAA', 'COLLEGE', 'FCS'])
+        if sport['name'] == 'NFL' and is_ncaa_api != is_ncaa_db:
+            continue
+
+        tolerance = 108000 if not strict_mode else 43200
+        delta = abs((row['start_time'] - api_start).total_seconds())
+        if delta > tolerance:
+            continue
+
+        runner_match = (norm_name == row['norm_runner']) or \
+                       legacy_check_match(norm_name, row['norm_runner'], alias_map) or \
+                       (norm_name in row['norm_runner'] or row['norm_runner'] in norm_name)
+
+        if strict_mode:
+            event_match = (api_home in row['norm_event'] or api_away in row['norm_event'])
+            if runner_match and event_match:
+                return row
+        elif runner_match:
+            return row
+    return None
+
+# ==========================================
+# CORPUS
+# ==========================================
+# Overlapping names so exact, alias and substring hits compete for the same outcome
+NAMES = ['ohio', 'ohiostate', 'ohiostatebuckeyes', 'miami', 'miamioh', 'miamiohredhawks', 'kentucky',
+         'westernkentucky', 'state', 'a', 'la', 'lakers', 'losangeleslakers', 'laclippers', 'celtics',
+         'bostonceltics', 'knicks', 'newyorkknicks', 'texas', 'texasam', 'am', 'army', 'navy', 'draw']
+SPORTS = [
+    {'name': 'NFL', 'odds_api_key': 'americanfootball_nfl'},
+    {'name': 'NFL', 'odds_api_key': 'americanfootball_ncaaf'},
+    {'name': 'NBA', 'odds_api_key': 'basketball_nba'},
+    {'name': 'NCAAB', 'odds_api_key': 'basketball_ncaab'},
+]
+EVENT_SUFFIXES = ['', '', ' (NCAA)', ' College Game']
+COMPETITIONS = [None, 'NFL', 'NBA', 'NCAA Football', 'College Basketball', 'FCS Playoffs', 'Preseason']
+# Offsets around both tolerances, inclusive edges included
+OFFSETS = [0, 60, 3600, STRICT_TOLERANCE_SECONDS - 1, STRICT_TOLERANCE_SECONDS, STRICT_TOLERANCE_SECONDS + 1,
+           80000, RELAXED_TOLERANCE_SECONDS, RELAXED_TOLERANCE_SECONDS + 1, 200000]
+API_START = datetime(2026, 10, 16, 18, 0, tzinfo=timezone.utc)
+
+def random_aliases(rng):
+    if rng.random() < 0.2:
+        return None  # the real ALIAS_MAP
+    aliases = {}
+    for _ in range(rng.randint(0, 6)):
+        aliases.setdefault(rng.choice(NAMES), []).append(rng.choice(NAMES))
+    return aliases
+
+def random_slate(rng, n_rows):
+    rows = []
+    for i in range(n_rows):
+        home, away = rng.sample(NAMES, 2)
+        runner = rng.choice([home, away, rng.choice(NAMES)])
+        offset = rng.choice(OFFSETS) * rng.choice((-1, 1))
+        rows.append({
+            'id': i + 1,
+            'sport': rng.choice(['NFL', 'NFL', 'NBA', 'NCAAB']),
+            'event_name': f"{home} v {away}{rng.choice(EVENT_SUFFIXES)}",
+            'competition': rng.choice(COMPETITIONS),
+            'norm_runner': runner,
+            'norm_event': f"{home}v{away}",
+            'start_time': API_START + timedelta(seconds=offset),
+        })
+    return rows
+
+def real_alias_slate(rng, n_rows):
+    """Names from the real ALIAS_MAP, so alias hits use the production table."""
+    names = sorted({normalize(n) for key, values in ALIAS_MAP.items() for n in [key, *values] if normalize(n)})
+    rows = random_slate(rng, n_rows)
+    for row in rows:
+        row['norm_runner'] = rng.choice(names)
+        row['norm_event'] = f"{row['norm_runner']}v{rng.choice(names)}"
+    return rows, names
+
+# ==========================================
+# RUN
+# ==========================================
+def kind_of(row, norm_name, alias_map):
+    if row is None:
+        return 'none'
+    if row['norm_runner'] == norm_name:
+        return 'exact'
+    if norm_name in alias_map.get(row['norm_runner'], ()) or row['norm_runner'] in alias_map.get(norm_name, ()):
+        return 'alias'
+    return 'substring'
+
+def run_parity(cases=3000, seed=7):
+    rng = random.Random(seed)
+    counts = {'exact': 0, 'alias': 0, 'substring': 0, 'none': 0}
+    contested = 0
+    mismatches = 0
+    checked = 0
+
+    while checked < cases:
+        aliases = random_aliases(rng)
+        if aliases is None:
+            rows, names = real_alias_slate(rng, rng.randint(1, 60))
+            legacy_aliases = ALIAS_MAP
+        else:
+            rows, names = random_slate(rng, rng.randint(1, 60)), NAMES
+            legacy_aliases = aliases
+        index = RunnerIndex(rows, aliases)
+
+        for _ in range(20):
+            sport = dict(rng.choice(SPORTS), strict_mode=rng.random() < 0.6)
+            api_start = API_START + timedelta(seconds=rng.choice((0, 1800, -5400)))
+            norm_name = rng.choice(names)
+            api_home, api_away = rng.choice(names), rng.choice(names)
+
+            new = index.match(sport, api_start, norm_name, api_home, api_away)
+            old = legacy_match(rows, sport, api_start, norm_name, api_home, api_away, legacy_aliases)
+            checked += 1
+
+            if (new or {}).get('id') != (old or {}).get('id'):
+                mismatches += 1
+                print(f"❌ {sport} {norm_name!r} ({api_home} / {api_away}): "
+                      f"index={new and new['id']} legacy={old and old['id']}")
+                continue
+
+            counts[kind_of(old, norm_name, legacy_aliases)] += 1
+            # Outcomes where more than one row passes: the winner must be the first in DB order
+            hits = [r for r in rows if legacy_match([r], sport, api_start, norm_name, api_home, api_away, legacy_aliases)]
+            contested += len(hits) > 1
+
+    print(f"Checked {checked} outcomes ({', '.join(f'{k} {v}' for k, v in counts.items())}; "
+          f"{contested} with several candidate rows) -> {mismatches} mismatches")
+    return mismatches
+
+if __name__ == "__main__":
+    cases = int(sys.argv[sys.argv.index("--cases") + 1]) if "--cases" in sys.argv else 3000
+    seed = int(sys.argv[sys.argv.index("--seed") + 1]) if "--seed" in sys.argv else 7
+    sys.exit(1 if run_parity(cases, seed) else 0)
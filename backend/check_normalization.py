@@ -0,0 +1,118 @@
+import os
+import re
+import sys
+import random
+
+# Parity check: compiled/memoized normalization.py vs the original str.replace implementation.
+# Usage: python backend/check_normalization.py [--fuzz N]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from sports_config import ALIAS_MAP
+from normalization import normalize, normalize_af, check_match, GARBAGE_WORDS
+from odds_cache import OddsCache
+
+# ==========================================
+# REFERENCE (ORIGINAL) IMPLEMENTATION
+# ==========================================
+def legacy_normalize(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+def legacy_normalize_af(name):
+    if not name: return ""
+    name = str(name).lower()
+    if "florida international" in name or "fiu" in name or "florida int" in name: return "fiu"
+    if "texas san antonio" in name or "utsa" in name: return "utsa"
+    if "brigham young" in name or name == "byu": return "byu"
+    if "connecticut" in name or "uconn" in name: return "uconn"
+
+    garbage = [
+        "football team", "university", "univ.", "univ", " the ", " at ",
+        "hilltoppers", "golden eagles", "hurricanes", "commanders", "vikings",
+        "lions", "cowboys", "wildcats", "redbirds", "bobcats",
+        "panthers", "roadrunners", "bulldogs", "lobos", "cougars",
+        "black knights", "huskies", "redhawks"
+    ]
+
+    for word in garbage:
+        name = name.replace(word, "")
+    name = name.replace(" st.", " state").replace(" st ", " state ")
+    return re.sub(r'[^a-z0-9]', '', name)
+
+def legacy_check_match(name_a, name_b):
+    if not name_a or not name_b: return False
+    if name_a == name_b: return True
+    if name_a in ALIAS_MAP and name_b in ALIAS_MAP[name_a]: return True
+    if name_b in ALIAS_MAP and name_a in ALIAS_MAP[name_b]: return True
+    if len(name_a) > 4 and name_a in name_b: return True
+    if len(name_b) > 4 and name_b in name_a: return True
+    return False
+
+# ==========================================
+# CORPUS
+# ==========================================
+def build_corpus():
+    names = {None, "", 0, "BYU", "byu", "BYU Cougars", "Florida Intl", "U.T.S.A", "UConn Huskies",
+             "Miami (OH) RedHawks", "Ohio St. Buckeyes", "Michigan St Spartans", "Army Black Knights",
+             "Detroit Lions", "Washington Commanders", "The Citadel", "Texas A&M at Houston"}
+
+    for key, values in ALIAS_MAP.items():
+        names.add(key)
+        names.update(values)
+
+    # Real team/runner names from the Odds API cache, when available
+    cache_dir = os.path.join(os.getcwd(), "api_cache")
+    if os.path.isdir(cache_dir):
+        cache = OddsCache(cache_dir)
+        sport_keys = {f.split(".json")[0] for f in os.listdir(cache_dir) if f.endswith((".json", ".json.gz"))}
+        for sport_key in sorted(sport_keys):
+            try:
+                entry = cache.get(sport_key)
+                for event in entry['data'] if entry else []:
+                    names.add(event.get('home_team'))
+                    names.add(event.get('away_team'))
+                    for book in event.get('bookmakers', []):
+                        for market in book.get('markets', []):
+                            for outcome in market.get('outcomes', []):
+                                names.add(outcome.get('name'))
+            except Exception as e:
+                print(f"!! Skipping {sport_key}: {e}")
+    return names
+
+def fuzz_corpus(n, seed=7):
+    rng = random.Random(seed)
+    parts = GARBAGE_WORDS + ["st.", " st ", "state", "ohio", "miami", " ", "kentucky",
+                            "western", "a", ".", "the", "at", "un", "iv", "ers"]
+    return {"".join(rng.choice(parts) for _ in range(rng.randint(1, 6))) for _ in range(n)}
+
+# ==========================================
+# RUN
+# ==========================================
+def run_parity(fuzz=0):
+    real_names = build_corpus()
+    corpus = real_names | fuzz_corpus(fuzz) if fuzz else real_names
+
+    mismatches = 0
+    for name in corpus:
+        for label, new_func, old_func in (("normalize", normalize, legacy_normalize),
+                                          ("normalize_af", normalize_af, legacy_normalize_af)):
+            new, old = new_func(name), old_func(name)
+            if new != old:
+                mismatches += 1
+                print(f"❌ {label}({name!r}): new={new!r} legacy={old!r}")
+
+    # Pairwise alias/fuzzy check over real names only (quadratic)
+    normed = sorted({normalize_af(n) for n in real_names} | {normalize(n) for n in real_names})
+    for a in normed:
+        for b in normed:
+            if check_match(a, b) != legacy_check_match(a, b):
+                mismatches += 1
+                print(f"❌ check_match({a!r}, {b!r})")
+
+    print(f"Checked {len(corpus)} names / {len(normed) ** 2} pairs -> {mismatches} mismatches")
+    return mismatches
+
+if __name__ == "__main__":
+    fuzz = int(sys.argv[sys.argv.index("--fuzz") + 1]) if "--fuzz" in sys.argv else 0
+    sys.exit(1 if run_parity(fuzz) else 0)
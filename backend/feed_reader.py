@@ -0,0 +1,40 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- READ SETTINGS ---
+FEED_PAGE_SIZE = int(os.getenv('FEED_PAGE_SIZE', '1000'))
+
+# Column projections per caller (select('*') ships every price column every time)
+SPY_COLUMNS = ('id', 'sport', 'market_id', 'runner_name', 'event_name', 'competition', 'start_time')
+ALERT_COLUMNS = ('id', 'sport', 'market_id', 'runner_name', 'market_status', 'in_play', 'volume', 'start_time',
+                 'back_price', 'lay_price', 'price_paddy', 'price_bet365')
+
+
+def iter_feed_rows(supabase_client, columns, filters=(), page_size=FEED_PAGE_SIZE, table='market_feed'):
+    """
+    Yields rows lazily, keyset-paginated on id, so PostgREST's max-rows cap can
+    never truncate the scan. filters are (method, column, value) tuples applied
+    to every page, e.g. ('neq', 'market_status', 'CLOSED').
+
+    Only an empty page ends the scan: a page shorter than page_size may just be
+    the server-side cap.
+    """
+    columns = list(columns)
+    if 'id' not in columns:
+        columns.insert(0, 'id')
+    select = ",".join(columns)
+
+    last_id = None
+    while True:
+        query = supabase_client.table(table).select(select)
+        for method, column, value in filters:
+            query = getattr(query, method)(column, value)
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        page = query.order('id').limit(page_size).execute().data
+        if not page:
+            return
+        yield from page
+        last_id = page[-1]['id']
@@ -0,0 +1,91 @@
+import os
+import logging
+import clock
+
+logger = logging.getLogger(__name__)
+
+# --- WRITE SETTINGS ---
+# Unchanged rows are only re-sent this often, to keep last_updated inside the
+# frontend's 60 minute heartbeat filter.
+FEED_HEARTBEAT_SECONDS = int(os.getenv('FEED_HEARTBEAT_SECONDS', '900'))
+FEED_VOLATILE_FIELDS = ('last_updated',)
+
+
+def feed_key(row):
+    return (row.get('market_id'), row.get('runner_name'))
+
+
+def content_hash(row):
+    """Hash of everything in a market_feed row except its timestamp."""
+    return hash(tuple(sorted((k, v) for k, v in row.items() if k not in FEED_VOLATILE_FIELDS)))
+
+
+class FeedWriter:
+    """
+    Remembers what was last written per (market_id, runner_name) so producers
+    only send rows whose content changed, plus a slow heartbeat for the rest.
+    select() -> upsert -> commit(); a failed upsert just skips commit() and the
+    rows are offered again next cycle.
+    """
+
+    def __init__(self, name, heartbeat_seconds=FEED_HEARTBEAT_SECONDS):
+        self.name = name
+        self.heartbeat_seconds = heartbeat_seconds
+        self.written = {}   # feed_key -> (content_hash, written_at, row)
+        self.offered = 0
+        self.changed = 0
+        self.heartbeats = 0
+
+    def _due(self, key, row, now):
+        """None if the row can be skipped, else 'changed' / 'heartbeat'."""
+        previous = self.written.get(key)
+        if previous is None or previous[0] != content_hash(row):
+            return 'changed'
+        if now - previous[1] >= self.heartbeat_seconds:
+            return 'heartbeat'
+        return None
+
+    def select(self, rows):
+        """Rows whose content changed since the last write, plus rows due a heartbeat."""
+        now = clock.now()
+        selected = []
+        for row in rows:
+            self.offered += 1
+            reason = self._due(feed_key(row), row, now)
+            if reason is None:
+                continue
+            if reason == 'changed':
+                self.changed += 1
+            else:
+                self.heartbeats += 1
+            selected.append(row)
+        return selected
+
+    def heartbeat_rows(self, update_time, live=None):
+        """Previously written rows due a heartbeat, re-stamped (for producers that only send deltas)."""
+        now = clock.now()
+        rows = []
+        for _, written_at, row in self.written.values():
+            if now - written_at < self.heartbeat_seconds or (live is not None and not live(row)):
+                continue
+            rows.append(dict(row, last_updated=update_time))
+        self.offered += len(rows)
+        self.heartbeats += len(rows)
+        return rows
+
+    def commit(self, rows):
+        now = clock.now()
+        for row in rows:
+            self.written[feed_key(row)] = (content_hash(row), now, row)
+
+    def prune(self, live):
+        for key in [k for k, (_, _, row) in self.written.items() if not live(row)]:
+            del self.written[key]
+
+    def report(self):
+        written = self.changed + self.heartbeats
+        if self.offered or written:
+            logger.info(f"✍️  market_feed [{self.name}]: wrote {written}/{self.offered} rows "
+                        f"({self.changed} changed, {self.heartbeats} heartbeat, "
+                        f"{max(self.offered - written, 0)} unchanged skipped)")
+        self.offered = self.changed = self.heartbeats = 0
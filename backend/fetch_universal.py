@@ -1,16 +1,32 @@
 import betfairlightweight
 from betfairlightweight import filters
-import pandas as pd
 import config
-import time
 import requests
-import re
 import os
-import json
+import math
+import sys
 import logging
 import telegram_alerts
-from datetime import datetime, timezone, timedelta
-from supabase import create_client, Client
+import clock
+from matching import RunnerIndex, MatchCache
+from betfair_catalogue import CatalogueCache, merge_catalogue_book
+from book_dispatcher import BookDispatcher, plan_batches, request_weight
+from poll_scheduler import PollScheduler
+from row_store import RowStore
+from feed_writer import feed_key
+from write_behind import WriteBehind
+from write_spool import WriteSpool
+from feed_reader import iter_feed_rows, SPY_COLUMNS
+from odds_quota import QuotaPlanner
+from odds_request import plan_requests, LEGACY_BOOKMAKERS
+from odds_cache import OddsCache
+from market_state import MarketState
+from betfair_stream import ExchangeStream
+from traffic import TrafficRecorder, RecordingBetting, recording_get
+from normalization import normalize, normalize_af, check_match
+from datetime import datetime, timedelta
+from storage import create_storage
+from supabase import Client
 
 # --- LOGGING SETUP ---
 # Controls detailed per-item logging (default: False)
@@ -42,7 +58,7 @@ if SCOPE_MODE.startswith("NBA_PREMATCH_ML"):
     SPORTS_CONFIG = [s for s in SPORTS_CONFIG if s['name'] == 'Basketball']
 
 # --- SETUP ---
-supabase: Client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
+supabase: Client = create_storage(config.SUPABASE_URL, config.SUPABASE_KEY)  # STORAGE_BACKEND=local for load tests
 trading = betfairlightweight.APIClient(
     username=config.USERNAME,
     password=config.PASSWORD,
@@ -51,19 +67,54 @@ trading = betfairlightweight.APIClient(
 )
 
 ODDS_API_KEY = config.ODDS_API_KEY
+# Minimal markets/bookmakers per odds_api_key (DEBUG_MODE's MMA dragnet still wants every book)
+odds_requests = plan_requests(SPORTS_CONFIG, LEGACY_BOOKMAKERS if DEBUG_MODE else ())
 opening_prices_cache = {}
 last_spy_run = 0
+last_alert_rescan = 0
+last_keep_alive = clock.now()
 CACHE_DIR = "api_cache"
-
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+MATCH_CACHE_FILE = "match_cache.json"  # Odds API outcome -> market_feed row (survives restarts)
+
+odds_cache = OddsCache(CACHE_DIR)  # parsed payloads in memory; gzip + atomic rename on disk
+
+match_cache = MatchCache(MATCH_CACHE_FILE)
+odds_quota = QuotaPlanner()  # persisted Odds API credit usage -> per-sport TTLs
+catalogue = CatalogueCache()
+book_dispatcher = BookDispatcher()
+poll_scheduler = PollScheduler()
+write_spool = WriteSpool()  # failed writes survive Supabase outages (and restarts) on disk
+row_store = RowStore(supabase, spool=write_spool)  # exchange + bookmaker columns, one change-only writer
+write_behind = WriteBehind(supabase, row_store, spool=write_spool)  # writer thread: Supabase latency never blocks polling
+# status / in-play / start time per market, as last seen from Betfair (start heap only for auto-close)
+market_state = MarketState(track_closes=SCOPE_MODE.startswith("NBA_PREMATCH_ML"))
+startup_sweep_done = False
 
 # --- IN-PLAY SETTINGS (MINIMAL, LOCAL CONSTANTS) ---
 INPLAY_WINDOW_SECONDS = 4 * 3600     # treat matches as "in-play relevant" up to 4h after start
 PREMATCH_SPY_INTERVAL = 15           # seconds (Check TTL frequently)
 INPLAY_SPY_INTERVAL = 15             # seconds
-TTL_INPLAY_SECONDS = 60              # odds api cache TTL (HARD LIMIT for 20k/mo budget)
-CALLS_THIS_SESSION = 0               # Global counter for accounting
+TTL_INPLAY_SECONDS = 60              # odds api cache TTL floor (odds_quota plans the rest)
+CALLS_THIS_SESSION = 0               # calls by this process (credits are tracked by odds_quota)
+
+# --- ENGINE MODE ---
+# --stream: Exchange Stream API (order-book cache updated by deltas) instead of REST polling
+STREAM_MODE = '--stream' in sys.argv
+STREAM_RECORD_FILE = os.getenv('STREAM_RECORD_FILE')  # record raw stream for replay_stream.py
+TRAFFIC_RECORD_FILE = os.getenv('TRAFFIC_RECORD_FILE')  # record catalogue/book/Odds API responses for replay_traffic.py
+
+# Odds API transport (replay_traffic.py swaps in recorded responses)
+odds_http_get = requests.get
+if TRAFFIC_RECORD_FILE:
+    traffic_recorder = TrafficRecorder(TRAFFIC_RECORD_FILE)
+    trading.betting = RecordingBetting(trading.betting, traffic_recorder)
+    odds_http_get = recording_get(odds_http_get, traffic_recorder)
+    logger.info(f"📼 Recording upstream traffic to {TRAFFIC_RECORD_FILE}")
+
+# --- PRICE POLLING ---
+BOOK_PRICE_DATA = ['EX_BEST_OFFERS', 'EX_TRADED']
+BOOK_REQUEST_WEIGHT = request_weight(BOOK_PRICE_DATA)  # 20 -> 10 markets per listMarketBook
+POLL_INTERVAL_SECONDS = 6
 
 # --- SNAPSHOT SETTINGS (NEW) ---
 last_snapshot_time = 0
@@ -71,50 +122,53 @@ SNAPSHOT_INTERVAL = 60  # Write history every 60s
 # ---------------------------------------------------
 
 # --- DYNAMIC CACHING SYSTEM ---
-def fetch_cached_odds(sport_key, ttl_seconds, region='uk,eu,us'):
+def fetch_cached_odds(odds_request, ttl_seconds):
     """
     Fetches odds with a dynamic Time-To-Live (TTL).
     High Urgency = Low TTL (Fresh Data)
     Low Urgency = High TTL (Save API Calls)
+    odds_request (odds_request.OddsRequest) asks only for the markets/bookmakers run_spy reads.
     """
-    cache_file = os.path.join(CACHE_DIR, f"{sport_key}.json")
-    now = time.time()
+    sport_key = odds_request.sport_key
+    now = clock.now()
+
+    # Out of credits (down to the reserve): keep serving whatever is cached
+    if not odds_quota.allow(sport_key, now):
+        logger.warning(f"💳 Odds API reserve reached: serving cached {sport_key}")
+        ttl_seconds = math.inf
 
     # 1. Check Cache Age
     # FIX: Allow caching even for urgent/in-play requests (>= instead of >)
-    if os.path.exists(cache_file) and ttl_seconds >= TTL_INPLAY_SECONDS:
-        file_age = now - os.path.getmtime(cache_file)
-        if file_age < ttl_seconds:
-            try:
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-            except:
-                pass
+    cached = odds_cache.get(sport_key)
+    if cached is not None and ttl_seconds >= TTL_INPLAY_SECONDS:
+        data_age = now - cached['fetched_at']
+        if data_age < ttl_seconds:
+            return cached['data']
 
     # 2. Fetch Fresh Data (Only if cache expired)
     url = f'https://api.the-odds-api.com/v4/sports/{sport_key}/odds'
-    params = {
-        'api_key': ODDS_API_KEY,
-        'regions': region,
-        'markets': 'h2h',
-        'oddsFormat': 'decimal',
-        # Ladbrokes is the middle column provider (legacy field name on DB remains price_bet365)
-        'bookmakers': 'pinnacle,ladbrokes_uk,paddypower,williamhill,unibet,betfair_sb_uk,coral,betvictor'
-    }
+    # Ladbrokes is the middle column provider (legacy field name on DB remains price_bet365)
+    params = dict(odds_request.params(), api_key=ODDS_API_KEY)
+
+    if ttl_seconds == math.inf:
+        return []
 
     urgency_label = "URGENT" if ttl_seconds < 300 else "NORMAL" if ttl_seconds < 3600 else "LAZY"
     
     global CALLS_THIS_SESSION
     CALLS_THIS_SESSION += 1
-    logger.info(f"🌍 CALLING API [#{CALLS_THIS_SESSION}] ({urgency_label}): {sport_key} (TTL: {ttl_seconds}s)...")
+    logger.info(f"🌍 CALLING API [#{CALLS_THIS_SESSION}] ({urgency_label}): {sport_key} (TTL: {ttl_seconds:.0f}s, "
+                f"~{odds_request.cost()} credits, unshaped {odds_request.legacy_cost()})...")
 
     try:
-        response = requests.get(url, params=params, timeout=15)
+        response = odds_http_get(url, params=params, timeout=15)
+        odds_quota.record(sport_key, response.headers)
+        logger.info(f"💳 {sport_key}: {response.headers.get('x-requests-last', '?')} credits charged, "
+                    f"{len(response.content) / 1024:.0f}KB")
         data = response.json()
 
         if isinstance(data, list):
-            with open(cache_file, 'w') as f:
-                json.dump(data, f)
+            odds_cache.put(sport_key, data)
         return data
     except Exception as e:
         logger.error(f"API Fetch Error: {e}")
@@ -153,96 +207,75 @@ class MatchStats:
 
 tracker = MatchStats()
 
-# --- NORMALIZATION ---
-def normalize(name):
-    return re.sub(r'[^a-z0-9]', '', str(name).lower())
-
-def normalize_af(name):
-    if not name: return ""
-    name = str(name).lower()
-    # Bridge common NCAA abbreviations to their full school names before stripping mascots
-    # FIX: Broaden FIU/UTSA matching (allow substrings like "Florida Int" or "U.T.S.A")
-    if "florida international" in name or "fiu" in name or "florida int" in name: return "fiu"
-    if "texas san antonio" in name or "utsa" in name: return "utsa"
-    if "brigham young" in name or name == "byu": return "byu"
-    if "connecticut" in name or "uconn" in name: return "uconn"
-    
-    garbage = [
-        "football team", "university", "univ.", "univ", " the ", " at ",
-        "hilltoppers", "golden eagles", "hurricanes", "commanders", "vikings",
-        "lions", "cowboys", "wildcats", "redbirds", "bobcats",
-        "panthers", "roadrunners", "bulldogs", "lobos", "cougars",
-        "black knights", "huskies", "redhawks"
-    ]
-
-    for word in garbage:
-        name = name.replace(word, "")
-    name = name.replace(" st.", " state").replace(" st ", " state ")
-    return re.sub(r'[^a-z0-9]', '', name)
-
-def check_match(name_a, name_b):
-    if not name_a or not name_b: return False
-    if name_a == name_b: return True
-    
-    # Check explicit Alias Map first
-    if name_a in ALIAS_MAP and name_b in ALIAS_MAP[name_a]: return True
-    if name_b in ALIAS_MAP and name_a in ALIAS_MAP[name_b]: return True
-
-    # Fuzzy match: Ensure we catch "westernkentucky" in "westernkentuckyhilltoppers"
-    # only if the core string is significant (over 4 chars) to avoid false positives
-    if len(name_a) > 4 and name_a in name_b: return True
-    if len(name_b) > 4 and name_b in name_a: return True
-    
-    return False
-
 # --- IN-PLAY CHECK (MINIMAL QUERY) ---
-def has_inplay_markets():
-    try:
-        r = supabase.table('market_feed') \
-            .select('id') \
-            .eq('in_play', True) \
-            .neq('market_status', 'CLOSED') \
-            .limit(1) \
-            .execute()
-        return bool(r.data)
-    except Exception as e:
-        logger.error(f"DB Error checking in-play: {e}")
-        return False
-
-# --- MAIN ENGINE ---
-def run_spy():
-    logger.info("🕵️  Running Spy (Forensic Mode)...")
-    
-    # --- CLEANUP STEP (Pre-match Strict Mode) ---
-    if SCOPE_MODE.startswith("NBA_PREMATCH_ML"):
-        try:
-            now_iso = datetime.now(timezone.utc).isoformat()
-            # 1. Close started games
-            supabase.table('market_feed').update({'market_status': 'CLOSED'}) \
-                .lt('start_time', now_iso).eq('market_status', 'OPEN').execute()
-            # 2. Close explicitly marked in-play games
-            supabase.table('market_feed').update({'market_status': 'CLOSED'}) \
-                .eq('in_play', True).eq('market_status', 'OPEN').execute()
-        except Exception as e:
-            logger.error(f"Cleanup Error: {e}")
-    # --------------------------------------------
-
-    tracker.__init__()
+def close_started_markets():
+    """NBA scope: closes markets once, when they start or go in-play, in one batched update."""
+    market_ids = market_state.due_closes(clock.now())
+    if not market_ids:
+        return
+    logger.info(f"🔒 Closing {len(market_ids)} started/in-play markets")
+    row_store.set_status(market_ids, 'CLOSED')
+    write_behind.update_in('market_feed', {'market_status': 'CLOSED'}, 'market_id', market_ids)
+
+# --- INCREMENTAL SPY (NEW) ---
+# The Odds API cache usually serves the same payload for 300s/3600s, so most spy
+# cycles have nothing new to match. Only events whose bookmaker last_update moved
+# are re-processed, and market_feed is only re-read every SPY_RESYNC_SECONDS.
+SPY_INCREMENTAL = os.getenv('SPY_INCREMENTAL', '1') == '1'
+SPY_RESYNC_SECONDS = 300      # full market_feed re-read (picks up newly listed rows + cleanup)
+SPY_BOOKMAKERS = ('pinnacle', 'ladbrokes', 'paddypower')  # the only books run_spy consumes
+
+class SpyState:
+    """What previous spy cycles saw, so unchanged Odds API inputs cost nothing."""
+    def __init__(self):
+        self.synced_at = 0
+        self.id_to_row_map = {}
+        self.active_rows = []
+        self.sport_schedules = {}
+        self.runner_index = None
+        self.payload_fingerprints = {}  # config key -> fingerprint of the whole payload
+        self.event_signatures = {}      # (config key, event id) -> bookmaker signature
+
+spy_state = SpyState()
+
+def spy_config_key(sport):
+    # NCAA Football and FCS share an odds_api_key, so the text_query is part of the key
+    return (sport['name'], sport.get('text_query', ''), sport['odds_api_key'])
+
+def event_signature(event):
+    """Changes whenever any consumed bookmaker updates this event's prices."""
+    books = []
+    for b in event.get('bookmakers', []) or []:
+        key = str(b.get('key', '')).lower()
+        if not any(k in key for k in SPY_BOOKMAKERS):
+            continue
+        stamp = b.get('last_update')
+        if stamp is None:
+            # No timestamp -> fall back to the prices themselves
+            stamp = tuple(
+                (o.get('name'), o.get('price'))
+                for m in b.get('markets', []) if m.get('key') == 'h2h'
+                for o in m.get('outcomes', [])
+            )
+        books.append((key, stamp))
+    books.sort(key=lambda x: x[0])
+    return (event.get('commence_time'), tuple(books))
 
+def load_spy_rows():
+    """Full read of open market_feed rows into the spy's matching state."""
     try:
-        db_rows = supabase.table('market_feed').select('*').neq('market_status', 'CLOSED').execute()
-        id_to_row_map = {row['id']: row for row in db_rows.data}
+        # Keyset-paginated: tables past PostgREST's max-rows are read in full
+        db_rows = list(iter_feed_rows(supabase, SPY_COLUMNS, filters=[('neq', 'market_status', 'CLOSED')]))
     except Exception as e:
         logger.error(f"DB Error: {e}")
-        return
+        return False
 
+    id_to_row_map = {row['id']: row for row in db_rows}
     active_rows = []
     reset_updates = []
     sport_schedules = {}
 
-    now_utc = datetime.now(timezone.utc)
-
-    for row in db_rows.data:
+    for row in db_rows:
         sport_name = row.get('sport')
 
         try:
@@ -270,6 +303,7 @@ def run_spy():
             'runner_name': row.get('runner_name'),
             'norm_runner': norm_func(row.get('runner_name')),
             'norm_event': norm_func(row.get('event_name')),
+            'competition': row.get('competition'),
             'start_time': start_dt
         })
 
@@ -293,93 +327,271 @@ def run_spy():
         for i in range(0, len(reset_updates), 100):
             supabase.table('market_feed').upsert(reset_updates[i:i+100]).execute()
 
-    updates = {}
+    spy_state.id_to_row_map = id_to_row_map
+    spy_state.active_rows = active_rows
+    spy_state.sport_schedules = sport_schedules
+    # Built once per sync: outcomes only scan rows inside their time window
+    spy_state.runner_index = RunnerIndex(active_rows)
+    spy_state.synced_at = clock.now()
+    match_cache.prune(id_to_row_map.keys())
+    return True
+
+def spy_urgency(sport, now_utc):
+    """(seconds to the nearest relevant start, events starting within 24h) for one config."""
+    # --- Dynamic urgency (patched for in-play) ---
+    raw_schedule = spy_state.sport_schedules.get(sport['name'], [])
+    min_seconds_away = 999999
+    imminent = 0
+
+    # Filter: Only trigger urgency if the LIVE game matches this Config's scope
+    relevant_starts = []
+    required_query = str(sport.get('text_query', '')).upper()
+
+    for item in raw_schedule:
+        # Prevent FCS games from triggering the expensive NFL Pro API
+        if "NFL" in required_query and "NCAA" in item['comp']:
+            continue
+        if "NFL" in required_query and "FCS" in item['comp']:
+            continue
+        # Prevent NFL games from triggering the FCS API
+        if "FCS" in required_query and "FCS" not in item['comp']:
+            continue
 
-    for sport in SPORTS_CONFIG:
-        # --- Dynamic TTL Logic (patched for in-play) ---
-        raw_schedule = sport_schedules.get(sport['name'], [])
-        min_seconds_away = 999999
+        relevant_starts.append(item['dt'])
 
-        # Filter: Only trigger urgency if the LIVE game matches this Config's scope
-        relevant_starts = []
-        required_query = str(sport.get('text_query', '')).upper()
-        
-        for item in raw_schedule:
-            # Prevent FCS games from triggering the expensive NFL Pro API
-            if "NFL" in required_query and "NCAA" in item['comp']: 
+    if relevant_starts:
+        deltas = []
+        for dt in relevant_starts:
+            if not dt:
                 continue
-            if "NFL" in required_query and "FCS" in item['comp']:
+            seconds = (dt - now_utc).total_seconds()
+
+            # SCOPE GUARD: NBA_PREMATCH_ML -> Skip Live
+            if SCOPE_MODE.startswith("NBA_PREMATCH_ML") and seconds <= 0:
                 continue
-            # Prevent NFL games from triggering the FCS API
-            if "FCS" in required_query and "FCS" not in item['comp']:
+
+            # already started but within the in-play window -> urgent
+            if seconds <= 0 and abs(seconds) <= INPLAY_WINDOW_SECONDS:
+                deltas.append(0)
+            # upcoming -> normal
+            elif seconds > 0:
+                deltas.append(seconds)
+
+        if deltas:
+            min_seconds_away = min(deltas)
+            imminent = sum(1 for d in deltas if d < 86400)
+
+    # FALLBACK: If schedule empty BUT active rows exist, force safe refresh (600s TTL)
+    if min_seconds_away == 999999 and spy_state.runner_index and spy_state.runner_index.has_sport(sport['name']):
+        min_seconds_away = 7200
+
+    return min_seconds_away, imminent
+
+def plan_spy_ttls(now_utc):
+    """
+    🧠 ECONOMY BUDGETING: per-config urgency -> odds_quota plans a TTL per
+    odds_api_key from the credits left this month. Returns {config key: (ttl, min_seconds_away)}.
+    """
+    urgencies = {spy_config_key(sport): spy_urgency(sport, now_utc) for sport in SPORTS_CONFIG}
+
+    # Configs sharing an odds_api_key share its calls: plan on the most urgent
+    demands = {}
+    for (_, _, sport_key), (seconds_away, imminent) in urgencies.items():
+        if sport_key in demands:
+            prev_away, prev_imminent = demands[sport_key]
+            demands[sport_key] = (min(prev_away, seconds_away), prev_imminent + imminent)
+        else:
+            demands[sport_key] = (seconds_away, imminent)
+
+    ttls = odds_quota.plan(demands)
+    return {conf_key: (ttls[conf_key[2]], seconds_away) for conf_key, (seconds_away, _) in urgencies.items()}
+
+def get_h2h(bookie_obj):
+    if not bookie_obj:
+        return []
+    m = next((m for m in bookie_obj.get('markets', []) if m.get('key') == 'h2h'), None)
+    return m.get('outcomes', []) if m else []
+
+def match_spy_event(sport, event, norm_func_api, updates):
+    """Matches one Odds API event's outcomes to market_feed rows and collects their prices."""
+    strict_mode = sport.get('strict_mode', True)
+    id_to_row_map = spy_state.id_to_row_map
+
+    bookmakers = event.get('bookmakers', []) or []
+    pin_book = next((b for b in bookmakers if 'pinnacle' in str(b.get('key', '')).lower()), None)
+    ladbrokes_book = next((b for b in bookmakers if 'ladbrokes' in str(b.get('key', '')).lower()), None)
+    paddy_book = next((b for b in bookmakers if 'paddypower' in str(b.get('key', '')).lower()), None)
+
+    ref_outcomes = get_h2h(pin_book) or get_h2h(ladbrokes_book) or get_h2h(paddy_book)
+    if not ref_outcomes:
+        return
+
+    api_home = norm_func_api(event.get('home_team'))
+    api_away = norm_func_api(event.get('away_team'))
+    try:
+        api_start = datetime.fromisoformat(event['commence_time'].replace('Z', '+00:00'))
+    except:
+        return
+
+    def find_price(odds_list, target_name):
+        target_norm = norm_func_api(target_name)
+        for o in odds_list or []:
+            o_name = o.get('name')
+            if not o_name:
                 continue
+            o_norm = norm_func_api(o_name)
+            if check_match(o_norm, target_norm):
+                return o.get('price')
+        return None
+
+    for outcome in ref_outcomes:
+        raw_name = outcome.get('name')
+        if not raw_name:
+            continue
 
-            relevant_starts.append(item['dt'])
+        # Fast path: this outcome was resolved on a previous cycle
+        cache_key = MatchCache.key(sport['odds_api_key'], event.get('id'), raw_name)
+        matched_row = match_cache.lookup(cache_key, id_to_row_map, api_start, strict_mode)
 
-        if relevant_starts:
-            deltas = []
-            for dt in relevant_starts:
-                if not dt:
-                    continue
-                seconds = (dt - now_utc).total_seconds()
+        if matched_row is None:
+            # BLOCK COLLISION + Time Check + Runner/Event Match (see matching.RunnerIndex)
+            norm_name = norm_func_api(raw_name)
+            matched_row = spy_state.runner_index.match(sport, api_start, norm_name, api_home, api_away)
+            if matched_row and event.get('id'):
+                match_cache.store(cache_key, id_to_row_map[matched_row['id']])
 
-                # SCOPE GUARD: NBA_PREMATCH_ML -> Skip Live
-                if SCOPE_MODE.startswith("NBA_PREMATCH_ML") and seconds <= 0:
-                    continue
+        matched_id = matched_row['id'] if matched_row else None
+
+        if matched_id:
+            tracker.log_match(sport['name'], True)
+
+        if not matched_id:
+            continue
+
+        row_id = matched_id
+        if row_id not in updates:
+            orig_row = id_to_row_map.get(row_id, {})
+            updates[row_id] = {
+                'id': row_id,
+                'sport': orig_row.get('sport'),
+                'market_id': orig_row.get('market_id'),
+                'runner_name': orig_row.get('runner_name'),
+                'last_updated': clock.now_utc().isoformat()
+            }
+
+        p = find_price(get_h2h(pin_book), raw_name)
+        if p is not None:
+            updates[row_id]['price_pinnacle'] = p
+
+        price_ladbrokes = find_price(get_h2h(ladbrokes_book), raw_name)
+        if price_ladbrokes is not None:
+            updates[row_id]['price_bet365'] = price_ladbrokes
+
+        p = find_price(get_h2h(paddy_book), raw_name)
+        if p is not None:
+            updates[row_id]['price_paddy'] = p
+
+def write_spy_updates(updates):
+    """Bookmaker columns -> row_store (merged with the exchange columns, flushed by write_behind)."""
+    # Rows pruned with their market (gone from the catalogue) would come back as
+    # bookmaker-only rows without the exchange columns: skip them
+    rows = [row for row in updates.values() if row_store.get(feed_key(row)) is not None]
+    if len(rows) < len(updates):
+        logger.info(f"Spy: skipped {len(updates) - len(rows)} rows of markets no longer in the catalogue")
+    write_behind.update_many(rows)
+
+# --- MAIN ENGINE ---
+def run_spy():
+    global startup_sweep_done
+    logger.info("🕵️  Running Spy (Forensic Mode)...")
+
+    # Full cycle: re-read market_feed and re-process every event
+    full_cycle = not SPY_INCREMENTAL or DEBUG_MODE or spy_state.runner_index is None \
+        or (clock.now() - spy_state.synced_at) >= SPY_RESYNC_SECONDS
+
+    if full_cycle:
+        # --- CLEANUP STEP (Pre-match Strict Mode) ---
+        # Once per process: rows this process never saw on Betfair. After that,
+        # close_started_markets() closes each market when it becomes due.
+        if SCOPE_MODE.startswith("NBA_PREMATCH_ML") and not startup_sweep_done:
+            try:
+                now_iso = clock.now_utc().isoformat()
+                # 1. Close started games
+                supabase.table('market_feed').update({'market_status': 'CLOSED'}) \
+                    .lt('start_time', now_iso).eq('market_status', 'OPEN').execute()
+                # 2. Close explicitly marked in-play games
+                supabase.table('market_feed').update({'market_status': 'CLOSED'}) \
+                    .eq('in_play', True).eq('market_status', 'OPEN').execute()
+                startup_sweep_done = True
+            except Exception as e:
+                logger.error(f"Cleanup Error: {e}")
+        # --------------------------------------------
+
+        if not load_spy_rows():
+            return
+        spy_state.payload_fingerprints.clear()
+        spy_state.event_signatures.clear()
+
+    tracker.__init__()
+    match_cache.reset_stats()
+
+    updates = {}
+    skipped_events = 0
+    now_utc = clock.now_utc()
+    spy_ttls = plan_spy_ttls(now_utc)
+    payloads = {}
 
-                # already started but within the in-play window -> urgent
-                if seconds <= 0 and abs(seconds) <= INPLAY_WINDOW_SECONDS:
-                    deltas.append(0)
-                # upcoming -> normal
-                elif seconds > 0:
-                    deltas.append(seconds)
-
-            if deltas:
-                min_seconds_away = min(deltas)
-
-        # FALLBACK: If schedule empty BUT active rows exist, force safe refresh (600s TTL)
-        if min_seconds_away == 999999 and any(r['sport'] == sport['name'] for r in active_rows):
-            min_seconds_away = 7200
-
-        # 🧠 ECONOMY BUDGETING (Target: ~288 calls/day per sport)
-        # Allows for 2-3 sports on a 20k/month plan.
-        if min_seconds_away == 0:
-            ttl = 60                      # Live: Standard
-        elif min_seconds_away < 86400:    # < 24 Hours (DAY OF GAME)
-            ttl = 300                     # ⚡ Economy: 5 mins (Balance fresh vs budget)
-        else:                             # > 24 Hours (FUTURE)
-            ttl = 3600                    # 🧊 Hibernate: 1 hour updates
+    for sport in SPORTS_CONFIG:
+        ttl, min_seconds_away = spy_ttls[spy_config_key(sport)]
 
         # 🔍 DEBUG: Print exactly why we are sleeping
         if min_seconds_away < 86400:
-             logger.info(f"[{sport['name']}] Active Cycle (Game in {min_seconds_away/3600:.1f}h) -> TTL: {ttl}s")
+             logger.info(f"[{sport['name']}] Active Cycle (Game in {min_seconds_away/3600:.1f}h) -> TTL: {ttl:.0f}s")
 
-        data = fetch_cached_odds(sport['odds_api_key'], ttl_seconds=ttl)
+        # One fetch per odds_api_key per cycle (NCAA Football and FCS share americanfootball_ncaaf)
+        if sport['odds_api_key'] not in payloads:
+            payloads[sport['odds_api_key']] = fetch_cached_odds(odds_requests[sport['odds_api_key']], ttl_seconds=ttl)
+        data = payloads[sport['odds_api_key']]
 
         if isinstance(data, dict) and 'message' in data:
             logger.warning(f"API MESSAGE ({sport['name']}): {data['message']}")
             continue
 
         # 📊 MONITORING: Check Data Age
-        cache_file = os.path.join(CACHE_DIR, f"{sport['odds_api_key']}.json")
-        data_age = time.time() - os.path.getmtime(cache_file) if os.path.exists(cache_file) else 0
-        
+        data_age = odds_cache.age(sport['odds_api_key']) or 0
+
         # Log based on budget zones
         if min_seconds_away < 86400: # Day of Game
-            if data_age > 320: # Allow slight buffer over 300s
-                logger.warning(f"⚠️  STALE (ACTIVE): {sport['name']} is {data_age:.1f}s old (Target: 300s)")
+            if data_age > ttl + 20: # Allow slight buffer over the planned TTL
+                logger.warning(f"⚠️  STALE (ACTIVE): {sport['name']} is {data_age:.1f}s old (Target: {ttl:.0f}s)")
             else:
                 logger.info(f"✅ FRESH (ACTIVE): {sport['name']} is {data_age:.1f}s old")
         else:
-            logger.info(f"💤 ECO MODE: {sport['name']} is {data_age:.0f}s old (TTL: {ttl}s)")
+            logger.info(f"💤 ECO MODE: {sport['name']} is {data_age:.0f}s old (TTL: {ttl:.0f}s)")
+
+        # 🧬 FINGERPRINT: Skip the whole payload if no consumed bookmaker moved
+        conf_key = spy_config_key(sport)
+        signatures = [(event.get('id'), event_signature(event)) for event in data]
+        fingerprint = hash(tuple(signatures))
+        if spy_state.payload_fingerprints.get(conf_key) == fingerprint:
+            skipped_events += len(signatures)
+            continue
+        spy_state.payload_fingerprints[conf_key] = fingerprint
 
-        strict_mode = sport.get('strict_mode', True)
         config_is_af = 'americanfootball' in sport['odds_api_key']
         norm_func_api = normalize_af if config_is_af else normalize
 
-        for event in data:
+        for event, (event_id, signature) in zip(data, signatures):
             tracker.log_event(sport['name'], 'api')
 
+            # Only events whose prices actually changed since we last matched them
+            if event_id is not None:
+                sig_key = (conf_key, event_id)
+                if spy_state.event_signatures.get(sig_key) == signature:
+                    skipped_events += 1
+                    continue
+                spy_state.event_signatures[sig_key] = signature
+
             # === MMA DRAGNET (DEBUG ONLY) ===
             if DEBUG_MODE and sport['name'] == 'MMA':
                 present = [b['key'] for b in event.get('bookmakers', [])]
@@ -389,131 +601,17 @@ def run_spy():
                 print("-" * 30)
             # ===============================
 
-            def get_h2h(bookie_obj):
-                if not bookie_obj:
-                    return []
-                m = next((m for m in bookie_obj.get('markets', []) if m.get('key') == 'h2h'), None)
-                return m.get('outcomes', []) if m else []
-
-            bookmakers = event.get('bookmakers', []) or []
-            pin_book = next((b for b in bookmakers if 'pinnacle' in str(b.get('key', '')).lower()), None)
-            ladbrokes_book = next((b for b in bookmakers if 'ladbrokes' in str(b.get('key', '')).lower()), None)
-            paddy_book = next((b for b in bookmakers if 'paddypower' in str(b.get('key', '')).lower()), None)
-
-            ref_outcomes = get_h2h(pin_book) or get_h2h(ladbrokes_book) or get_h2h(paddy_book)
-            if not ref_outcomes:
-                continue
-
-            api_home = norm_func_api(event.get('home_team'))
-            api_away = norm_func_api(event.get('away_team'))
-            try:
-                api_start = datetime.fromisoformat(event['commence_time'].replace('Z', '+00:00'))
-            except:
-                continue
-
-            for outcome in ref_outcomes:
-                matched_id = None
-                raw_name = outcome.get('name')
-                if not raw_name:
-                    continue
-                norm_name = norm_func_api(raw_name)
-
-                for row in active_rows:
-                    # BLOCK COLLISION: Ensure NFL only matches NFL, etc.
-                    # row['sport'] is the DB label ('NFL'), sport['name'] is from config
-                    if row['sport'] != sport['name']:
-                        continue
-                        
-                    # REPAIRED: Sub-Sport Check (Case-Insensitive)
-                    is_ncaa_api = 'ncaaf' in sport['odds_api_key'].lower()
-                    
-                    # Inspect for College indicators
-                    event_name_raw = str(row.get('event_name') or "").upper()
-                    comp_name_raw = str(id_to_row_map.get(row['id'], {}).get('competition') or "").upper()
-                    sport_label = str(row.get('sport') or "").upper()
-                    
-                    # Logic: Is this specific DB row a College game?
-                    is_ncaa_db = any(x in event_name_raw or x in comp_name_raw or x in sport_label for x in ['NCAA', 'COLLEGE', 'FCS'])
-                    
-                    # Relax: Only block if it is explicitly NFL vs NCAA mismatch.
-                    if sport['name'] == 'NFL' and is_ncaa_api != is_ncaa_db:
-                        continue
-                    
-                    # 1. Time Check (Unchanged)
-                    tolerance = 108000 if not strict_mode else 43200
-                    delta = abs((row['start_time'] - api_start).total_seconds())
-                    if delta > tolerance:
-                        continue
-
-                    # 2. Direct & Fuzzy Runner Match
-                    # Priority: Exact match, then Alias Map, then substring
-                    runner_match = (norm_name == row['norm_runner']) or \
-                                   check_match(norm_name, row['norm_runner']) or \
-                                   (norm_name in row['norm_runner'] or row['norm_runner'] in norm_name)
-                    
-                    is_match = False
-
-                    if strict_mode:
-                        # Fuzzy Event Match (Home or Away team check)
-                        event_match = (api_home in row['norm_event'] or api_away in row['norm_event'])
-                        if runner_match and event_match:
-                            is_match = True
-                    else:
-                        if runner_match:
-                            is_match = True
-
-                    if is_match:
-                        matched_id = row['id']
-                        break
-
-                if matched_id:
-                    tracker.log_match(sport['name'], True)
-
-                if not matched_id:
-                    continue
-
-                row_id = matched_id
-                if row_id not in updates:
-                    orig_row = id_to_row_map.get(row_id, {})
-                    updates[row_id] = {
-                        'id': row_id,
-                        'sport': orig_row.get('sport'),
-                        'market_id': orig_row.get('market_id'),
-                        'runner_name': orig_row.get('runner_name'),
-                        'last_updated': datetime.now(timezone.utc).isoformat()
-                    }
-
-                def find_price(odds_list, target_name):
-                    target_norm = norm_func_api(target_name)
-                    for o in odds_list or []:
-                        o_name = o.get('name')
-                        if not o_name:
-                            continue
-                        o_norm = norm_func_api(o_name)
-                        if check_match(o_norm, target_norm):
-                            return o.get('price')
-                    return None
-
-                p = find_price(get_h2h(pin_book), raw_name)
-                if p is not None:
-                    updates[row_id]['price_pinnacle'] = p
-
-                price_ladbrokes = find_price(get_h2h(ladbrokes_book), raw_name)
-                if price_ladbrokes is not None:
-                    updates[row_id]['price_bet365'] = price_ladbrokes
-
-                p = find_price(get_h2h(paddy_book), raw_name)
-                if p is not None:
-                    updates[row_id]['price_paddy'] = p
+            match_spy_event(sport, event, norm_func_api, updates)
 
     tracker.report()
+    odds_quota.report()
+    logger.info(f"🧠 Match cache: {match_cache.hits} hits / {match_cache.misses} misses | "
+                f"{'FULL' if full_cycle else 'INCREMENTAL'} cycle, {skipped_events} unchanged events skipped")
+    match_cache.save()
 
     if updates:
         logger.info(f"Spy: Updating {len(updates)} rows...")
-        data_list = list(updates.values())
-        for i in range(0, len(data_list), 100):
-            # Use upsert with id as conflict target to refresh timestamps and prices
-            supabase.table('market_feed').upsert(data_list[i:i+100], on_conflict='id').execute()
+        write_spy_updates(updates)
 
 def chunker(seq, size):
     return (seq[pos:pos + size] for pos in range(0, len(seq), size))
@@ -525,7 +623,7 @@ def run_snapshot_cycle(active_data):
     """Writes RICH history (back/lay/sport) for the Trade Ticket engine."""
     global last_snapshot_time
     # Throttle: Run every 45s to balance data density vs DB load
-    if time.time() - last_snapshot_time < 45: 
+    if clock.now() - last_snapshot_time < 45: 
         return
 
     if not active_data:
@@ -534,7 +632,7 @@ def run_snapshot_cycle(active_data):
     logger.info(f"📸 Snapshotting {len(active_data)} markets (High Fidelity)...")
     
     snapshot_rows = []
-    timestamp = datetime.now(timezone.utc).isoformat()
+    timestamp = clock.now_utc().isoformat()
 
     for row in active_data:
         # 1. Safe Price Extraction
@@ -571,22 +669,27 @@ def run_snapshot_cycle(active_data):
         })
 
     if snapshot_rows:
-        try:
-            # Chunked Insert
-            for i in range(0, len(snapshot_rows), 100):
-                chunk = snapshot_rows[i:i+100]
-                supabase.table('market_snapshots').insert(chunk).execute()
-            
-            # Prune old data (Keep last 24h)
-            if time.time() % 100 < 5: # 5% chance per cycle
-                old_cutoff = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
-                supabase.table('market_snapshots').delete().lt('ts', old_cutoff).execute()
-                
-            last_snapshot_time = time.time()
-        except Exception as e:
-            logger.error(f"Snapshot Error: {e}")
+        # Chunked insert on the writer thread
+        write_behind.insert('market_snapshots', snapshot_rows)
+
+        # Prune old data (Keep last 24h)
+        if clock.now() % 100 < 5: # 5% chance per cycle
+            old_cutoff = (clock.now_utc() - timedelta(hours=24)).isoformat()
+            write_behind.delete_older('market_snapshots', 'ts', old_cutoff)
+
+        last_snapshot_time = clock.now()
 # =============================
 
+def merge_market_book(sport_conf, book, best_price_map, now_utc, update_time):
+    market_info = catalogue.market(book.market_id)
+    market_state.observe(book.market_id, book.status, book.inplay,
+                         market_info.market_start_time if market_info else None)
+
+    # SCOPE GUARD: NBA_PREMATCH_ML -> Skip In-Play (and markets we've closed)
+    if SCOPE_MODE.startswith("NBA_PREMATCH_ML") and (book.inplay or market_state.is_closed(book.market_id)):
+        return
+    merge_catalogue_book(catalogue, sport_conf, book, best_price_map, now_utc, update_time)
+
 def fetch_betfair():
     if not trading.session_token:
         try:
@@ -595,153 +698,166 @@ def fetch_betfair():
         except Exception as e:
             logger.error(f"❌ LOGIN FAILED: {e}")
             logger.warning("⏳ Pausing for 2 mins to avoid account lock...")
-            time.sleep(120)  # PENALTY BOX: Stop spamming login!
+            clock.sleep(120)  # PENALTY BOX: Stop spamming login!
             return
         
-    update_time = datetime.now(timezone.utc).isoformat()
+    update_time = clock.now_utc().isoformat()
     best_price_map = {}
 
+    # 1. Plan: only markets whose poll tier is due, weight-packed across every configured sport
+    plan = []
+    config_ids = []
+    planned = set()
+    catalogue_failed = False
+    now = clock.now()
     for sport_conf in SPORTS_CONFIG:
         try:
-            now_utc = datetime.now(timezone.utc)
-            now_pd = pd.Timestamp.now(tz='UTC')
-
-            filter_args = {
-                'market_type_codes': ['MATCH_ODDS'],
-                'market_start_time': {
-                    'from': (now_pd - pd.Timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    'to': (now_pd + pd.Timedelta(days=90)).strftime("%Y-%m-%dT%H:%M:%SZ")
-                }
-            }
-
-            if 'competition_id' in sport_conf:
-                filter_args['competition_ids'] = [sport_conf['competition_id']]
-            else:
-                filter_args['event_type_ids'] = [sport_conf['betfair_id']]
-                if 'text_query' in sport_conf:
-                    filter_args['text_query'] = sport_conf['text_query']
+            # Catalogue comes from cache (slow refresh + id-only discovery of new markets)
+            market_ids = catalogue.market_ids(trading, sport_conf)
+        except Exception as e:
+            logger.error(f"Error fetching {sport_conf['name']}: {e}")
+            catalogue_failed = True
+            continue
 
-            market_filter = filters.market_filter(**filter_args)
+        if not market_ids:
+            logger.warning(f"⚠️ No markets found for {sport_conf['name']} (Check Query/Filter)")
+            continue
 
-            markets = trading.betting.list_market_catalogue(
-                filter=market_filter,
-                max_results=500,
-                market_projection=['MARKET_START_TIME', 'EVENT', 'COMPETITION', 'RUNNER_METADATA'],
-                sort='FIRST_TO_START'
-            )
-            
-            # DIAGNOSTIC LOG: Check what we actually found
-            logger.info(f"🔎 SEARCH {sport_conf['name']}: Found {len(markets)} markets")
-            
-            if not markets:
-                logger.warning(f"⚠️ No markets found for {sport_conf['name']} (Check Query/Filter)")
-                continue
-                continue
+        config_ids.append((sport_conf, market_ids))
+        due_ids = poll_scheduler.due(market_ids, catalogue, now, exclude=planned)
+        planned.update(due_ids)
+        plan.extend((sport_conf, batch) for batch in plan_batches(due_ids, BOOK_REQUEST_WEIGHT))
+
+    live_ids = {m_id for _, market_ids in config_ids for m_id in market_ids}
+    # A config whose catalogue errored has no ids this cycle, not closed markets: keep its state
+    if not catalogue_failed:
+        poll_scheduler.prune(live_ids)
+        market_state.prune(live_ids)
+        row_store.prune(lambda row: row['market_id'] in live_ids)
+    if not plan:
+        return
 
-            price_projection = filters.price_projection(price_data=['EX_BEST_OFFERS', 'EX_TRADED'], virtualise=True)
-            market_ids = [m.market_id for m in markets]
-
-            for batch in chunker(market_ids, 10):
-                market_books = trading.betting.list_market_book(market_ids=batch, price_projection=price_projection)
-
-                for book in market_books:
-                    # SCOPE GUARD: NBA_PREMATCH_ML -> Skip In-Play
-                    if SCOPE_MODE.startswith("NBA_PREMATCH_ML") and book.inplay:
-                        continue
-
-                    market_info = next((m for m in markets if m.market_id == book.market_id), None)
-                    if not market_info:
-                        continue
-
-                    start_dt = market_info.market_start_time
-                    if start_dt.tzinfo is None:
-                        start_dt = start_dt.replace(tzinfo=timezone.utc)
-
-                    seconds_to_start = (start_dt - now_utc).total_seconds()
-                    volume = book.total_matched or 0
-
-                    # Ignore markets with < £10 matched if they are starting soon
-                    if volume < 10 and seconds_to_start < 3600:
-                        continue
-
-                    comp_name = market_info.competition.name if market_info.competition else "Unknown League"
-
-                    for runner in book.runners:
-                        if runner.status != 'ACTIVE':
-                            continue
-
-                        runner_details = next((r for r in market_info.runners if r.selection_id == runner.selection_id), None)
-                        if not runner_details:
-                            continue
-
-                        name = runner_details.runner_name
-                        back = runner.ex.available_to_back[0].price if runner.ex.available_to_back else 0.0
-                        lay = runner.ex.available_to_lay[0].price if runner.ex.available_to_lay else 0.0
-
-                        dedup_key = f"{market_info.event.name}_{name}"
-                        current_best = best_price_map.get(dedup_key)
-
-                        if not current_best or volume > current_best['volume']:
-                            best_price_map[dedup_key] = {
-                                "sport": sport_conf['name'],
-                                "market_id": book.market_id,
-                                "event_name": market_info.event.name,
-                                "runner_name": name,
-                                "competition": comp_name,
-                                "back_price": back,
-                                "lay_price": lay,
-                                "volume": int(volume),
-                                "start_time": market_info.market_start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                                "in_play": book.inplay,
-                                "market_status": book.status,
-                                "last_updated": update_time
-                            }
+    # 2. Dispatch concurrently (results come back in plan order)
+    price_projection = filters.price_projection(price_data=BOOK_PRICE_DATA, virtualise=True)
+    results = book_dispatcher.fetch(trading.betting, [batch for _, batch in plan], price_projection)
+    logger.info(f"📚 Books: {len(plan)} requests in {book_dispatcher.last_latency:.2f}s ({book_dispatcher.workers} workers)")
 
+    polled_ids = set()
+    for market_books in results:
+        if market_books is None:
+            continue
+        poll_scheduler.observe(market_books, now)
+        polled_ids.update(book.market_id for book in market_books)
+    poll_scheduler.report(len(polled_ids), len(live_ids))
+
+    # 3. Merge deterministically in catalogue order. Markets not polled this cycle
+    # merge their last book so the highest-volume dedup still sees every market.
+    now_utc = clock.now_utc()
+    for sport_conf, market_ids in config_ids:
+        try:
+            for market_id in market_ids:
+                book = poll_scheduler.book(market_id)
+                if book is not None:
+                    merge_market_book(sport_conf, book, best_price_map, now_utc, update_time)
         except Exception as e:
             logger.error(f"Error fetching {sport_conf['name']}: {e}")
 
+    # Unpolled markets merge identical content, so row_store only writes them on heartbeat
     if best_price_map:
+        publish_exchange_rows(list(best_price_map.values()))
+
+def publish_exchange_rows(rows, snapshot_rows=None):
+    """Exchange columns -> row_store (flushed by write_behind), then the snapshot path (full active set)."""
+    write_behind.update_many(rows)
+    try:
+        # --- TRIGGER SNAPSHOT ---
+        run_snapshot_cycle(snapshot_rows if snapshot_rows is not None else rows)
+    except Exception as e:
+        logger.error(f"Database Error: {e}")
+
+def session_guard():
+    """SESSION GUARD: Refresh hourly (Running every 6s = Auth Ban)"""
+    global last_keep_alive
+    if trading.session_token and (clock.now() - last_keep_alive > 3600):
         try:
-            final_data = list(best_price_map.values())
-            supabase.table('market_feed').upsert(final_data, on_conflict='market_id, runner_name').execute()
-            logger.info(f"⚡ Synced {len(final_data)} items (High Volume filtered).")
-            
-            # --- TRIGGER SNAPSHOT ---
-            run_snapshot_cycle(final_data)
-            
-        except Exception as e:
-            logger.error(f"Database Error: {e}")
+            trading.keep_alive()
+            last_keep_alive = clock.now()
+            logger.info("🔄 Session Keep-Alive Refreshed")
+        except:
+            trading.login()
+
+def run_side_cycles():
+    """Spy + alerts, shared by the polling and streaming engines."""
+    global last_spy_run, last_alert_rescan
+
+    # Dynamic spy interval: fast during in-play, slow otherwise
+    spy_interval = INPLAY_SPY_INTERVAL if market_state.any_inplay() else PREMATCH_SPY_INTERVAL
+
+    if SCOPE_MODE.startswith("NBA_PREMATCH_ML"):
+        close_started_markets()
+
+    if clock.now() - last_spy_run > spy_interval:
+        run_spy()
+        last_spy_run = clock.now()
+
+    # --- INDEPENDENCE V4 ALERTS ---
+    # Straight from the in-process rows: only rows whose prices moved, plus a
+    # periodic rescan of everything so cooldown re-alerts still fire
+    try:
+        if clock.now() - last_alert_rescan > telegram_alerts.ALERT_RESCAN_SECONDS:
+            row_store.take_changed()
+            alert_rows = row_store.all_rows()
+            last_alert_rescan = clock.now()
+        else:
+            alert_rows = row_store.take_changed()
+        telegram_alerts.run_alert_cycle(rows=alert_rows)
+    except Exception as e:
+        logger.error(f"Alert Cycle Failed: {e}")
+
+def run_stream_engine():
+    """--stream: Exchange Stream API deltas instead of listMarketBook polling."""
+    while not trading.session_token:
+        fetch_betfair()  # logs in (with the penalty box on failure) and seeds the feed once
+
+    exchange_stream = ExchangeStream(SPORTS_CONFIG, catalogue, merge_market_book)
+    exchange_stream.refresh_routes(trading)
+    exchange_stream.start(trading, record_path=STREAM_RECORD_FILE)
+
+    last_side_cycle = 0
+
+    while True:
+        market_books = exchange_stream.drain(timeout=1.0)
+        if market_books:
+            changed = exchange_stream.apply(market_books, clock.now_utc().isoformat())
+            if changed:
+                publish_exchange_rows(changed, exchange_stream.current_rows())
+
+        # Same 6s cadence as the polling loop for everything that is not price ingestion
+        if clock.now() - last_side_cycle >= 6:
+            session_guard()
+            exchange_stream.refresh_routes(trading)
+            exchange_stream.ensure_running(trading)
+            run_side_cycles()
+            last_side_cycle = clock.now()
+
+def run_poll_cycle():
+    """One polling-engine cycle (replay_traffic.py drives the same function)."""
+    session_guard()
+    fetch_betfair()
+    write_behind.kick()  # flush exchange prices now rather than on the cadence
+    run_side_cycles()
 
 if __name__ == "__main__":
     logger.info("--- STARTING UNIVERSAL ENGINE ---")
+    write_behind.start()
     run_spy()
-    
-    last_keep_alive = time.time()
+
+    if STREAM_MODE:
+        logger.info("📡 ENGINE MODE: Exchange Stream")
+        run_stream_engine()
 
     while True:
-        # SESSION GUARD: Refresh hourly (Running every 6s = Auth Ban)
-        if trading.session_token and (time.time() - last_keep_alive > 3600):
-            try:
-                trading.keep_alive()
-                last_keep_alive = time.time()
-                logger.info("🔄 Session Keep-Alive Refreshed")
-            except:
-                trading.login()
-                
-        fetch_betfair()
-
-        # Dynamic spy interval: fast during in-play, slow otherwise
-        spy_interval = INPLAY_SPY_INTERVAL if has_inplay_markets() else PREMATCH_SPY_INTERVAL
-
-        if time.time() - last_spy_run > spy_interval:
-            run_spy()
-            last_spy_run = time.time()
-
-        # --- INDEPENDENCE V4 ALERTS ---
-        try:
-            telegram_alerts.run_alert_cycle(supabase)
-        except Exception as e:
-            logger.error(f"Alert Cycle Failed: {e}")
+        run_poll_cycle()
 
         # RATE LIMIT GUARD: Do not run faster than 1 cycle per 6s (approx 600-1200 calls/hr)
-        time.sleep(6)
\ No newline at end of file
+        clock.sleep(POLL_INTERVAL_SECONDS)
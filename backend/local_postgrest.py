@@ -0,0 +1,482 @@
+import os
+import csv
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone, timedelta
+from urllib.parse import parse_qsl
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+logger = logging.getLogger(__name__)
+
+# --- LOCAL POSTGREST SETTINGS ---
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', 'local_postgrest.db')
+LOCAL_DB_LATENCY_MS = float(os.getenv('LOCAL_DB_LATENCY_MS', '0'))        # per request (+ up to 50% jitter)
+LOCAL_DB_ROW_LATENCY_MS = float(os.getenv('LOCAL_DB_ROW_LATENCY_MS', '0'))  # per row sent or returned
+LOCAL_DB_MAX_ROWS = int(os.getenv('LOCAL_DB_MAX_ROWS', '1000'))           # PostgREST db-max-rows (Supabase: 1000)
+
+# Column types as PostgREST would see them; 'id' is the identity primary key
+TABLES = {
+    'market_feed': {
+        'columns': {
+            'id': 'int', 'sport': 'text', 'market_id': 'text', 'event_name': 'text', 'runner_name': 'text',
+            'competition': 'text', 'back_price': 'float', 'lay_price': 'float', 'volume': 'float',
+            'start_time': 'timestamptz', 'in_play': 'bool', 'market_status': 'text', 'last_updated': 'timestamptz',
+            'price_pinnacle': 'float', 'price_bet365': 'float', 'price_paddy': 'float',
+        },
+        'unique': [('market_id', 'runner_name')],
+    },
+    'market_snapshots': {
+        'columns': {
+            'id': 'int', 'selection_key': 'text', 'ts': 'timestamptz', 'market_id': 'text', 'sport': 'text',
+            'event_name': 'text', 'runner_name': 'text', 'back_price': 'float', 'lay_price': 'float',
+            'mid_price': 'float', 'volume': 'float',
+        },
+        'unique': [],
+    },
+}
+SQL_TYPES = {'text': 'TEXT', 'int': 'INTEGER', 'float': 'REAL', 'bool': 'INTEGER', 'timestamptz': 'INTEGER'}
+HTTP_FILTERS = {'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in'}
+HTTP_STATUS = {'42P01': 404, '42703': 400, 'PGRST204': 400, '22P02': 400, '42P10': 400, '23505': 409}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class LocalPostgrestError(Exception):
+    """Carries code / message like postgrest's APIError, so callers' error paths are exercised the same way."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+# ==========================================
+# TYPES
+# ==========================================
+def to_db(kind, value):
+    """JSON value (or filter operand, which the real client sends as text) -> SQLite value."""
+    if value is None:
+        return None
+    try:
+        if kind == 'bool':
+            if isinstance(value, str):
+                text = value.strip().lower()
+                if text in ('true', 't', 'yes', 'on', '1'):
+                    return 1
+                if text in ('false', 'f', 'no', 'off', '0'):
+                    return 0
+                raise ValueError(value)
+            return 1 if value else 0
+        if kind == 'timestamptz':
+            if not isinstance(value, str):
+                raise ValueError(value)
+            dt = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)     # Supabase sessions run in UTC
+            return (dt - EPOCH) // MICROSECOND
+        if kind == 'int':
+            number = float(value)
+            if not number.is_integer():
+                raise ValueError(value)
+            return int(number)
+        if kind == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        raise LocalPostgrestError('22P02', f'invalid input syntax for type {kind}: "{value}"')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def from_db(kind, value):
+    """SQLite value -> what PostgREST's JSON would decode to."""
+    if value is None:
+        return None
+    if kind == 'bool':
+        return bool(value)
+    if kind == 'timestamptz':
+        text = (EPOCH + value * MICROSECOND).isoformat()
+        if '.' in text:
+            # Postgres drops trailing zeros of the fraction
+            head, rest = text.split('.', 1)
+            text = f"{head}.{rest[:6].rstrip('0')}{rest[6:]}"
+        return text
+    if kind == 'float':
+        # float8 renders as a JSON number: integral values decode as int
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+# ==========================================
+# QUERY BUILDER
+# ==========================================
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LocalQuery:
+    """The postgrest-py builder chain the engine uses: one verb, filters, order/limit/range, execute()."""
+
+    def __init__(self, db, table):
+        if table not in db.schemas:
+            raise LocalPostgrestError('42P01', f'relation "public.{table}" does not exist')
+        self.db = db
+        self.table = table
+        self.schema = db.schemas[table]
+        self.op = None
+        self.payload = None
+        self.columns = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.returning = True
+        self.filters = []            # (sql, params)
+        self.orders = []
+        self.limit_to = None
+        self.offset = 0
+
+    def _column(self, column):
+        column = column.strip()
+        if column not in self.schema['columns']:
+            raise LocalPostgrestError('42703', f'column {self.table}.{column} does not exist')
+        return column
+
+    @staticmethod
+    def _returns(returning):
+        return str(getattr(returning, 'value', returning)) != 'minimal'
+
+    def _rows(self, json):
+        rows = json if isinstance(json, list) else [json]
+        columns = []
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    if column not in self.schema['columns']:
+                        raise LocalPostgrestError(
+                            'PGRST204', f"Could not find the '{column}' column of '{self.table}' in the schema cache")
+                    columns.append(column)
+        return rows, columns
+
+    # --- VERBS ---
+    def select(self, *columns, count=None):
+        self.op = 'select'
+        names = [c.strip() for part in (columns or ('*',)) for c in part.split(',')]
+        self.columns = None if names == ['*'] else [self._column(c) for c in names]
+        return self
+
+    def insert(self, json, *, count=None, returning='representation', upsert=False, default_to_null=True):
+        self.op = 'upsert' if upsert else 'insert'
+        self.payload = self._rows(json)
+        self.on_conflict = ('id',)
+        self.returning = self._returns(returning)
+        return self
+
+    def upsert(self, json, *, count=None, returning='representation', ignore_duplicates=False, on_conflict='',
+               default_to_null=True):
+        self.op = 'upsert'
+        self.payload = self._rows(json)
+        self.on_conflict = tuple(self._column(c) for c in on_conflict.split(',')) if on_conflict else ('id',)
+        self.ignore_duplicates = ignore_duplicates
+        self.returning = self._returns(returning)
+        return self
+
+    def update(self, json, *, count=None, returning='representation'):
+        self.op = 'update'
+        self.payload = {self._column(c): v for c, v in json.items()}
+        self.returning = self._returns(returning)
+        return self
+
+    def delete(self, *, count=None, returning='representation'):
+        self.op = 'delete'
+        self.returning = self._returns(returning)
+        return self
+
+    # --- FILTERS ---
+    def _filter(self, column, operator, value):
+        # Operands travel as text in the query string, exactly as postgrest-py formats them
+        column = self._column(column)
+        self.filters.append((f'"{column}" {operator} ?', [to_db(self.schema['columns'][column], str(value))]))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, '=', value)
+
+    def neq(self, column, value):
+        return self._filter(column, '<>', value)
+
+    def gt(self, column, value):
+        return self._filter(column, '>', value)
+
+    def gte(self, column, value):
+        return self._filter(column, '>=', value)
+
+    def lt(self, column, value):
+        return self._filter(column, '<', value)
+
+    def lte(self, column, value):
+        return self._filter(column, '<=', value)
+
+    def in_(self, column, values):
+        column = self._column(column)
+        values = [to_db(self.schema['columns'][column], str(v)) for v in values]
+        if not values:
+            self.filters.append(('0', []))
+        else:
+            self.filters.append((f'"{column}" IN ({",".join("?" * len(values))})', values))
+        return self
+
+    def order(self, column, *, desc=False, nullsfirst=None):
+        # Postgres defaults: NULLS LAST ascending, NULLS FIRST descending
+        nullsfirst = desc if nullsfirst is None else nullsfirst
+        self.orders.append(f'"{self._column(column)}" {"DESC" if desc else "ASC"} NULLS {"FIRST" if nullsfirst else "LAST"}')
+        return self
+
+    def limit(self, size):
+        self.limit_to = size
+        return self
+
+    def range(self, start, end):
+        self.offset = start
+        self.limit_to = end - start + 1
+        return self
+
+    def execute(self):
+        return self.db.run(self)
+
+
+class LocalPostgrest:
+    """
+    SQLite-backed stand-in for the supabase client (client.table(...) and the
+    builder chain above), for load tests that must not touch production. It
+    keeps the PostgREST behaviours the engine depends on: upserts resolve on
+    the on_conflict columns (which must be a unique key), a bulk write's
+    column set is the union of its rows' keys (missing keys become NULL),
+    filter operands are cast to the column type, ordering puts NULLs where
+    Postgres does, and every read is capped at max_rows. Each request can be
+    charged a latency (plus jitter and a per-row cost); requests and rows are
+    counted per table and verb.
+    """
+
+    def __init__(self, path=LOCAL_DB_PATH, latency=LOCAL_DB_LATENCY_MS / 1000.0,
+                 row_latency=LOCAL_DB_ROW_LATENCY_MS / 1000.0, max_rows=LOCAL_DB_MAX_ROWS, tables=TABLES, seed=None):
+        self.path = path
+        self.latency = latency
+        self.row_latency = row_latency
+        self.max_rows = max_rows
+        self.schemas = tables
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            for name, schema in tables.items():
+                columns = ['"id" INTEGER PRIMARY KEY AUTOINCREMENT']
+                columns += [f'"{c}" {SQL_TYPES[kind]}' for c, kind in schema['columns'].items() if c != 'id']
+                columns += [f'UNIQUE ({", ".join(key)})' for key in schema['unique']]
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{name}" ({", ".join(columns)})')
+
+        # Metrics
+        self.requests = {}           # (table, verb) -> requests
+        self.rows_sent = {}          # table -> rows in write payloads
+        self.rows_returned = 0
+        self.errors = 0
+        self.waited = 0.0            # injected latency, seconds
+
+    def table(self, name):
+        return LocalQuery(self, name)
+
+    def dump(self, name):
+        """Every row of a table in id order, uncapped and free (for checks, not the engine)."""
+        query = LocalQuery(self, name).select('*').order('id')
+        with self.lock:
+            return self._select(query, cap=False)
+
+    # --- EXECUTION ---
+    def run(self, query):
+        sent = len(query.payload[0]) if query.op in ('insert', 'upsert') else 0
+        try:
+            with self.lock:
+                key = (query.table, query.op)
+                self.requests[key] = self.requests.get(key, 0) + 1
+                if sent:
+                    self.rows_sent[query.table] = self.rows_sent.get(query.table, 0) + sent
+                if query.op == 'select':
+                    data = self._select(query)
+                else:
+                    with self.conn:
+                        data = getattr(self, f'_{query.op}')(query)
+                    if not query.returning:
+                        data = []
+                self.rows_returned += len(data)
+        except LocalPostgrestError:
+            self.errors += 1
+            raise
+        except sqlite3.IntegrityError as e:
+            self.errors += 1
+            raise LocalPostgrestError('23505', f'duplicate key value violates unique constraint ({e})')
+        self._wait(sent + len(data))
+        return LocalResponse(data)
+
+    def _wait(self, rows):
+        # Outside the lock: concurrent requests overlap like they would over the network
+        if not self.latency and not self.row_latency:
+            return
+        delay = self.latency + self.rng.uniform(0, self.latency / 2) + rows * self.row_latency
+        self.waited += delay
+        time.sleep(delay)
+
+    def _where(self, query):
+        if not query.filters:
+            return '', []
+        return ' WHERE ' + ' AND '.join(sql for sql, _ in query.filters), \
+            [p for _, params in query.filters for p in params]
+
+    def _decode(self, query, cursor):
+        kinds = query.schema['columns']
+        names = [d[0] for d in cursor.description]
+        return [{n: from_db(kinds[n], v) for n, v in zip(names, row)} for row in cursor.fetchall()]
+
+    def _select(self, query, cap=True):
+        columns = '*' if query.columns is None else ', '.join(f'"{c}"' for c in query.columns)
+        where, params = self._where(query)
+        sql = f'SELECT {columns} FROM "{query.table}"{where}'
+        if query.orders:
+            sql += ' ORDER BY ' + ', '.join(query.orders)
+        limit = query.limit_to
+        if cap and self.max_rows:
+            limit = self.max_rows if limit is None else min(limit, self.max_rows)
+        sql += f' LIMIT {-1 if limit is None else int(limit)} OFFSET {int(query.offset)}'
+        return self._decode(query, self.conn.execute(sql, params))
+
+    def _insert(self, query):
+        return self._write(query, conflict='')
+
+    def _upsert(self, query):
+        target = set(query.on_conflict)
+        if target != {'id'} and not any(target == set(key) for key in query.schema['unique']):
+            raise LocalPostgrestError(
+                '42P10', 'there is no unique or exclusion constraint matching the ON CONFLICT specification')
+        _, columns = query.payload
+        if query.ignore_duplicates:
+            action = 'DO NOTHING'
+        else:
+            updates = [c for c in columns if c not in target and c != 'id']
+            action = 'DO UPDATE SET ' + ', '.join(f'"{c}" = excluded."{c}"' for c in updates) if updates \
+                else 'DO NOTHING'
+        return self._write(query, f' ON CONFLICT ({", ".join(query.on_conflict)}) {action}')
+
+    def _write(self, query, conflict):
+        rows, columns = query.payload
+        kinds = query.schema['columns']
+        written = []
+        for row in rows:
+            # Union column set: keys this row lacks are written as NULL (the identity column takes its default)
+            row_columns = [c for c in columns if c != 'id' or row.get('id') is not None]
+            values = [to_db(kinds[c], row.get(c)) for c in row_columns]
+            names = ", ".join(f'"{c}"' for c in row_columns)
+            cursor = self.conn.execute(
+                f'INSERT INTO "{query.table}" ({names}) VALUES ({", ".join("?" * len(values))}){conflict} RETURNING *',
+                values)
+            written.extend(self._decode(query, cursor))
+        return written
+
+    def _update(self, query):
+        kinds = query.schema['columns']
+        where, params = self._where(query)
+        assignments = ', '.join(f'"{c}" = ?' for c in query.payload)
+        values = [to_db(kinds[c], v) for c, v in query.payload.items()]
+        return self._decode(query, self.conn.execute(
+            f'UPDATE "{query.table}" SET {assignments}{where} RETURNING *', values + params))
+
+    def _delete(self, query):
+        where, params = self._where(query)
+        return self._decode(query, self.conn.execute(f'DELETE FROM "{query.table}"{where} RETURNING *', params))
+
+    # --- HTTP ---
+    def rest_client(self, base_url='http://local-postgrest/rest/v1'):
+        """The real postgrest-py client, served by this database instead of the network."""
+        http = httpx.Client(transport=httpx.MockTransport(self.handle), base_url=base_url)
+        return SyncPostgrestClient(base_url, http_client=http)
+
+    def handle(self, request):
+        """
+        One PostgREST HTTP request (as the client serialised it) replayed through
+        the builder chain above, so both paths share the same semantics.
+        """
+        params = parse_qsl(request.url.query.decode('utf-8'), keep_blank_values=True)
+        prefer = request.headers.get('prefer', '')
+        options = dict(p for p in params if p[0] in ('select', 'on_conflict', 'columns', 'order', 'limit', 'offset'))
+        returning = 'minimal' if 'return=minimal' in prefer else 'representation'
+        try:
+            query = self.table(request.url.path.rstrip('/').rsplit('/', 1)[-1])
+            body = json.loads(request.content) if request.content else None
+            if request.method == 'GET':
+                query.select(options.get('select', '*'))
+            elif request.method == 'POST':
+                if 'resolution=' in prefer:
+                    query.upsert(body, returning=returning, on_conflict=options.get('on_conflict', ''),
+                                 ignore_duplicates='resolution=ignore-duplicates' in prefer)
+                else:
+                    query.insert(body, returning=returning)
+                if 'columns' in options:
+                    # ?columns= is the column set PostgREST writes, whatever keys each row has
+                    columns = [c.strip().strip('"') for c in options['columns'].split(',')]
+                    query.payload = (query.payload[0], [query._column(c) for c in columns])
+            elif request.method == 'PATCH':
+                query.update(body, returning=returning)
+            elif request.method == 'DELETE':
+                query.delete(returning=returning)
+            else:
+                return httpx.Response(405, json={'code': 'PGRST117', 'message': f'Unsupported HTTP method: {request.method}',
+                                                 'details': None, 'hint': None})
+
+            for column, value in params:
+                if column in options:
+                    continue
+                operator, _, operand = value.partition('.')
+                if operator not in HTTP_FILTERS:
+                    raise LocalPostgrestError('PGRST100', f'"failed to parse filter ({value})"')
+                if operator == 'in':
+                    query.in_(column, next(csv.reader([operand.strip()[1:-1]])) if operand.strip() != '()' else [])
+                else:
+                    getattr(query, operator)(column, operand)
+            for term in filter(None, options.get('order', '').split(',')):
+                column, *modifiers = term.split('.')
+                nulls = [m for m in modifiers if m.startswith('nulls')]
+                query.order(column, desc='desc' in modifiers,
+                            nullsfirst=(nulls[0] == 'nullsfirst') if nulls else None)
+            if 'limit' in options:
+                query.limit(int(options['limit']))
+            query.offset = int(options.get('offset', 0))
+
+            data = query.execute().data
+        except LocalPostgrestError as e:
+            return httpx.Response(HTTP_STATUS.get(e.code, 400),
+                                  json={'code': e.code, 'message': e.message, 'details': None, 'hint': None})
+        status = 201 if request.method == 'POST' else 200
+        if returning == 'minimal':
+            return httpx.Response(204 if status == 200 else status)
+        return httpx.Response(status, json=data)
+
+    # --- REPORTING ---
+    def report(self):
+        with self.lock:
+            calls = sum(self.requests.values())
+            verbs = ", ".join(f"{table}.{verb} {n}" for (table, verb), n in sorted(self.requests.items()))
+            sent = ", ".join(f"{table} {n}" for table, n in sorted(self.rows_sent.items()))
+            return (f"{calls} requests ({verbs or 'none'}) | rows sent: {sent or 'none'} | "
+                    f"{self.rows_returned} returned, {self.errors} errors, {self.waited:.2f}s injected latency")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
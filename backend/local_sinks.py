@@ -0,0 +1,42 @@
+import logging
+import threading
+
+import clock
+
+logger = logging.getLogger(__name__)
+
+# Local stand-ins for the engine's outputs, so replay_traffic.py can run the
+# real code paths without touching Telegram (Supabase: local_postgrest.py).
+
+
+# ==========================================
+# TELEGRAM
+# ==========================================
+class LocalTelegram:
+    """TelegramSender's producer interface; messages are kept (with the clock time) and on_sent runs at once."""
+
+    def __init__(self):
+        self.messages = []           # (ts, chat_id, text)
+        self.lock = threading.Lock()
+
+    def enqueue(self, chat_id, text, keys=(), on_sent=None):
+        with self.lock:
+            self.messages.append((clock.now(), chat_id, text))
+        if on_sent is not None:
+            on_sent()
+        return True
+
+    def pending(self, key):
+        return False
+
+    def depth(self):
+        return 0
+
+    def start(self):
+        return None
+
+    def stop(self, timeout=None):
+        return None
+
+    def report(self):
+        return None
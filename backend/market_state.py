@@ -0,0 +1,78 @@
+import heapq
+import logging
+from datetime import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class MarketState:
+    """
+    What Betfair last told this process about each market: status, in-play and
+    start time. any_inplay() is O(1) off a set; a start-time min-heap makes
+    due_closes() touch only the markets that actually started since last call.
+    Only due_closes() pops the heap, so callers that never close markets pass
+    track_closes=False and nothing is pushed.
+    """
+
+    def __init__(self, track_closes=True):
+        self.track_closes = track_closes
+        self.markets = {}       # market_id -> {'status', 'in_play', 'start_ts'}
+        self.inplay = set()     # in-play and not CLOSED
+        self.start_heap = []    # (start_ts, market_id); stale entries skipped on pop
+        self.to_close = set()   # seen in-play, close on the next due_closes()
+        self.closed = set()     # closed by us (due_closes) or by Betfair
+
+    def observe(self, market_id, status, in_play, start_dt):
+        start_ts = None
+        if start_dt is not None:
+            if start_dt.tzinfo is None:
+                start_dt = start_dt.replace(tzinfo=timezone.utc)
+            start_ts = start_dt.timestamp()
+
+        previous = self.markets.get(market_id)
+        self.markets[market_id] = {'status': status, 'in_play': in_play, 'start_ts': start_ts}
+        if self.track_closes and start_ts is not None and (previous is None or previous['start_ts'] != start_ts):
+            heapq.heappush(self.start_heap, (start_ts, market_id))
+
+        if in_play and status != 'CLOSED':
+            self.inplay.add(market_id)
+            if market_id not in self.closed:
+                self.to_close.add(market_id)
+        else:
+            self.inplay.discard(market_id)
+        if status == 'CLOSED':
+            self.closed.add(market_id)
+            self.to_close.discard(market_id)
+
+    def any_inplay(self):
+        return bool(self.inplay)
+
+    def is_closed(self, market_id):
+        return market_id in self.closed
+
+    def due_closes(self, now):
+        """Markets that started or went in-play since the last call (each returned once)."""
+        due = set(self.to_close)
+        self.to_close.clear()
+        while self.start_heap and self.start_heap[0][0] <= now:
+            start_ts, market_id = heapq.heappop(self.start_heap)
+            state = self.markets.get(market_id)
+            if state is None or state['start_ts'] != start_ts:
+                continue  # start time moved (re-pushed) or market pruned
+            due.add(market_id)
+        due -= self.closed
+        self.closed.update(due)
+        return sorted(due)
+
+    def prune(self, live_ids):
+        pruned = [m_id for m_id in self.markets if m_id not in live_ids]
+        for market_id in pruned:
+            del self.markets[market_id]
+            self.inplay.discard(market_id)
+            self.to_close.discard(market_id)
+            self.closed.discard(market_id)
+        if pruned or len(self.start_heap) > 2 * len(self.markets):
+            # Drop entries for pruned markets and moved start times; due_closes() may not run for hours
+            self.start_heap = [(ts, m_id) for ts, m_id in self.start_heap
+                               if m_id in self.markets and self.markets[m_id]['start_ts'] == ts]
+            heapq.heapify(self.start_heap)
@@ -0,0 +1,222 @@
+import bisect
+import json
+import logging
+import os
+from datetime import datetime
+
+from normalization import ALIAS_PARTNERS, build_alias_partners
+
+logger = logging.getLogger(__name__)
+
+# Rows carrying any of these markers (event, competition or sport label) are College games
+NCAA_MARKERS = ['NCAA', 'COLLEGE', 'FCS']
+
+# Time tolerance between Betfair start and Odds API commence_time
+STRICT_TOLERANCE_SECONDS = 43200
+RELAXED_TOLERANCE_SECONDS = 108000
+
+
+def match_tolerance(strict_mode):
+    return RELAXED_TOLERANCE_SECONDS if not strict_mode else STRICT_TOLERANCE_SECONDS
+
+
+def is_ncaa_row(row):
+    event_name_raw = str(row.get('event_name') or "").upper()
+    comp_name_raw = str(row.get('competition') or "").upper()
+    sport_label = str(row.get('sport') or "").upper()
+    return any(x in event_name_raw or x in comp_name_raw or x in sport_label for x in NCAA_MARKERS)
+
+
+class _Bucket:
+    def __init__(self):
+        self.entries = []    # (start_ts, pos, row) sorted by start time
+        self.times = []      # start_ts only, for bisect
+        self.by_runner = {}  # norm_runner -> [(start_ts, pos, row)]
+
+    def add(self, start_ts, pos, row):
+        self.entries.append((start_ts, pos, row))
+        self.by_runner.setdefault(row['norm_runner'], []).append((start_ts, pos, row))
+
+    def seal(self):
+        self.entries.sort(key=lambda e: (e[0], e[1]))
+        self.times = [e[0] for e in self.entries]
+
+    def window(self, lo_ts, hi_ts):
+        lo = bisect.bisect_left(self.times, lo_ts)
+        hi = bisect.bisect_right(self.times, hi_ts)
+        return self.entries[lo:hi]
+
+
+class RunnerIndex:
+    """
+    Matching index over the open market_feed rows, built once per spy cycle.
+    Rows are bucketed by (sport, is_ncaa) and sorted by start time, so each
+    outcome only looks at rows inside its time-tolerance window.
+
+    Resolution is identical to the old linear scan: the winning row is the
+    first one (in DB order) that passes every check. Exact and alias hits come
+    from hash lookups; the substring fallback only scans window rows that sit
+    before the best hash hit.
+    """
+
+    def __init__(self, active_rows, alias_map=None):
+        self.alias_partners = ALIAS_PARTNERS if alias_map is None else build_alias_partners(alias_map)
+        self.buckets = {}
+        self.sports = set()
+
+        for pos, row in enumerate(active_rows):
+            self.sports.add(row['sport'])
+            # Rows without a parsable start time can never fall inside a time window
+            if row.get('start_time') is None:
+                continue
+            key = (row['sport'], is_ncaa_row(row))
+            if key not in self.buckets:
+                self.buckets[key] = _Bucket()
+            self.buckets[key].add(row['start_time'].timestamp(), pos, row)
+
+        for bucket in self.buckets.values():
+            bucket.seal()
+
+    def has_sport(self, sport_name):
+        return sport_name in self.sports
+
+    def _bucket_keys(self, sport_name, is_ncaa_api):
+        # Relax: Only block if it is explicitly NFL vs NCAA mismatch.
+        if sport_name == 'NFL':
+            return [(sport_name, is_ncaa_api)]
+        return [(sport_name, False), (sport_name, True)]
+
+    def match(self, sport_conf, api_start, norm_name, api_home, api_away):
+        """Returns the matched row for one API outcome, or None."""
+        sport_name = sport_conf['name']
+        strict_mode = sport_conf.get('strict_mode', True)
+        is_ncaa_api = 'ncaaf' in sport_conf['odds_api_key'].lower()
+        tolerance = match_tolerance(strict_mode)
+        api_ts = api_start.timestamp()
+
+        def event_ok(row):
+            # Fuzzy Event Match (Home or Away team check)
+            if not strict_mode:
+                return True
+            return api_home in row['norm_event'] or api_away in row['norm_event']
+
+        buckets = [self.buckets[k] for k in self._bucket_keys(sport_name, is_ncaa_api) if k in self.buckets]
+        best_pos, best_row = None, None
+
+        # 1. Exact & Alias hash lookups
+        names = [norm_name]
+        names.extend(self.alias_partners.get(norm_name, ()))
+        for bucket in buckets:
+            for name in names:
+                for start_ts, pos, row in bucket.by_runner.get(name, ()):
+                    if best_pos is not None and pos >= best_pos:
+                        continue
+                    if abs(start_ts - api_ts) > tolerance:
+                        continue
+                    if event_ok(row):
+                        best_pos, best_row = pos, row
+
+        # 2. Substring fallback (only rows that would have won under DB order)
+        for bucket in buckets:
+            for start_ts, pos, row in bucket.window(api_ts - tolerance, api_ts + tolerance):
+                if best_pos is not None and pos >= best_pos:
+                    continue
+                norm_runner = row['norm_runner']
+                if not (norm_name in norm_runner or norm_runner in norm_name):
+                    continue
+                if event_ok(row):
+                    best_pos, best_row = pos, row
+
+        return best_row
+
+
+class MatchCache:
+    """
+    Persistent (sport_key, event id, outcome name) -> market_feed row resolution.
+    The pairing rarely changes over an event's lifetime, so steady-state spy
+    cycles resolve outcomes with a dict hit and only new outcomes go through
+    RunnerIndex. Entries are dropped when their row closes or when the row's
+    start time drifts outside the match tolerance.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def key(sport_key, event_id, outcome_name):
+        return f"{sport_key}::{event_id}::{outcome_name}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data
+        except Exception as e:
+            logger.error(f"Match cache unreadable, starting empty: {e}")
+            self.entries = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            logger.error(f"Match cache write failed: {e}")
+
+    def lookup(self, key, id_to_row_map, api_start, strict_mode):
+        """Returns the cached open row for this outcome, or None (and forgets stale entries)."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        row = id_to_row_map.get(entry['id'])
+        valid = row is not None \
+            and row.get('market_id') == entry.get('market_id') \
+            and row.get('runner_name') == entry.get('runner_name')
+
+        if valid:
+            try:
+                row_start = datetime.fromisoformat(row['start_time'].replace('Z', '+00:00'))
+                valid = abs((row_start - api_start).total_seconds()) <= match_tolerance(strict_mode)
+            except Exception:
+                valid = False
+
+        if not valid:
+            del self.entries[key]
+            self.dirty = True
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row
+
+    def store(self, key, row):
+        entry = {'id': row.get('id'), 'market_id': row.get('market_id'), 'runner_name': row.get('runner_name')}
+        if self.entries.get(key) != entry:
+            self.entries[key] = entry
+            self.dirty = True
+
+    def prune(self, open_ids):
+        """Drops entries whose market_feed row is no longer open."""
+        stale = [k for k, v in self.entries.items() if v.get('id') not in open_ids]
+        for k in stale:
+            del self.entries[k]
+        if stale:
+            self.dirty = True
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,96 @@
+import re
+from functools import lru_cache
+
+try:
+    from sports_config import ALIAS_MAP
+except ImportError:
+    ALIAS_MAP = {}
+
+# Distinct names seen per cycle are a few hundred; this keeps every one of them hot
+NORMALIZE_CACHE_SIZE = 4096
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]')
+
+# Bridge common NCAA abbreviations to their full school names before stripping mascots
+# FIX: Broaden FIU/UTSA matching (allow substrings like "Florida Int" or "U.T.S.A")
+# Order matters: the first bridge that hits wins.
+_AF_BRIDGES = [
+    (re.compile(r'florida international|fiu|florida int'), "fiu"),
+    (re.compile(r'texas san antonio|utsa'), "utsa"),
+    (re.compile(r'brigham young|\Abyu\Z'), "byu"),
+    (re.compile(r'connecticut|uconn'), "uconn"),
+]
+_AF_BRIDGE_ANY = re.compile('|'.join(f"(?:{p.pattern})" for p, _ in _AF_BRIDGES))
+
+GARBAGE_WORDS = [
+    "football team", "university", "univ.", "univ", " the ", " at ",
+    "hilltoppers", "golden eagles", "hurricanes", "commanders", "vikings",
+    "lions", "cowboys", "wildcats", "redbirds", "bobcats",
+    "panthers", "roadrunners", "bulldogs", "lobos", "cougars",
+    "black knights", "huskies", "redhawks"
+]
+# One-pass gate: most names carry no garbage word at all. When one is present the
+# words are stripped in list order, since a single alternation pass would treat
+# overlapping words (" at the ") differently from the original replace chain.
+_GARBAGE_ANY = re.compile('|'.join(re.escape(w) for w in GARBAGE_WORDS))
+
+
+def build_alias_partners(alias_map):
+    """Symmetric view of the alias map: check_match accepts an alias in either direction."""
+    partners = {}
+    for name_a, names in alias_map.items():
+        for name_b in names:
+            partners.setdefault(name_a, set()).add(name_b)
+            partners.setdefault(name_b, set()).add(name_a)
+    return partners
+
+
+ALIAS_PARTNERS = build_alias_partners(ALIAS_MAP)
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(name):
+    return _NON_ALNUM.sub('', name.lower())
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize_af(name):
+    name = name.lower()
+    if _AF_BRIDGE_ANY.search(name):
+        for pattern, canonical in _AF_BRIDGES:
+            if pattern.search(name):
+                return canonical
+
+    if _GARBAGE_ANY.search(name):
+        for word in GARBAGE_WORDS:
+            name = name.replace(word, "")
+    name = name.replace(" st.", " state").replace(" st ", " state ")
+    return _NON_ALNUM.sub('', name)
+
+
+def normalize(name):
+    return _normalize(name if isinstance(name, str) else str(name))
+
+
+def normalize_af(name):
+    if not name: return ""
+    return _normalize_af(name if isinstance(name, str) else str(name))
+
+
+def check_match(name_a, name_b):
+    if not name_a or not name_b: return False
+    if name_a == name_b: return True
+
+    # Check explicit Alias Map first
+    if name_b in ALIAS_PARTNERS.get(name_a, ()): return True
+
+    # Fuzzy match: Ensure we catch "westernkentucky" in "westernkentuckyhilltoppers"
+    # only if the core string is significant (over 4 chars) to avoid false positives
+    if len(name_a) > 4 and name_a in name_b: return True
+    if len(name_b) > 4 and name_b in name_a: return True
+
+    return False
+
+
+def cache_info():
+    return {'normalize': _normalize.cache_info(), 'normalize_af': _normalize_af.cache_info()}
@@ -0,0 +1,131 @@
+import os
+import gzip
+import json
+import logging
+import clock
+
+logger = logging.getLogger(__name__)
+
+# --- CACHE SETTINGS ---
+ODDS_CACHE_COMPRESS = os.getenv('ODDS_CACHE_COMPRESS', '1') == '1'   # gzip the disk tier
+ODDS_ARCHIVE_DAYS = float(os.getenv('ODDS_ARCHIVE_DAYS', '0'))       # keep fetched payloads for replay (0 = off)
+ARCHIVE_PRUNE_SECONDS = 3600
+
+
+class OddsCache:
+    """
+    Odds API payloads per sport key. The hot tier is a dict of parsed payloads
+    with the time they were fetched, so steady-state spy cycles never touch the
+    filesystem. Each put() is written through to the disk tier (gzip, written to
+    a temp file and renamed into place, so a crash leaves the previous copy),
+    which is only read back on a cold start. Fetched payloads can also be
+    archived under archive/<sport_key>/ for replay.
+    """
+
+    def __init__(self, cache_dir, compress=ODDS_CACHE_COMPRESS, archive_days=ODDS_ARCHIVE_DAYS):
+        self.cache_dir = cache_dir
+        self.compress = compress
+        self.archive_days = archive_days
+        self.archive_dir = os.path.join(cache_dir, 'archive')
+        self.entries = {}          # sport_key -> {'fetched_at': ts, 'data': payload}
+        self.last_archive_prune = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # --- PATHS ---
+    def path(self, sport_key, compressed=None):
+        compressed = self.compress if compressed is None else compressed
+        return os.path.join(self.cache_dir, f"{sport_key}.json.gz" if compressed else f"{sport_key}.json")
+
+    @staticmethod
+    def _read(path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(path, obj):
+        tmp_path = f"{path}.tmp"
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+
+    # --- READ ---
+    def get(self, sport_key):
+        """{'fetched_at', 'data'} or None. Only the first call per key (cold start) reads disk."""
+        entry = self.entries.get(sport_key)
+        if entry is None and sport_key not in self.entries:
+            entry = self._load(sport_key)
+            self.entries[sport_key] = entry
+        return entry
+
+    def age(self, sport_key, now=None):
+        entry = self.get(sport_key)
+        return (now or clock.now()) - entry['fetched_at'] if entry else None
+
+    def _load(self, sport_key):
+        for path in (self.path(sport_key), self.path(sport_key, not self.compress)):
+            if not os.path.exists(path):
+                continue
+            try:
+                stored = self._read(path)
+            except Exception as e:
+                logger.error(f"Odds cache unreadable ({path}): {e}")
+                continue
+            if isinstance(stored, list):
+                # Pre-envelope cache file: the mtime was the fetch time
+                return {'fetched_at': os.path.getmtime(path), 'data': stored}
+            if isinstance(stored, dict) and 'data' in stored:
+                return {'fetched_at': stored.get('fetched_at', 0), 'data': stored['data']}
+        return None
+
+    # --- WRITE ---
+    def put(self, sport_key, data):
+        """Stores a freshly fetched payload (memory, disk and the archive)."""
+        fetched_at = clock.now()
+        self.entries[sport_key] = {'fetched_at': fetched_at, 'data': data}
+        try:
+            self._write(self.path(sport_key), {'fetched_at': fetched_at, 'data': data})
+        except Exception as e:
+            logger.error(f"Odds cache write failed ({sport_key}): {e}")
+        if self.archive_days > 0:
+            self._archive(sport_key, data)
+
+    def _archive(self, sport_key, data):
+        now = clock.now()
+        directory = os.path.join(self.archive_dir, sport_key)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._write(os.path.join(directory, f"{now:.3f}.json.gz"), {'fetched_at': now, 'data': data})
+        except Exception as e:
+            logger.error(f"Odds archive write failed ({sport_key}): {e}")
+        if now - self.last_archive_prune >= ARCHIVE_PRUNE_SECONDS:
+            self.last_archive_prune = now
+            self.prune_archive(now)
+
+    def prune_archive(self, now=None):
+        cutoff = (now or clock.now()) - self.archive_days * 86400
+        if not os.path.isdir(self.archive_dir):
+            return
+        for sport_key in os.listdir(self.archive_dir):
+            directory = os.path.join(self.archive_dir, sport_key)
+            for name in os.listdir(directory):
+                try:
+                    if float(name.split('.json')[0]) < cutoff:
+                        os.remove(os.path.join(directory, name))
+                except (ValueError, OSError):
+                    continue
+
+    def archived(self, sport_key):
+        """Archived payloads for one key, oldest first: [(fetched_at, data)]."""
+        directory = os.path.join(self.archive_dir, sport_key)
+        if not os.path.isdir(directory):
+            return []
+        payloads = []
+        for name in sorted(os.listdir(directory), key=lambda n: float(n.split('.json')[0])):
+            try:
+                stored = self._read(os.path.join(directory, name))
+                payloads.append((stored['fetched_at'], stored['data']))
+            except Exception as e:
+                logger.error(f"Odds archive unreadable ({name}): {e}")
+        return payloads
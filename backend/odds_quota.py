@@ -0,0 +1,201 @@
+import os
+import json
+import math
+import logging
+from datetime import datetime, timezone
+import clock
+
+logger = logging.getLogger(__name__)
+
+# --- QUOTA SETTINGS ---
+ODDS_API_MONTHLY_QUOTA = int(os.getenv('ODDS_API_MONTHLY_QUOTA', '20000'))
+ODDS_API_RESET_DAY = int(os.getenv('ODDS_API_RESET_DAY', '1'))        # billing day the credits reset (UTC)
+ODDS_API_RESERVE = float(os.getenv('ODDS_API_RESERVE', '0.02'))       # share of the quota never planned
+QUOTA_FILE = os.getenv('ODDS_QUOTA_FILE', 'odds_quota.json')
+BURN_WINDOW_SECONDS = 24 * 3600
+
+# (starts within N seconds, preferred TTL, allocation weight); in-play is 0 seconds away
+URGENCY_TIERS = [
+    (0, 60, 8.0),               # live
+    (3 * 3600, 300, 4.0),       # tip-off soon: day-of-game TTL floor, more weight
+    (24 * 3600, 300, 2.0),      # day of game
+    (None, 3600, 1.0),          # future
+]
+MIN_TTL = 60
+
+
+def urgency(min_seconds_away):
+    """(preferred TTL, weight) for a config whose nearest relevant start is min_seconds_away."""
+    for limit, ttl, weight in URGENCY_TIERS:
+        if limit is None or min_seconds_away <= limit:
+            return ttl, weight
+
+
+def next_reset(now, reset_day=ODDS_API_RESET_DAY):
+    """Epoch of the next credit reset after now (reset_day of this month or the next, 00:00 UTC)."""
+    dt = datetime.fromtimestamp(now, timezone.utc)
+    day = min(reset_day, 28)
+    candidate = dt.replace(day=day, hour=0, minute=0, second=0, microsecond=0)
+    if candidate.timestamp() <= now:
+        year, month = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+        candidate = candidate.replace(year=year, month=month)
+    return candidate.timestamp()
+
+
+def allocate(demands, budget_rate):
+    """
+    Water-fills budget_rate (credits/s) across demands {key: (desired credits/s, weight)}:
+    every key gets a weight-proportional share, keys that need less than their
+    share are capped at what they want and the rest is re-shared. Returns {key: credits/s}.
+    """
+    rates = {}
+    active = dict(demands)
+    left = budget_rate
+    while active:
+        total_weight = sum(weight for _, weight in active.values())
+        capped = {key: desired for key, (desired, weight) in active.items()
+                  if desired <= left * weight / total_weight}
+        if not capped:
+            for key, (_, weight) in active.items():
+                rates[key] = left * weight / total_weight
+            break
+        for key, desired in capped.items():
+            rates[key] = desired
+            left -= desired
+            del active[key]
+    return rates
+
+
+class QuotaPlanner:
+    """
+    Odds API credit budget. Usage comes from the x-requests-used /
+    x-requests-remaining headers (counted locally when they're missing) and is
+    persisted across restarts. plan() turns each sport key's urgency into a TTL:
+    the credits left until the reset (minus a reserve) are spread evenly over
+    the time left, and that rate is water-filled across keys by urgency and
+    number of imminent events, so TTLs stretch smoothly as the month runs down.
+    allow() is the hard stop at the reserve.
+    """
+
+    def __init__(self, path=QUOTA_FILE, quota=ODDS_API_MONTHLY_QUOTA, reserve=ODDS_API_RESERVE,
+                 reset_day=ODDS_API_RESET_DAY):
+        self.path = path
+        self.quota = quota
+        self.reserve = int(quota * reserve)
+        self.reset_day = reset_day
+        self.used = 0
+        self.remaining = None       # last x-requests-remaining (authoritative when present)
+        self.period_end = 0
+        self.costs = {}             # sport_key -> credits per call (x-requests-last)
+        self.recent = []            # [ts, credits] over the last BURN_WINDOW_SECONDS
+        self.ttls = {}              # sport_key -> last planned TTL
+        self.load()
+
+    # --- PERSISTENCE ---
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.used = data.get('used', 0)
+            self.remaining = data.get('remaining')
+            self.period_end = data.get('period_end', 0)
+            self.costs = data.get('costs', {})
+            self.recent = data.get('recent', [])
+        except Exception as e:
+            logger.error(f"Quota file unreadable, counting from zero: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'used': self.used, 'remaining': self.remaining, 'period_end': self.period_end,
+                           'costs': self.costs, 'recent': self.recent}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Quota file write failed: {e}")
+
+    # --- ACCOUNTING ---
+    def _roll(self, now):
+        if now >= self.period_end:
+            if self.period_end:
+                logger.info(f"💳 Odds API credits reset ({self.used} used last period)")
+            self.used = 0
+            self.remaining = None
+            self.period_end = next_reset(now, self.reset_day)
+
+    def left(self, now=None):
+        self._roll(now or clock.now())
+        if self.remaining is not None:
+            return self.remaining
+        return self.quota - self.used
+
+    def cost(self, sport_key):
+        return self.costs.get(sport_key, 1)
+
+    def allow(self, sport_key, now=None):
+        return self.left(now) - self.cost(sport_key) >= self.reserve
+
+    def record(self, sport_key, headers=None, now=None):
+        """One Odds API call made for sport_key; headers are the response headers (if any)."""
+        now = now or clock.now()
+        self._roll(now)
+        headers = headers or {}
+        try:
+            cost = int(headers.get('x-requests-last', self.cost(sport_key)))
+        except (TypeError, ValueError):
+            cost = self.cost(sport_key)
+        self.costs[sport_key] = cost
+
+        try:
+            self.used = int(headers['x-requests-used'])
+            self.remaining = int(headers['x-requests-remaining'])
+        except (KeyError, TypeError, ValueError):
+            self.used += cost
+            if self.remaining is not None:
+                self.remaining -= cost
+
+        self.recent.append([now, cost])
+        cutoff = now - BURN_WINDOW_SECONDS
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.pop(0)
+        self.save()
+
+    def burn_rate(self, now=None):
+        """Credits per hour over the last day."""
+        now = now or clock.now()
+        window = min(BURN_WINDOW_SECONDS, max(now - self.recent[0][0], 3600)) if self.recent else BURN_WINDOW_SECONDS
+        return sum(cost for ts, cost in self.recent if ts >= now - BURN_WINDOW_SECONDS) * 3600 / window
+
+    # --- PLANNING ---
+    def plan(self, demands, now=None):
+        """
+        demands: {sport_key: (min_seconds_away, imminent events)}. Returns
+        {sport_key: ttl seconds}; math.inf when there is nothing left to spend.
+        """
+        now = now or clock.now()
+        budget = max(0, self.left(now) - self.reserve)
+        budget_rate = budget / max(self.period_end - now, 60)
+
+        wants = {}
+        for sport_key, (min_seconds_away, imminent) in demands.items():
+            ttl, weight = urgency(min_seconds_away)
+            wants[sport_key] = (self.cost(sport_key) / ttl, weight * (1 + imminent))
+
+        ttls = {}
+        for sport_key, rate in allocate(wants, budget_rate).items():
+            ttls[sport_key] = max(MIN_TTL, self.cost(sport_key) / rate) if rate > 0 else math.inf
+        self.ttls = ttls
+        return ttls
+
+    def report(self, now=None):
+        now = now or clock.now()
+        left = self.left(now)
+        burn = self.burn_rate(now)
+        hours_left = (self.period_end - now) / 3600
+        runway = left / burn if burn else math.inf
+        logger.info(f"💳 Odds API: {left} credits left, {hours_left:.0f}h to reset, burning {burn:.1f}/h "
+                    f"(runway {runway:.0f}h)")
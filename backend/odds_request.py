@@ -0,0 +1,67 @@
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- REQUEST SHAPING ---
+# Bookmakers run_spy actually reads (match_spy_event / event_signature substring) -> Odds API key.
+# With `bookmakers` set the API ignores `regions` and bills each market per 10 bookmakers.
+CONSUMED_BOOKMAKERS = {
+    'pinnacle': 'pinnacle',
+    'ladbrokes': 'ladbrokes_uk',    # legacy column price_bet365
+    'paddypower': 'paddypower',
+}
+CONSUMED_MARKETS = ('h2h',)
+# What fetch_cached_odds used to ask for; DEBUG_MODE dragnets still want the full list
+LEGACY_BOOKMAKERS = ('pinnacle', 'ladbrokes_uk', 'paddypower', 'williamhill', 'unibet', 'betfair_sb_uk', 'coral',
+                     'betvictor')
+LEGACY_REGIONS = ('uk', 'eu', 'us')
+BOOKMAKERS_PER_REGION = 10
+
+
+def credit_cost(markets, bookmakers=(), regions=()):
+    """Odds API credits for one /odds call."""
+    if bookmakers:
+        return len(markets) * math.ceil(len(bookmakers) / BOOKMAKERS_PER_REGION)
+    return len(markets) * len(regions)
+
+
+class OddsRequest:
+    """One /odds fetch per cycle for every SPORTS_CONFIG entry sharing an odds_api_key."""
+
+    def __init__(self, sport_key):
+        self.sport_key = sport_key
+        self.configs = []
+        self.markets = set()
+        self.bookmakers = set()
+
+    def add(self, sport, extra_bookmakers=()):
+        self.configs.append(sport)
+        self.markets.update(sport.get('markets', CONSUMED_MARKETS))
+        self.bookmakers.update(sport.get('bookmakers', CONSUMED_BOOKMAKERS.values()))
+        self.bookmakers.update(extra_bookmakers)
+
+    def params(self):
+        return {
+            'markets': ','.join(sorted(self.markets)),
+            'oddsFormat': 'decimal',
+            'bookmakers': ','.join(sorted(self.bookmakers)),
+        }
+
+    def cost(self):
+        return credit_cost(self.markets, self.bookmakers)
+
+    def legacy_cost(self):
+        """What the unshaped request cost (its bookmaker list took priority over the regions)."""
+        return credit_cost(CONSUMED_MARKETS, LEGACY_BOOKMAKERS, LEGACY_REGIONS)
+
+
+def plan_requests(sports_config, extra_bookmakers=()):
+    """SPORTS_CONFIG -> {odds_api_key: OddsRequest}, in config order."""
+    requests_by_key = {}
+    for sport in sports_config:
+        key = sport['odds_api_key']
+        if key not in requests_by_key:
+            requests_by_key[key] = OddsRequest(key)
+        requests_by_key[key].add(sport, extra_bookmakers)
+    return requests_by_key
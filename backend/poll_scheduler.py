@@ -0,0 +1,96 @@
+import logging
+from datetime import timezone
+
+logger = logging.getLogger(__name__)
+
+# --- POLL TIERS ---
+# (tier, starts within N seconds, poll interval seconds). In-play, unknown start
+# time and recently moving markets are always HOT.
+POLL_TIERS = [
+    ('HOT', 3 * 3600, 0),        # every cycle
+    ('WARM', 24 * 3600, 30),     # same day
+    ('COOL', 7 * 86400, 120),    # this week
+    ('COLD', None, 300),         # far future: every few minutes
+]
+PROMOTION_SECONDS = 600          # a price/volume move keeps a market HOT this long
+
+
+def book_signature(book):
+    """Best back/lay per runner plus matched volume; any change promotes the market."""
+    runners = tuple(
+        (r.selection_id,
+         r.ex.available_to_back[0].price if r.ex.available_to_back else None,
+         r.ex.available_to_lay[0].price if r.ex.available_to_lay else None)
+        for r in book.runners
+    )
+    return (book.total_matched, book.status, book.inplay, runners)
+
+
+class PollScheduler:
+    """
+    Decides which markets get a listMarketBook call this cycle. Far-out markets
+    are polled on slow cadences; near-start, in-play and moving markets every
+    cycle. The last book of every market is kept so cycles that skip a market
+    can still merge it.
+    """
+
+    def __init__(self):
+        self.last_polled = {}   # market_id -> ts
+        self.last_moved = {}    # market_id -> ts of last back/lay/volume change
+        self.signatures = {}    # market_id -> book_signature
+        self.books = {}         # market_id -> last MarketBook
+        self.tier_counts = {}
+
+    def tier(self, market_id, market_info, now):
+        if now - self.last_moved.get(market_id, 0) < PROMOTION_SECONDS:
+            return POLL_TIERS[0]
+        book = self.books.get(market_id)
+        if book is not None and book.inplay:
+            return POLL_TIERS[0]
+        if market_info is None or market_info.market_start_time is None:
+            return POLL_TIERS[0]
+
+        start_dt = market_info.market_start_time
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=timezone.utc)
+        seconds_to_start = start_dt.timestamp() - now
+
+        for tier in POLL_TIERS:
+            if tier[1] is None or seconds_to_start < tier[1]:
+                return tier
+        return POLL_TIERS[-1]
+
+    def due(self, market_ids, catalogue, now, exclude=()):
+        """Subset of market_ids (order kept) whose tier interval has elapsed."""
+        due_ids = []
+        for market_id in market_ids:
+            if market_id in exclude:
+                continue
+            name, _, interval = self.tier(market_id, catalogue.market(market_id), now)
+            self.tier_counts[name] = self.tier_counts.get(name, 0) + 1
+            if now - self.last_polled.get(market_id, 0) >= interval:
+                due_ids.append(market_id)
+        return due_ids
+
+    def observe(self, market_books, now):
+        for book in market_books:
+            signature = book_signature(book)
+            previous = self.signatures.get(book.market_id)
+            if previous is not None and previous != signature:
+                self.last_moved[book.market_id] = now
+            self.signatures[book.market_id] = signature
+            self.books[book.market_id] = book
+            self.last_polled[book.market_id] = now
+
+    def book(self, market_id):
+        return self.books.get(market_id)
+
+    def prune(self, live_ids):
+        for store in (self.last_polled, self.last_moved, self.signatures, self.books):
+            for market_id in [m_id for m_id in store if m_id not in live_ids]:
+                del store[market_id]
+
+    def report(self, polled, total):
+        tiers = ", ".join(f"{name}: {self.tier_counts.get(name, 0)}" for name, _, _ in POLL_TIERS)
+        logger.info(f"⏱️  Polled {polled}/{total} markets ({tiers})")
+        self.tier_counts = {}
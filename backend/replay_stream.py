@@ -0,0 +1,47 @@
+import os
+import sys
+import logging
+
+# Offline replay of a recorded Exchange Stream file (see betfair_stream.RecordingListener)
+# through the same order-book cache and change detection as `fetch_universal.py --stream`.
+# Usage: python backend/replay_stream.py [file] [--expect N]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from sports_config import SPORTS_CONFIG
+from betfair_catalogue import CatalogueCache, merge_catalogue_book
+from betfair_stream import ExchangeStream
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_FIXTURE = os.path.join(current_dir, "fixtures", "stream_nba_match_odds.jsonl")
+
+def run_replay(file_path, expect=None):
+    catalogue = CatalogueCache()
+    exchange_stream = ExchangeStream(
+        SPORTS_CONFIG, catalogue,
+        lambda conf, book, rows, now_utc, update_time: merge_catalogue_book(catalogue, conf, book, rows, now_utc, update_time)
+    )
+
+    print(f"📼 Replaying {file_path}")
+    total = 0
+    for step, changed in enumerate(exchange_stream.replay(file_path)):
+        total += len(changed)
+        print(f"   [{step}] {len(changed)} changed rows")
+        for row in changed:
+            print(f"       {row['runner_name']:<24} {row['back_price']:>6} / {row['lay_price']:<6} "
+                  f"vol {row['volume']:<6} in_play={row['in_play']} {row['market_status']}")
+
+    print(f"Emitted {total} rows, {len(exchange_stream.current_rows())} rows live")
+    if expect is not None and total != expect:
+        print(f"❌ Expected {expect} emitted rows")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--expect"]
+    expect = int(sys.argv[sys.argv.index("--expect") + 1]) if "--expect" in sys.argv else None
+    if expect is not None:
+        args.remove(str(expect))
+    sys.exit(run_replay(args[0] if args else DEFAULT_FIXTURE, expect))
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import types
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+# Offline replay of recorded upstream traffic (fetch_universal.py with
+# TRAFFIC_RECORD_FILE set) through the polling engine's own code paths:
+# fetch_betfair, run_spy and the alert cycle run unchanged on a virtual clock,
+# with Betfair and the Odds API answered from the recording and Supabase /
+# Telegram swapped for local sinks. Without a recording, a synthetic busy
+# NFL Sunday + NBA slate is generated first.
+#   --speed 0 (default): stepped clock, writes inline -> the same digest every run
+#   --speed N: virtual time runs N x real time, write-behind on its own thread
+# Usage: python backend/replay_traffic.py [recording.jsonl] [--speed N] [--cycles N] [--latency]
+#        [--db-latency MS] [--max-rows N]
+#        python backend/replay_traffic.py --generate out.jsonl [--games N] [--minutes N]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+import clock
+from traffic import TrafficRecorder, TrafficReplay, ReplayTrading, ReplayOdds, catalogue_key
+from local_sinks import LocalTelegram
+from local_postgrest import LocalPostgrest
+from sports_config import SPORTS_CONFIG
+
+logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# ==========================================
+# SYNTHETIC RECORDING
+# ==========================================
+NFL_TEAMS = ['Kansas City Chiefs', 'Buffalo Bills', 'Philadelphia Eagles', 'Dallas Cowboys', 'San Francisco 49ers',
+             'Detroit Lions', 'Baltimore Ravens', 'Cincinnati Bengals', 'Miami Dolphins', 'New York Jets',
+             'Green Bay Packers', 'Chicago Bears', 'Los Angeles Rams', 'Seattle Seahawks', 'Minnesota Vikings',
+             'Pittsburgh Steelers', 'Cleveland Browns', 'Houston Texans', 'Jacksonville Jaguars',
+             'Tennessee Titans', 'Indianapolis Colts', 'Denver Broncos', 'Las Vegas Raiders',
+             'Los Angeles Chargers', 'New England Patriots', 'Atlanta Falcons', 'New Orleans Saints',
+             'Tampa Bay Buccaneers', 'Carolina Panthers', 'Arizona Cardinals', 'Washington Commanders',
+             'New York Giants']
+NBA_TEAMS = ['Boston Celtics', 'New York Knicks', 'Milwaukee Bucks', 'Denver Nuggets', 'Phoenix Suns',
+             'Golden State Warriors', 'Los Angeles Lakers', 'Miami Heat', 'Philadelphia 76ers', 'Dallas Mavericks',
+             'Cleveland Cavaliers', 'Sacramento Kings', 'Memphis Grizzlies', 'Oklahoma City Thunder',
+             'Minnesota Timberwolves', 'New Orleans Pelicans', 'Atlanta Hawks', 'Chicago Bulls', 'Toronto Raptors',
+             'Indiana Pacers']
+# SPORTS_CONFIG text_query -> (teams, Betfair event type, competition, odds_api_key)
+SYNTHETIC_SPORTS = {
+    'NFL': (NFL_TEAMS, '6423', 'NFL', 'americanfootball_nfl'),
+    'NBA': (NBA_TEAMS, '7522', 'NBA', 'basketball_nba'),
+}
+BOOK_INTERVAL = 6
+ODDS_INTERVAL = 60
+STEAMER_SHARE = 0.15      # runners whose PaddyPower price sits above the exchange lay
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def synthetic_games(games, start, rng):
+    """[(text_query, odds_api_key, kick_off, market, runners)]: kick-offs staggered, two runners each."""
+    slate = []
+    market_seq = 0
+    for query, (teams, event_type, competition, odds_key) in SYNTHETIC_SPORTS.items():
+        for g in range(min(games, len(teams) // 2)):
+            away, home = teams[2 * g], teams[2 * g + 1]
+            market_seq += 1
+            kick_off = start + 20 * 60 + (g % 3) * 3 * 3600     # some go in-play during the window
+            market = {
+                'marketId': f"1.{260000000 + market_seq}",
+                'marketName': 'Match Odds',
+                'marketStartTime': iso(kick_off),
+                'totalMatched': 0.0,
+                'event': {'id': str(36000000 + market_seq), 'name': f"{away} @ {home}", 'countryCode': 'US',
+                          'timezone': 'GMT', 'openDate': iso(kick_off)},
+                'competition': {'id': competition, 'name': competition},
+                'eventType': {'id': event_type, 'name': query},
+                'runners': [{'selectionId': 400000 + 2 * market_seq + i, 'runnerName': name, 'handicap': 0.0,
+                             'sortPriority': i + 1} for i, name in enumerate((away, home))],
+            }
+            fair = rng.uniform(0.3, 0.7)
+            runners = [{'selectionId': r['selectionId'], 'name': r['runnerName'], 'prob': p,
+                        'volume': rng.uniform(2000, 40000), 'steamer': rng.random() < STEAMER_SHARE}
+                       for r, p in zip(market['runners'], (fair, 1 - fair))]
+            slate.append((query, odds_key, kick_off, market, runners))
+    return slate
+
+
+def market_book(market, runners, kick_off, now):
+    total = sum(r['volume'] for r in runners)
+    book_runners = []
+    for r in runners:
+        back = round(1 / r['prob'], 2)
+        lay = round(back * 1.015 + 0.01, 2)
+        book_runners.append({
+            'selectionId': r['selectionId'], 'handicap': 0.0, 'status': 'ACTIVE', 'lastPriceTraded': back,
+            'totalMatched': round(r['volume'], 2),
+            'ex': {'availableToBack': [{'price': back, 'size': 250.0}],
+                   'availableToLay': [{'price': lay, 'size': 180.0}], 'tradedVolume': []},
+        })
+    return {'marketId': market['marketId'], 'isMarketDataDelayed': False, 'status': 'OPEN', 'betDelay': 0,
+            'bspReconciled': False, 'complete': True, 'inplay': now >= kick_off, 'numberOfWinners': 1,
+            'numberOfRunners': 2, 'numberOfActiveRunners': 2, 'totalMatched': round(total, 2),
+            'totalAvailable': 1000.0, 'crossMatching': True, 'runnersVoidable': False, 'version': int(now),
+            'runners': book_runners}
+
+
+def odds_event(sport_key, market, runners, kick_off, now):
+    away, home = (r['name'] for r in runners)
+
+    def book(key, margin, steam):
+        outcomes = []
+        for r in runners:
+            lay = round(round(1 / r['prob'], 2) * 1.015 + 0.01, 2)
+            price = round(lay * 1.06, 2) if steam and r['steamer'] else round(1 / (r['prob'] * margin), 2)
+            outcomes.append({'name': r['name'], 'price': price})
+        return {'key': key, 'title': key, 'last_update': iso(now),
+                'markets': [{'key': 'h2h', 'last_update': iso(now), 'outcomes': outcomes}]}
+
+    return {'id': f"evt{market['event']['id']}", 'sport_key': sport_key, 'commence_time': iso(kick_off)[:19] + 'Z',
+            'home_team': home, 'away_team': away,
+            'bookmakers': [book('pinnacle', 1.02, False), book('ladbrokes_uk', 1.05, False),
+                           book('paddypower', 1.05, True)]}
+
+
+def generate_recording(path, games=14, minutes=40, seed=7):
+    """A busy Sunday: books every 6s, Odds API slates every 60s, catalogue listings for every config."""
+    from betfair_catalogue import build_market_filter, CATALOGUE_PROJECTION
+
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 11, 17, 0, tzinfo=timezone.utc).timestamp()
+    slate = synthetic_games(games, start, rng)
+    if os.path.exists(path):
+        os.remove(path)      # the recorder appends
+    recorder = TrafficRecorder(path)
+    used = 0
+
+    for sport in SPORTS_CONFIG:
+        markets = [market for query, _, _, market, _ in slate if sport.get('text_query') == query]
+        market_filter = build_market_filter(sport)
+        recorder.record('catalogue', catalogue_key(filter=market_filter, market_projection=CATALOGUE_PROJECTION),
+                        markets, t=start)
+        recorder.record('catalogue', catalogue_key(filter=market_filter),
+                        [{'marketId': m['marketId'], 'marketName': m['marketName'], 'totalMatched': 0.0}
+                         for m in markets], t=start)
+
+    for step in range(int(minutes * 60 / BOOK_INTERVAL) + 1):
+        now = start + step * BOOK_INTERVAL
+        for _, _, kick_off, market, runners in slate:
+            for r in runners:
+                if rng.random() < 0.3:
+                    r['prob'] = min(0.9, max(0.1, r['prob'] * rng.uniform(0.97, 1.03)))
+                r['volume'] += rng.uniform(0, 400)
+        books = [market_book(market, runners, kick_off, now) for _, _, kick_off, market, runners in slate]
+        for pos in range(0, len(books), 10):
+            recorder.record('market_book', None, books[pos:pos + 10], elapsed=rng.uniform(0.08, 0.25), t=now)
+
+        if step % (ODDS_INTERVAL // BOOK_INTERVAL) == 0:
+            for sport_key in sorted({sport['odds_api_key'] for sport in SPORTS_CONFIG}):
+                events = [odds_event(sport_key, market, runners, kick_off, now)
+                          for _, odds_key, kick_off, market, runners in slate if odds_key == sport_key]
+                used += 1
+                recorder.record('odds', f"/v4/sports/{sport_key}/odds",
+                                {'status': 200, 'headers': {'x-requests-used': str(used),
+                                                            'x-requests-remaining': str(20000 - used),
+                                                            'x-requests-last': '1'},
+                                 'body': events},
+                                elapsed=rng.uniform(0.2, 0.6), t=now)
+    recorder.close()
+    print(f"📼 Generated {path}: {len(slate)} markets, {minutes} min, {recorder.records} responses")
+    return path
+
+
+# ==========================================
+# REPLAY
+# ==========================================
+REPLAY_CONFIG = {
+    'SUPABASE_URL': 'http://127.0.0.1:54321', 'SUPABASE_KEY': 'replay', 'USERNAME': 'replay',
+    'PASSWORD': 'replay', 'APP_KEY': 'replay', 'CERTS_PATH': '/nonexistent', 'ODDS_API_KEY': 'replay',
+}
+
+
+def load_engine(workdir):
+    """
+    Imports fetch_universal with a throwaway config (no credentials are ever
+    read) from a scratch directory, so its quota / match cache / spool / Odds
+    cache files start cold and never touch the real ones.
+    """
+    sys.modules['config'] = types.SimpleNamespace(**REPLAY_CONFIG)
+    os.chdir(workdir)
+    import fetch_universal
+    import telegram_alerts
+    from subscriptions import Subscription, SubscriptionIndex
+    telegram_alerts.DB_FILE = os.path.join(workdir, 'alerts.db')
+    telegram_alerts.TELEGRAM_CHAT_ID = None      # no /status listener
+    telegram_alerts.subscriptions = SubscriptionIndex([Subscription(
+        'replay', min_edge=telegram_alerts.ALERT_EDGE_THRESHOLD, min_volume=telegram_alerts.ALERT_MIN_VOLUME,
+        max_spread=telegram_alerts.ALERT_MAX_SPREAD)])
+    return fetch_universal, telegram_alerts
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def digest(db, telegram):
+    """market_feed content (minus serial ids) + every alert text, for comparing runs."""
+    h = hashlib.sha1()
+    for row in sorted(db.dump('market_feed'), key=lambda r: (r.get('market_id'), r.get('runner_name'))):
+        h.update(json.dumps({k: v for k, v in row.items() if k != 'id'}, sort_keys=True).encode())
+    for _, chat_id, text in telegram.messages:
+        h.update(f"{chat_id}:{text}".encode())
+    return h.hexdigest()[:12]
+
+
+def run_replay(path, speed=0, cycles=None, latency=False, verbose=False, db_latency=0.0, max_rows=1000):
+    replay = TrafficReplay(path)
+    if replay.start is None:
+        print(f"❌ {path} has no recorded responses")
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix='replay_')
+    engine, alerts = load_engine(workdir)
+    if verbose:
+        logging.getLogger().setLevel(logging.INFO)
+
+    clock.install(clock.ReplayClock(replay.start, speed))
+    trading = ReplayTrading(replay, latency)
+    odds = ReplayOdds(replay)
+    db = LocalPostgrest(':memory:', latency=db_latency, max_rows=max_rows, seed=0)
+    telegram = LocalTelegram()
+
+    engine.trading = trading
+    engine.odds_http_get = odds
+    engine.supabase = engine.row_store.supabase = engine.write_behind.supabase = db
+    engine.last_keep_alive = clock.now()
+    alerts.sender = telegram
+    if speed:
+        engine.write_behind.start()
+    else:
+        engine.write_behind.inline = True
+
+    print(f"▶️  Replaying {path} ({replay.end - replay.start:.0f}s recorded) "
+          f"{'stepped' if not speed else f'at {speed:g}x'} in {workdir}")
+    cycle_times = []
+    started = time.time()
+    while clock.now() <= replay.end and (cycles is None or len(cycle_times) < cycles):
+        cycle_started = time.perf_counter()
+        engine.run_poll_cycle()
+        cycle_times.append(time.perf_counter() - cycle_started)
+        clock.sleep(engine.POLL_INTERVAL_SECONDS)
+    if speed:
+        engine.write_behind.stop()
+    else:
+        engine.write_behind.flush_inline()
+    wall = time.time() - started
+    virtual = clock.now() - replay.start
+
+    print(f"Cycles: {len(cycle_times)} | {virtual:.0f}s virtual in {wall:.2f}s real ({virtual / max(wall, 1e-9):.0f}x)")
+    print(f"Cycle latency: p50 {percentile(cycle_times, 0.5) * 1000:.1f}ms, "
+          f"p95 {percentile(cycle_times, 0.95) * 1000:.1f}ms, max {max(cycle_times, default=0) * 1000:.1f}ms")
+    print(f"Betfair: {trading.betting.calls} calls ({trading.betting.missing} unrecorded markets) | "
+          f"Odds API: {odds.calls} calls ({odds.missing} unrecorded)")
+    print(f"Supabase: {db.report()}")
+    print(f"Telegram: {len(telegram.messages)} alerts")
+    print(f"Digest: {digest(db, telegram)}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Betfair / Odds API traffic offline.")
+    parser.add_argument('recording', nargs='?')
+    parser.add_argument('--speed', type=float, default=0, help="virtual seconds per real second (0 = stepped)")
+    parser.add_argument('--cycles', type=int, help="stop after N polling cycles")
+    parser.add_argument('--latency', action='store_true', help="sleep the recorded listMarketBook latency")
+    parser.add_argument('--db-latency', type=float, default=0, help="injected Supabase latency per request (ms)")
+    parser.add_argument('--max-rows', type=int, default=1000, help="PostgREST db-max-rows cap on reads")
+    parser.add_argument('--generate', metavar='PATH', help="write a synthetic recording and exit")
+    parser.add_argument('--games', type=int, default=14, help="synthetic games per sport")
+    parser.add_argument('--minutes', type=int, default=40, help="synthetic recording length")
+    parser.add_argument('--verbose', action='store_true', help="engine logs at INFO")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_recording(args.generate, args.games, args.minutes)
+        sys.exit(0)
+    recording = os.path.abspath(args.recording) if args.recording else generate_recording(
+        os.path.join(tempfile.mkdtemp(prefix='recording_'), 'traffic.jsonl'), args.games, args.minutes)
+    sys.exit(run_replay(recording, args.speed, args.cycles, args.latency, args.verbose, args.db_latency / 1000.0,
+                        args.max_rows))
@@ -0,0 +1,151 @@
+import os
+import logging
+import threading
+import clock
+from feed_writer import FeedWriter, feed_key
+
+logger = logging.getLogger(__name__)
+
+# --- FLUSH SETTINGS ---
+FEED_FLUSH_SECONDS = float(os.getenv('FEED_FLUSH_SECONDS', '3'))
+FEED_BATCH_SIZE = 200
+
+
+class RowStore:
+    """
+    Authoritative in-process copy of market_feed, keyed by (market_id, runner_name).
+    fetch_betfair / the stream update exchange columns, run_spy updates bookmaker
+    columns; flush() is the only writer and sends each changed row once with both
+    column sets merged (on_conflict='market_id, runner_name'). Thread-safe, so the
+    flush can run on a writer thread (see write_behind.WriteBehind).
+    """
+
+    def __init__(self, supabase_client, writer=None, batch_size=FEED_BATCH_SIZE, flush_seconds=FEED_FLUSH_SECONDS,
+                 spool=None):
+        self.supabase = supabase_client
+        self.spool = spool   # write_spool.WriteSpool: failed batches go to disk instead of staying dirty
+        self.writer = writer or FeedWriter('row_store')
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rows = {}        # feed_key -> merged row
+        self.dirty = set()    # feed_keys updated since the last flush
+        self.changed = set()  # feed_keys whose content moved since the last take_changed()
+        self.last_flush = 0
+        self.lock = threading.RLock()
+
+    def update(self, row):
+        """Merges one producer's columns into the stored row."""
+        key = feed_key(row)
+        with self.lock:
+            current = self.rows.get(key)
+            merged = dict(current, **row) if current else dict(row)
+            merged.pop('id', None)  # spy rows carry the DB id; the natural key is the conflict target
+            if current is None or any(current.get(k) != v for k, v in merged.items() if k != 'last_updated'):
+                self.changed.add(key)
+            self.rows[key] = merged
+            self.dirty.add(key)
+
+    def update_many(self, rows):
+        with self.lock:
+            for row in rows:
+                self.update(row)
+
+    def get(self, key):
+        with self.lock:
+            return self.rows.get(key)
+
+    def all_rows(self):
+        with self.lock:
+            return list(self.rows.values())
+
+    def take_changed(self):
+        """Rows whose content moved since the last call (for in-process consumers like alerts), in store order."""
+        with self.lock:
+            rows = [row for k, row in self.rows.items() if k in self.changed] if self.changed else []
+            self.changed = set()
+            return rows
+
+    def pending(self):
+        with self.lock:
+            return len(self.dirty)
+
+    def prune(self, live):
+        with self.lock:
+            for key in [k for k, row in self.rows.items() if not live(row)]:
+                del self.rows[key]
+                self.dirty.discard(key)
+                self.changed.discard(key)
+            self.writer.prune(lambda row: feed_key(row) in self.rows)
+
+    def set_status(self, market_ids, status):
+        """Sets market_status on every stored row of these markets (so heartbeats can't undo a close)."""
+        market_ids = set(market_ids)
+        with self.lock:
+            for key, row in self.rows.items():
+                if row.get('market_id') in market_ids and row.get('market_status') != status:
+                    self.rows[key] = dict(row, market_status=status)
+                    self.dirty.add(key)
+                    self.changed.add(key)
+
+    def due(self):
+        return clock.now() - self.last_flush >= self.flush_seconds
+
+    def flush(self, update_time=None):
+        """Changed rows + due heartbeats -> Supabase in batches. Returns rows written.
+        Failed batches are spooled (or stay dirty without a spool)."""
+        update_time = update_time or clock.now_utc().isoformat()
+        with self.lock:
+            self.last_flush = clock.now()
+            pending_keys = self.dirty
+            self.dirty = set()
+            changed = self.writer.select([self.rows[k] for k in pending_keys if k in self.rows])
+            heartbeats = self.writer.heartbeat_rows(
+                update_time, live=lambda row: feed_key(row) in self.rows and feed_key(row) not in pending_keys
+            )
+            batches = self._batches(changed + heartbeats)
+
+        # Network I/O outside the lock; producers keep updating meanwhile
+        written = 0
+        for batch in batches:
+            try:
+                self.supabase.table('market_feed').upsert(batch, on_conflict='market_id, runner_name').execute()
+            except Exception as e:
+                logger.error(f"Database Error: {e}")
+                self._failed(batch)
+                continue
+
+            with self.lock:
+                self.writer.commit(batch)
+            if self.spool is not None:
+                self.spool.supersede('market_feed', batch, 'market_id, runner_name')
+            written += len(batch)
+
+        with self.lock:
+            if written:
+                logger.info(f"⚡ Synced {written} items in {len(batches)} batches.")
+            self.writer.report()
+        return written
+
+    def _failed(self, batch):
+        if self.spool is not None:
+            try:
+                # Committed as written: the spool now owns delivering this state
+                self.spool.append_upserts('market_feed', batch, 'market_id, runner_name')
+                with self.lock:
+                    self.writer.commit(batch)
+                return
+            except Exception as e:
+                logger.error(f"Spool Error: {e}")
+        with self.lock:
+            self.dirty.update(feed_key(row) for row in batch)
+
+    def _batches(self, rows):
+        # PostgREST bulk upserts need one column set per request, or missing columns become NULL
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        batches = []
+        for group in groups.values():
+            for pos in range(0, len(group), self.batch_size):
+                batches.append(group[pos:pos + self.batch_size])
+        return batches
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone, timedelta
+
+# Offline month of Odds API spend under QuotaPlanner: replays a fixture schedule
+# (a JSON file of {"sport_key", "start"} or a synthetic month) on a simulated
+# clock, one spy pass every 15s, and checks the plan never overspends.
+# Usage: python backend/simulate_quota.py [quota] [fixtures.json] [already_used]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from odds_quota import QuotaPlanner, next_reset, urgency
+from sports_config import SPORTS_CONFIG
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SPY_INTERVAL = 15
+INPLAY_WINDOW_SECONDS = 4 * 3600
+
+# ==========================================
+# FIXTURES
+# ==========================================
+# (weekdays, games per day, first start hour UTC); Monday = 0
+SYNTHETIC_SCHEDULE = {
+    'basketball': (range(7), 8, 0),
+    'americanfootball_nfl': ((0, 3, 6), 5, 17),
+    'americanfootball_ncaaf': ((5,), 20, 16),
+    'mma': ((5,), 12, 22),
+}
+
+def synthetic_fixtures(sport_keys, start, days, rng):
+    fixtures = {key: [] for key in sport_keys}
+    for key in sport_keys:
+        pattern = next((v for prefix, v in SYNTHETIC_SCHEDULE.items() if key.startswith(prefix)), (range(7), 4, 12))
+        weekdays, per_day, hour = pattern
+        for day in range(days + 2):
+            dt = start + timedelta(days=day)
+            if dt.weekday() not in weekdays:
+                continue
+            base = dt.replace(hour=hour, minute=0, second=0)
+            for _ in range(per_day):
+                fixtures[key].append((base + timedelta(minutes=30 * rng.randint(0, 8))).timestamp())
+    return {key: sorted(starts) for key, starts in fixtures.items()}
+
+def load_fixtures(path, sport_keys):
+    fixtures = {key: [] for key in sport_keys}
+    with open(path, 'r') as f:
+        for item in json.load(f):
+            start = datetime.fromisoformat(item['start'].replace('Z', '+00:00')).timestamp()
+            fixtures.setdefault(item['sport_key'], []).append(start)
+    return {key: sorted(starts) for key, starts in fixtures.items()}
+
+def demand(starts, now):
+    """Same shape as fetch_universal.spy_urgency: (seconds to nearest start, events within 24h)."""
+    live = bisect_left(starts, now - INPLAY_WINDOW_SECONDS) < bisect_right(starts, now)
+    nxt = bisect_right(starts, now)
+    imminent = bisect_left(starts, now + 86400) - nxt
+    if live:
+        return 0, imminent + 1
+    if nxt < len(starts):
+        return starts[nxt] - now, imminent
+    return 7200, 0  # rows still open with no schedule: fetch_universal's fallback
+
+# ==========================================
+# RUN
+# ==========================================
+def simulate(quota=20000, fixtures_path=None, already_used=0, seed=20):
+    sport_keys = sorted({s['odds_api_key'] for s in SPORTS_CONFIG})
+    period_start = next_reset(time.time()) - 1
+    period_start = next_reset(period_start - 32 * 86400)   # the reset before that: one full period
+    period_end = next_reset(period_start)
+    days = math.ceil((period_end - period_start) / 86400)
+
+    if fixtures_path:
+        fixtures = load_fixtures(fixtures_path, sport_keys)
+    else:
+        start_dt = datetime.fromtimestamp(period_start, timezone.utc)
+        fixtures = synthetic_fixtures(sport_keys, start_dt, days, random.Random(seed))
+
+    planner = QuotaPlanner(path=None, quota=quota)
+    now = period_start
+    planner.left(now)
+    planner.used = already_used
+
+    last_call = {key: -math.inf for key in sport_keys}
+    tiers = {}  # (preferred ttl, weight) -> [calls, sum of planned ttl, max planned ttl, passes, min planned ttl]
+    while now < period_end:
+        demands = {key: demand(fixtures.get(key, []), now) for key in sport_keys}
+        ttls = planner.plan(demands, now)
+        for key, ttl in ttls.items():
+            tier = urgency(demands[key][0])
+            stats = tiers.setdefault(tier, [0, 0.0, 0.0, 0, math.inf])
+            stats[3] += 1
+            stats[1] += min(ttl, period_end - now)
+            stats[2] = max(stats[2], min(ttl, period_end - now))
+            stats[4] = min(stats[4], ttl)
+            if now - last_call[key] >= ttl and planner.allow(key, now):
+                planner.record(key, now=now)
+                last_call[key] = now
+                stats[0] += 1
+        now += SPY_INTERVAL
+
+    print(f"🗓️  {days} days, {len(sport_keys)} sport keys, "
+          f"{sum(len(v) for v in fixtures.values())} fixtures, quota {quota} ({already_used} already used)")
+    for preferred, weight in sorted(tiers, key=lambda t: (t[0], -t[1])):
+        calls, ttl_sum, ttl_max, passes, ttl_min = tiers[preferred, weight]
+        print(f"   tier {preferred:>5}s x{weight:g}: {calls:6d} calls, planned TTL min {ttl_min:5.0f}s "
+              f"avg {ttl_sum / passes:7.0f}s max {ttl_max:7.0f}s")
+    print(f"   used {planner.used}/{quota}, reserve {planner.reserve}, left {planner.left(period_end - 1)}")
+    if planner.used > quota - planner.reserve:
+        print("❌ Planner overspent the monthly quota")
+        return 1
+    print("✅ Month completed within the quota")
+    return 0
+
+if __name__ == "__main__":
+    quota = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fixtures_path = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != '-' else None
+    already_used = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    sys.exit(simulate(quota, fixtures_path, already_used))
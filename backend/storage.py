@@ -0,0 +1,26 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- STORAGE BACKEND ---
+# supabase: the hosted project. local: local_postgrest.LocalPostgrest (SQLite) for
+# load tests; LOCAL_DB_PATH / LOCAL_DB_LATENCY_MS / LOCAL_DB_MAX_ROWS tune it.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'supabase')
+
+
+def create_storage(url=None, key=None, backend=STORAGE_BACKEND):
+    """
+    The client every stage writes through. Either backend answers
+    client.table(name) with the postgrest builder chain (select / insert /
+    upsert / update / delete, eq / neq / lt / gt / in_, order / limit, execute().data).
+    """
+    if backend == 'local':
+        from local_postgrest import LocalPostgrest
+        client = LocalPostgrest()
+        logger.warning(f"🧪 STORAGE_BACKEND=local: writing to {client.path}, not Supabase")
+        return client
+    if backend != 'supabase':
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    from supabase import create_client
+    return create_client(url, key)
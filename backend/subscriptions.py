@@ -0,0 +1,105 @@
+import os
+import json
+import logging
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+# --- SUBSCRIPTION SETTINGS ---
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE', 'subscriptions.json')
+ANY = '*'                           # bucket for subscriptions without a sport / bookmaker filter
+# Bookmaker -> market_feed price column (Ladbrokes still lives in the legacy price_bet365 column)
+BOOKMAKER_COLUMNS = {'paddypower': 'price_paddy', 'ladbrokes': 'price_bet365'}
+BOOKMAKER_LABELS = {'paddypower': 'PaddyPower', 'ladbrokes': 'Ladbrokes'}
+BOOKMAKERS = tuple(BOOKMAKER_COLUMNS)
+# Column labels earlier subscriptions.json files filtered on
+LEGACY_BOOKMAKER_NAMES = {'paddy': 'paddypower', 'bet365': 'ladbrokes'}
+
+
+def bookmaker_name(name):
+    name = str(name).strip().lower()
+    return LEGACY_BOOKMAKER_NAMES.get(name, name)
+
+
+class Subscription:
+    __slots__ = ('chat_id', 'sports', 'bookmakers', 'min_edge', 'min_volume', 'max_spread')
+
+    def __init__(self, chat_id, sports=None, bookmakers=None, min_edge=0.003, min_volume=200.0, max_spread=0.04):
+        self.chat_id = str(chat_id)
+        self.sports = frozenset(sports) if sports else None          # None = every sport
+        self.bookmakers = frozenset(bookmaker_name(b) for b in bookmakers) if bookmakers else None
+        self.min_edge = float(min_edge)
+        self.min_volume = float(min_volume)
+        self.max_spread = float(max_spread)
+
+    def accepts(self, sport, bookmaker, edge, volume, spread):
+        """Linear reference for SubscriptionIndex.match()."""
+        return ((self.sports is None or sport in self.sports)
+                and (self.bookmakers is None or bookmaker in self.bookmakers)
+                and edge >= self.min_edge and volume >= self.min_volume and not spread > self.max_spread)
+
+
+class SubscriptionIndex:
+    """
+    Subscriptions bucketed by (sport, bookmaker), with ANY buckets for
+    subscriptions that don't filter on one. Each bucket is sorted by min_edge,
+    so a candidate only visits the subscriptions whose edge threshold it clears
+    in the (at most four) buckets it can land in; volume and spread are checked
+    on that prefix.
+    """
+
+    def __init__(self, subscriptions):
+        self.subscriptions = list(subscriptions)
+        buckets = {}
+        for sub in self.subscriptions:
+            for sport in sub.sports or (ANY,):
+                for bookmaker in sub.bookmakers or (ANY,):
+                    buckets.setdefault((sport, bookmaker), []).append(sub)
+        self.buckets = {}
+        for key, subs in buckets.items():
+            subs.sort(key=lambda s: s.min_edge)
+            self.buckets[key] = ([s.min_edge for s in subs], subs)
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def match(self, sport, bookmaker, edge, volume, spread):
+        matched = []
+        for key in ((sport, bookmaker), (sport, ANY), (ANY, bookmaker), (ANY, ANY)):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            edges, subs = bucket
+            for sub in subs[:bisect_right(edges, edge)]:
+                if volume >= sub.min_volume and not spread > sub.max_spread:
+                    matched.append(sub)
+        return matched
+
+    def loosest(self):
+        """(min_edge, min_volume, max_spread) every subscription is at least as strict as (the scanner's gates)."""
+        if not self.subscriptions:
+            return None
+        return (min(s.min_edge for s in self.subscriptions),
+                min(s.min_volume for s in self.subscriptions),
+                max(s.max_spread for s in self.subscriptions))
+
+
+def load_subscriptions(path=SUBSCRIPTIONS_FILE, default_chat_id=None, **defaults):
+    """
+    Reads a JSON list of {"chat_id", "sports", "bookmakers", "min_edge",
+    "min_volume", "max_spread"}; missing fields take defaults. Without a file,
+    default_chat_id (TELEGRAM_CHAT_ID) is the only subscriber.
+    """
+    subs = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                for entry in json.load(f):
+                    subs.append(Subscription(**dict(defaults, **entry)))
+        except Exception as e:
+            logger.error(f"Subscriptions unreadable ({path}): {e}")
+            subs = []
+    if not subs and default_chat_id:
+        subs.append(Subscription(default_chat_id, **defaults))
+    logger.info(f"Loaded {len(subs)} alert subscriptions")
+    return SubscriptionIndex(subs)
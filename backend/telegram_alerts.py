@@ -1,9 +1,11 @@
 import os
-import time
-import sqlite3
-import requests
 import logging
-from datetime import datetime, timezone
+import clock
+from feed_reader import iter_feed_rows, ALERT_COLUMNS
+from alert_scanner import SteamerScanner
+from alert_history import AlertHistory, ALERT_HISTORY_RETENTION
+from telegram_delivery import TelegramSender, CommandListener, chunk_messages
+from subscriptions import load_subscriptions, BOOKMAKER_LABELS
 
 # --- CONFIGURATION ---
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -12,14 +14,24 @@ ALERT_EDGE_THRESHOLD = float(os.getenv("ALERT_EDGE_THRESHOLD", "0.003"))
 ALERT_COMMISSION = float(os.getenv("ALERT_COMMISSION", "0.02"))
 ALERT_MIN_VOLUME = float(os.getenv("ALERT_MIN_VOLUME", "200.0"))
 ALERT_COOLDOWN_SECONDS = int(os.getenv("ALERT_COOLDOWN_SECONDS", "600"))
+ALERT_DIGEST = os.getenv("ALERT_DIGEST", "0") == "1"  # one message per cycle instead of one per alert
 
 # NEW: STRICT STEAMER GATES
 ALERT_MIN_PRICE_ADVANTAGE = 0.02  # Bookie must be 2% higher than Lay
 ALERT_MAX_SPREAD = 0.04           # Exchange Spread must be < 4%
+ALERT_RESCAN_SECONDS = 60         # unchanged rows are re-checked this often (cooldown re-alerts)
 
 # Guard: Only run logic if this mode is active
 SCOPE_MODE = os.getenv("SCOPE_MODE", "NBA_PREMATCH_ML_STEAMERS")
 
+# Subscribers (subscriptions.json, else TELEGRAM_CHAT_ID alone); the global thresholds are their defaults
+subscriptions = load_subscriptions(default_chat_id=TELEGRAM_CHAT_ID, min_edge=ALERT_EDGE_THRESHOLD,
+                                   min_volume=ALERT_MIN_VOLUME, max_spread=ALERT_MAX_SPREAD)
+
+# The scanner gates at the loosest subscription; each hit is then routed per subscriber
+_min_edge, _min_volume, _max_spread = subscriptions.loosest() or (ALERT_EDGE_THRESHOLD, ALERT_MIN_VOLUME, ALERT_MAX_SPREAD)
+scanner = SteamerScanner(_min_volume, _max_spread, ALERT_MIN_PRICE_ADVANTAGE, ALERT_COMMISSION, _min_edge)
+
 # --- DATABASE PATH FIX ---
 # Force DB to be absolute so it doesn't get lost or hit permission errors
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -28,107 +40,62 @@ DB_FILE = os.path.join(BASE_DIR, "alerts.db")
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - ALERTS - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- SQLITE DEDUPE STORE ---
+# --- DEDUPE STORE ---
+# alert_history lives in memory; SQLite (one WAL connection) is only written once per cycle
+history = None
+
 def init_db():
+    global history
+    if history is not None:
+        return history
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS alert_history (
-                id TEXT PRIMARY KEY,
-                last_alert_time REAL,
-                last_edge REAL,
-                last_book_price REAL,
-                last_lay_price REAL
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        # Pruned ids must be ones should_alert would let through anyway (and /status counts 1h)
+        retention = max(ALERT_HISTORY_RETENTION, ALERT_COOLDOWN_SECONDS, 3600)
+        history = AlertHistory(DB_FILE, retention=retention)
+        logger.info(f"Loaded {len(history.entries)} alert ids from {DB_FILE}")
     except Exception as e:
         logger.error(f"CRITICAL: Cannot Create DB at {DB_FILE}. Error: {e}")
+    return history
 
 def get_last_alert(runner_key):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT * FROM alert_history WHERE id = ?", (runner_key,))
-        row = c.fetchone()
-        conn.close()
-        return row
-    except Exception as e:
-        logger.error(f"DB Read Error: {e}")
-        return None
+    entry = history.get(runner_key) if history is not None else None
+    return (runner_key,) + entry if entry else None
 
 def update_alert_history(runner_key, edge, book_price, lay_price):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        now = time.time()
-        c.execute('''
-            INSERT OR REPLACE INTO alert_history 
-            (id, last_alert_time, last_edge, last_book_price, last_lay_price)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (runner_key, now, edge, book_price, lay_price))
-        conn.commit()
-        conn.close()
-        # Log success so we know memory is working
-        logger.info(f"✅ Alert saved to memory: {runner_key}")
-    except Exception as e:
-        logger.error(f"❌ DB Write Failed! Alerts will duplicate. Error: {e}")
+    if history is not None:
+        history.record(runner_key, edge, book_price, lay_price)
 
 # --- TELEGRAM BOT UTILS ---
-def send_telegram_message(text):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        return False
-    
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = { "chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode": "HTML" }
-    try:
-        r = requests.post(url, json=payload, timeout=5)
-        return r.status_code == 200
-    except Exception as e:
-        logger.error(f"Telegram send failed: {e}")
-        return False
+# Sends (every subscriber) go through one worker thread; /status is answered by a long-polling listener thread
+sender = TelegramSender(TELEGRAM_BOT_TOKEN) if TELEGRAM_BOT_TOKEN and len(subscriptions) else None
+listener = None
 
-def check_bot_commands():
-    if not TELEGRAM_BOT_TOKEN: return
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getUpdates"
-    try:
-        r = requests.get(url, params={"offset": -1, "timeout": 1}, timeout=3)
-        data = r.json()
-        if not data.get("ok"): return
-
-        for result in data.get("result", []):
-            update_id = result.get("update_id")
-            msg = result.get("message", {})
-            text = msg.get("text", "")
-            chat_id = msg.get("chat", {}).get("id")
-            
-            if str(chat_id) != str(TELEGRAM_CHAT_ID): continue
-
-            if text.strip() == "/status":
-                send_status_report()
-                requests.get(url, params={"offset": update_id + 1})
-    except Exception:
-        pass 
+def start_workers():
+    global listener
+    if sender is None:
+        return
+    sender.start()
+    if listener is None and TELEGRAM_CHAT_ID:
+        listener = CommandListener(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, {"/status": send_status_report})
+        listener.start()
+
+def send_telegram_message(text, keys=(), on_sent=None, chat_id=None):
+    """Queues text for the sender thread; False if Telegram isn't configured or the queue is full."""
+    chat_id = chat_id or TELEGRAM_CHAT_ID
+    if sender is None or not chat_id:
+        return False
+    return sender.enqueue(chat_id, text, keys=keys, on_sent=on_sent)
 
 def send_status_report():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    try:
-        hour_ago = time.time() - 3600
-        c.execute("SELECT count(*) FROM alert_history WHERE last_alert_time > ?", (hour_ago,))
-        count = c.fetchone()[0]
-    except:
-        count = 0
-    conn.close()
+    hour_ago = clock.now() - 3600
+    count = history.count_since(hour_ago) if history is not None else 0
 
     msg = (
         f"<b>🤖 Independence Bot Status</b>\n"
         f"✅ Mode: {SCOPE_MODE}\n"
         f"📊 Alerts (1h): {count}\n"
         f"📂 DB Path: {DB_FILE}\n"
-        f"🕒 UTC: {datetime.now(timezone.utc).strftime('%H:%M:%S')}"
+        f"🕒 UTC: {clock.now_utc().strftime('%H:%M:%S')}"
     )
     send_telegram_message(msg)
 
@@ -146,80 +113,95 @@ def should_alert(runner_key, edge, book_price, lay_price):
     
     _, last_ts, last_edge, last_book, last_lay = last
     if edge >= (last_edge + 0.002): return True
-    if (time.time() - last_ts) > ALERT_COOLDOWN_SECONDS: return True
+    if (clock.now() - last_ts) > ALERT_COOLDOWN_SECONDS: return True
     if abs(book_price - last_book) >= 0.03 or abs(lay_price - last_lay) >= 0.03: return True
     return False
 
-def run_alert_cycle(supabase_client):
+def run_alert_cycle(supabase_client=None, rows=None):
+    """
+    rows: market_feed-shaped rows already in memory (the merged row store, or just
+    the rows that changed). Without rows, OPEN / not in-play rows are read from Supabase.
+    """
     init_db()
-    check_bot_commands()
+    start_workers()
 
-    try:
-        # Fetch OPEN, Not In Play markets
-        response = supabase_client.table("market_feed") \
-            .select("*") \
-            .eq("market_status", "OPEN") \
-            .eq("in_play", "false") \
-            .execute()
-        rows = response.data
-    except Exception as e:
-        logger.error(f"Supabase fetch failed: {e}")
-        return
+    if rows is None:
+        # Fetch OPEN, Not In Play markets (paged lazily, only the columns the gates use)
+        rows = iter_feed_rows(supabase_client, ALERT_COLUMNS,
+                              filters=[("eq", "market_status", "OPEN"), ("eq", "in_play", "false")])
 
-    alerts_sent = 0
+    queued = {}  # chat_id -> [(msg, alert_key, on_sent)]
 
-    for row in rows:
-        vol = row.get('volume')
-        if vol is None or vol < ALERT_MIN_VOLUME: continue
-
-        start_time_str = row.get('start_time')
-        if start_time_str:
-            try:
-                start_dt = datetime.fromisoformat(start_time_str.replace("Z", "+00:00"))
-                if datetime.now(timezone.utc) >= start_dt: continue 
-            except: pass 
-
-        p_paddy = float(row.get('price_paddy') or 0)
-        p_ladbrokes = float(row.get('price_bet365') or 0)
-        book_price = max(p_paddy, p_ladbrokes)
-        lay_price = float(row.get('lay_price') or 0)
-        back_price = float(row.get('back_price') or 0)
-
-        # --- STRICT STEAMER GATES ---
-        if back_price <= 1.01 or lay_price <= 1.01: continue
-            
-        spread_pct = (lay_price - back_price) / back_price
-        if spread_pct > ALERT_MAX_SPREAD: continue
-
-        price_diff_pct = (book_price - lay_price) / lay_price
-        if price_diff_pct < ALERT_MIN_PRICE_ADVANTAGE: continue
-        # -----------------------------
-
-        edge = calculate_edge(book_price, lay_price)
-        
-        if edge >= ALERT_EDGE_THRESHOLD:
+    try:
+        rows = rows if isinstance(rows, list) else list(rows)
+        # All gates + edge in one scan at the loosest subscription; only surviving
+        # rows reach routing/dedupe/send
+        for i, back_price, lay_price, spread_pct, books in scanner.scan(rows):
+            row = rows[i]
+            vol = row.get('volume')
+            start_time_str = row.get('start_time')
             m_id = row.get('market_id', 'uid')
             sel_id = row.get('selection_id', 'sid')
             runner_key = f"{m_id}_{sel_id}"
-            
-            if should_alert(runner_key, edge, book_price, lay_price):
-                runner_name = row.get('runner_name', 'Unknown')
-                bookie_name = "PaddyPower" if p_paddy >= p_ladbrokes else "Ladbrokes"
-                edge_pct = round(edge * 100, 2)
-                raw_diff = round(price_diff_pct * 100, 2)
-                
-                msg = (
-                    f"🔥 <b>NBA STEAMER: {runner_name}</b>\n\n"
-                    f"🚀 <b>Gap: +{raw_diff}%</b> (Edge {edge_pct}%)\n"
-                    f"🏦 {bookie_name}: <b>{book_price}</b>\n"
-                    f"🔄 Exchange: <b>{back_price} / {lay_price}</b>\n"
-                    f"💰 Vol: £{int(vol)}\n"
-                    f"⏰ {start_time_str}"
-                )
-                
-                if send_telegram_message(msg):
-                    update_alert_history(runner_key, edge, book_price, lay_price)
+            routed = set()  # chats already given this runner (at their best matching bookmaker)
+
+            # Best price first: a chat filtered to one bookmaker still gets that bookmaker's own price/edge
+            for bookmaker, book_price, edge, price_diff_pct in books:
+                msg = None
+                for sub in subscriptions.match(row.get('sport'), bookmaker, edge, vol, spread_pct):
+                    if sub.chat_id in routed: continue
+                    routed.add(sub.chat_id)
+
+                    # The default chat keeps the bare runner key its alerts.db history was written under
+                    alert_key = runner_key if sub.chat_id == str(TELEGRAM_CHAT_ID) else f"{runner_key}:{sub.chat_id}"
+                    if sender is not None and sender.pending(alert_key): continue  # previous alert still being delivered
+                    if not should_alert(alert_key, edge, book_price, lay_price): continue
+
+                    if msg is None:
+                        runner_name = row.get('runner_name', 'Unknown')
+                        bookie_name = BOOKMAKER_LABELS[bookmaker]
+                        edge_pct = round(edge * 100, 2)
+                        raw_diff = round(price_diff_pct * 100, 2)
+
+                        msg = (
+                            f"🔥 <b>NBA STEAMER: {runner_name}</b>\n\n"
+                            f"🚀 <b>Gap: +{raw_diff}%</b> (Edge {edge_pct}%)\n"
+                            f"🏦 {bookie_name}: <b>{book_price}</b>\n"
+                            f"🔄 Exchange: <b>{back_price} / {lay_price}</b>\n"
+                            f"💰 Vol: £{int(vol)}\n"
+                            f"⏰ {start_time_str}"
+                        )
+
+                    # History is written only once Telegram accepts the message (retried next cycle otherwise)
+                    record = lambda k=alert_key, e=edge, b=book_price, l=lay_price: update_alert_history(k, e, b, l)
+                    queued.setdefault(sub.chat_id, []).append((msg, alert_key, record))
+    except Exception as e:
+        # e.g. a page fetch or a malformed price failed the scan; alerts found so far are still queued
+        logger.error(f"Alert scan failed: {e}")
+
+    alerts_sent = 0
+    for chat_id, chat_alerts in queued.items():
+        if ALERT_DIGEST and len(chat_alerts) > 1:
+            for text, indices in chunk_messages([q[0] for q in chat_alerts]):
+                parts = [chat_alerts[i] for i in indices]
+
+                def on_sent(parts=parts):
+                    for _, _, record in parts:
+                        record()
+
+                if send_telegram_message(text, keys=[key for _, key, _ in parts], on_sent=on_sent, chat_id=chat_id):
+                    alerts_sent += len(parts)
+        else:
+            for msg, alert_key, record in chat_alerts:
+                if send_telegram_message(msg, keys=[alert_key], on_sent=record, chat_id=chat_id):
                     alerts_sent += 1
 
+    if history is not None:
+        history.flush()
+        history.prune()
+
+    if sender is not None:
+        sender.report()
+
     if alerts_sent > 0:
-        logger.info(f"Sent {alerts_sent} alerts.")
\ No newline at end of file
+        logger.info(f"Queued {alerts_sent} alerts.")
\ No newline at end of file
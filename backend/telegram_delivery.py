@@ -0,0 +1,278 @@
+import os
+import time
+import heapq
+import logging
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# --- DELIVERY SETTINGS ---
+TELEGRAM_API = "https://api.telegram.org"
+TELEGRAM_CHAT_INTERVAL = float(os.getenv('TELEGRAM_CHAT_INTERVAL', '1.0'))  # Telegram: ~1 msg/s per chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))   # bot-wide msgs/s (Telegram caps ~30)
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '4'))
+TELEGRAM_QUEUE_MAX = int(os.getenv('TELEGRAM_QUEUE_MAX', '5000'))
+TELEGRAM_MAX_LENGTH = 4096        # sendMessage text limit (digests are split under it)
+LONG_POLL_SECONDS = 25
+
+
+def make_session():
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    return session
+
+
+def chunk_messages(texts, limit=TELEGRAM_MAX_LENGTH, separator="\n\n"):
+    """Joins texts into as few messages as fit under limit. Returns [(text, [indices])]."""
+    chunks = []
+    for i, text in enumerate(texts):
+        if chunks and len(chunks[-1][0]) + len(separator) + len(text) <= limit:
+            chunks[-1] = (chunks[-1][0] + separator + text, chunks[-1][1] + [i])
+        else:
+            chunks.append((text, [i]))
+    return chunks
+
+
+class TelegramSender:
+    """
+    Sender thread for sendMessage, shared by every subscriber. The engine
+    enqueues and moves on; the worker keeps one queue per chat and serves chats
+    round-robin as they come due, so one busy chat's per-chat spacing never
+    holds up the others, while the global rate stays under Telegram's bot limit.
+    Delivery is in order per chat over one keep-alive session. A 429 or a
+    network / 5xx error leaves the message at the head of its chat's queue and
+    holds only that chat (retry_after, else exponential backoff); the worker
+    goes back to serving the other chats meanwhile. keys mark what is in
+    flight so a cycle doesn't queue the same alert twice; on_sent runs on the
+    worker thread after a successful send.
+    """
+
+    def __init__(self, token, chat_interval=TELEGRAM_CHAT_INTERVAL, global_rate=TELEGRAM_GLOBAL_RATE,
+                 max_retries=TELEGRAM_MAX_RETRIES, max_queue=TELEGRAM_QUEUE_MAX):
+        self.token = token
+        self.chat_interval = chat_interval
+        self.global_interval = 1.0 / global_rate
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self.session = make_session()
+        self.chats = {}              # chat_id -> deque of (text, keys, on_sent, attempt, backoff);
+                                     # present while scheduled or sending
+        self.ready = []              # (due ts, seq, chat_id) min-heap of chats with queued messages
+        self.seq = 0
+        self.queued = 0
+        self.in_flight = set()       # keys queued or being sent
+        self.last_sent = {}          # chat_id -> ts of last sendMessage
+        self.hold_until = {}         # chat_id -> ts before which a retry must not go out
+        self.last_any = 0
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        # Metrics (reset after each report)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    # --- PRODUCER SIDE ---
+    def enqueue(self, chat_id, text, keys=(), on_sent=None):
+        """Returns False if the queue is full (the alert is retried on a later cycle)."""
+        with self.cond:
+            if self.queued >= self.max_queue:
+                self.dropped += 1
+                return False
+            if chat_id not in self.chats:
+                self.chats[chat_id] = deque()
+                self._schedule(chat_id)
+            self.chats[chat_id].append((text, tuple(keys), on_sent, 0, 1.0))
+            self.queued += 1
+            self.in_flight.update(keys)
+            self.cond.notify_all()
+            return True
+
+    def pending(self, key):
+        return key in self.in_flight
+
+    def depth(self):
+        with self.cond:
+            return self.queued
+
+    def _schedule(self, chat_id):
+        # Caller holds self.cond
+        self.seq += 1
+        due = max(self.last_sent.get(chat_id, 0) + self.chat_interval, self.hold_until.pop(chat_id, 0))
+        heapq.heappush(self.ready, (due, self.seq, chat_id))
+
+    # --- WORKER SIDE ---
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='telegram-sender', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=30):
+        """Stops the thread once everything queued has been attempted."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _next(self):
+        # Caller holds self.cond. Blocks until a chat is due; None once stopped and drained.
+        while True:
+            if not self.ready:
+                if not self.running:
+                    return None
+                self.cond.wait(timeout=1.0)
+                continue
+            due, _, chat_id = self.ready[0]
+            wait = max(due, self.last_any + self.global_interval) - time.time()
+            if wait > 0:
+                self.cond.wait(timeout=wait)
+                continue
+            heapq.heappop(self.ready)
+            self.queued -= 1
+            return chat_id, self.chats[chat_id].popleft()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                item = self._next()
+            if item is None:
+                return
+            chat_id, (text, keys, on_sent, attempt, backoff) = item
+
+            ok, retry_in = self._attempt(chat_id, text, attempt, backoff)
+            if retry_in is not None:
+                if attempt < self.max_retries:
+                    with self.cond:
+                        # Back at the head of its own chat; the other chats keep being served meanwhile
+                        self.chats[chat_id].appendleft((text, keys, on_sent, attempt + 1, min(backoff * 2, 30.0)))
+                        self.queued += 1
+                        self.hold_until[chat_id] = time.time() + retry_in
+                        self._schedule(chat_id)
+                    continue
+                logger.error(f"Telegram send gave up after {self.max_retries + 1} attempts")
+
+            if ok and on_sent is not None:
+                try:
+                    on_sent()
+                except Exception as e:
+                    logger.error(f"Telegram on_sent failed: {e}")
+
+            with self.cond:
+                self.in_flight.difference_update(keys)
+                if self.chats[chat_id]:
+                    self._schedule(chat_id)
+                else:
+                    del self.chats[chat_id]
+                if ok:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+
+    def _send(self, chat_id, payload):
+        r = self.session.post(f"{TELEGRAM_API}/bot{self.token}/sendMessage", json=payload, timeout=5)
+        self.last_sent[chat_id] = self.last_any = time.time()
+        return r
+
+    def _attempt(self, chat_id, text, attempt, backoff):
+        """One sendMessage. Returns (ok, retry_in): seconds to hold the chat before a retry, None when done."""
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        try:
+            r = self._send(chat_id, payload)
+            if r.status_code == 200:
+                return True, None
+            if r.status_code == 429:
+                try:
+                    retry_after = float(r.json().get("parameters", {}).get("retry_after", backoff))
+                except ValueError:
+                    retry_after = backoff
+                logger.warning(f"Telegram rate limited chat {chat_id}: retrying in {retry_after}s")
+                return False, retry_after
+            if r.status_code < 500:
+                logger.error(f"Telegram send rejected ({r.status_code}): {r.text[:200]}")
+                return False, None
+            logger.warning(f"Telegram send failed ({r.status_code}), attempt {attempt + 1}")
+        except Exception as e:
+            logger.warning(f"Telegram send failed: {e}, attempt {attempt + 1}")
+        return False, backoff
+
+    def report(self):
+        with self.cond:
+            if self.sent or self.failed or self.dropped:
+                logger.info(f"📨 Telegram: {self.sent} sent, {self.failed} failed, {self.dropped} dropped, "
+                            f"depth {self.queued} across {len(self.chats)} chats")
+            self.sent = 0
+            self.failed = 0
+            self.dropped = 0
+
+
+class CommandListener:
+    """
+    Long-polls getUpdates on its own thread and runs handlers[command] for
+    messages from chat_id. Commands sent while the process was down are skipped.
+    """
+
+    def __init__(self, token, chat_id, handlers, poll_seconds=LONG_POLL_SECONDS):
+        self.token = token
+        self.chat_id = str(chat_id)
+        self.handlers = handlers     # '/status' -> callable()
+        self.poll_seconds = poll_seconds
+        self.session = make_session()
+        self.offset = None
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='telegram-commands', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _get_updates(self, offset, timeout):
+        url = f"{TELEGRAM_API}/bot{self.token}/getUpdates"
+        r = self.session.get(url, params={"offset": offset, "timeout": timeout}, timeout=timeout + 10)
+        data = r.json()
+        if not data.get("ok"):
+            raise RuntimeError(data.get("description", "getUpdates not ok"))
+        return data.get("result", [])
+
+    def _run(self):
+        backoff = 1.0
+        while self.running:
+            try:
+                if self.offset is None:
+                    # Skip the backlog: acknowledge up to the latest update without handling it
+                    latest = self._get_updates(-1, 0)
+                    self.offset = latest[-1]["update_id"] + 1 if latest else 0
+                    continue
+                for update in self._get_updates(self.offset, self.poll_seconds):
+                    self.offset = update["update_id"] + 1
+                    self._handle(update)
+                backoff = 1.0
+            except Exception as e:
+                logger.warning(f"Telegram command poll failed: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    def _handle(self, update):
+        msg = update.get("message", {})
+        if str(msg.get("chat", {}).get("id")) != self.chat_id:
+            return
+        handler = self.handlers.get(msg.get("text", "").strip())
+        if handler is None:
+            return
+        try:
+            handler()
+        except Exception as e:
+            logger.error(f"Telegram command failed: {e}")
@@ -0,0 +1,256 @@
+import json
+import time
+import logging
+import threading
+from bisect import bisect_right
+from urllib.parse import urlsplit
+
+import clock
+from betfairlightweight.resources.bettingresources import MarketBook, MarketCatalogue
+
+logger = logging.getLogger(__name__)
+
+# --- RECORDED HEADERS ---
+# Odds API credit headers (odds_quota reads them on replay too)
+RECORDED_HEADERS = ('x-requests-used', 'x-requests-remaining', 'x-requests-last')
+
+
+def raw(resource):
+    """The JSON betfairlightweight built a resource from (lightweight responses already are)."""
+    return getattr(resource, '_data', resource)
+
+
+def catalogue_key(filter=None, market_projection=None, **kwargs):
+    """
+    A listMarketCatalogue request minus its moving start-time window: the same
+    config asks the same question every refresh. Projected and id-only listings
+    are kept apart.
+    """
+    market_filter = {k: v for k, v in (filter or {}).items() if k != 'marketStartTime'}
+    return json.dumps({'filter': market_filter, 'projection': bool(market_projection)}, sort_keys=True)
+
+
+def odds_key(url):
+    """Odds API path (the api_key travels in params and is never recorded)."""
+    return urlsplit(url).path
+
+
+# ==========================================
+# RECORDING
+# ==========================================
+class TrafficRecorder:
+    """
+    Appends one JSON line per upstream response: {"t": clock time, "kind":
+    catalogue | market_book | odds, "key", "elapsed", "response"}. Book workers
+    record concurrently, so writes are serialised.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+        self.records = 0
+
+    def record(self, kind, key, response, elapsed=0.0, t=None):
+        line = json.dumps({'t': t or clock.now(), 'kind': kind, 'key': key, 'elapsed': round(elapsed, 4),
+                           'response': response})
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class RecordingBetting:
+    """Wraps trading.betting: catalogue and book responses are recorded, everything else passes through."""
+
+    def __init__(self, betting, recorder):
+        self.betting = betting
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self.betting, name)
+
+    def list_market_catalogue(self, **kwargs):
+        started = time.time()
+        markets = self.betting.list_market_catalogue(**kwargs)
+        self.recorder.record('catalogue', catalogue_key(**kwargs), [raw(m) for m in markets],
+                             time.time() - started)
+        return markets
+
+    def list_market_book(self, **kwargs):
+        started = time.time()
+        books = self.betting.list_market_book(**kwargs)
+        self.recorder.record('market_book', None, [raw(b) for b in books], time.time() - started)
+        return books
+
+
+def recording_get(get, recorder):
+    """requests.get for Odds API calls, recording status, credit headers and body."""
+    def recorded(url, params=None, **kwargs):
+        started = time.time()
+        response = get(url, params=params, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        headers = {h: response.headers[h] for h in RECORDED_HEADERS if h in response.headers}
+        recorder.record('odds', odds_key(url), {'status': response.status_code, 'headers': headers, 'body': body},
+                        time.time() - started)
+        return response
+    return recorded
+
+
+# ==========================================
+# REPLAY
+# ==========================================
+class Timeline:
+    """(t, value) pairs per key; at() is the latest at or before t, else the first one recorded."""
+
+    def __init__(self):
+        self.times = {}
+        self.values = {}
+
+    def add(self, key, t, value):
+        self.times.setdefault(key, []).append(t)
+        self.values.setdefault(key, []).append(value)
+
+    def __contains__(self, key):
+        return key in self.times
+
+    def __len__(self):
+        return sum(len(v) for v in self.values.values())
+
+    def at(self, key, t):
+        times = self.times.get(key)
+        if not times:
+            return None
+        return self.values[key][max(0, bisect_right(times, t) - 1)]
+
+
+class TrafficReplay:
+    """A recording loaded into timelines: catalogue listings per request, books per market, Odds API per path."""
+
+    def __init__(self, path):
+        self.path = path
+        self.catalogues = Timeline()     # catalogue_key -> [market catalogue dicts]
+        self.markets = Timeline()        # market_id -> catalogue dict (projected listings only)
+        self.books = Timeline()          # market_id -> (market book dict, elapsed)
+        self.odds = Timeline()           # Odds API path -> response dict
+        self.start = self.end = None
+
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+        records.sort(key=lambda r: r['t'])
+
+        for r in records:
+            t = r['t']
+            self.start = t if self.start is None else self.start
+            self.end = t
+            if r['kind'] == 'catalogue':
+                self.catalogues.add(r['key'], t, r['response'])
+                if json.loads(r['key'])['projection']:
+                    for market in r['response']:
+                        self.markets.add(market['marketId'], t, market)
+            elif r['kind'] == 'market_book':
+                for book in r['response']:
+                    self.books.add(book['marketId'], t, (book, r.get('elapsed', 0.0)))
+            elif r['kind'] == 'odds':
+                self.odds.add(r['key'], t, r['response'])
+        logger.info(f"📼 {path}: {len(records)} responses, {(self.end or 0) - (self.start or 0):.0f}s recorded")
+
+
+class ReplayBetting:
+    """
+    trading.betting answered from a TrafficReplay at the current clock time.
+    Id lookups are served from every projected listing seen, so discovery
+    batches split differently from the recording still resolve. With latency,
+    book calls sleep (real time) for what the recorded call took.
+    """
+
+    def __init__(self, replay, latency=False):
+        self.replay = replay
+        self.latency = latency
+        self.calls = 0
+        self.missing = 0
+        self.lock = threading.Lock()
+
+    def list_market_catalogue(self, filter=None, **kwargs):
+        now = clock.now()
+        with self.lock:
+            self.calls += 1
+        market_ids = (filter or {}).get('marketIds')
+        if market_ids:
+            found = [self.replay.markets.at(m_id, now) for m_id in market_ids]
+            return [MarketCatalogue(**m) for m in found if m is not None]
+        listing = self.replay.catalogues.at(catalogue_key(filter=filter, **kwargs), now)
+        return [MarketCatalogue(**m) for m in listing or []]
+
+    def list_market_book(self, market_ids=None, **kwargs):
+        now = clock.now()
+        books = []
+        elapsed = 0.0
+        for m_id in market_ids or []:
+            entry = self.replay.books.at(m_id, now)
+            if entry is None:
+                with self.lock:
+                    self.missing += 1
+                continue
+            books.append(MarketBook(**entry[0]))
+            elapsed = max(elapsed, entry[1])
+        with self.lock:
+            self.calls += 1
+        if self.latency and elapsed:
+            time.sleep(elapsed)
+        return books
+
+
+class ReplayTrading:
+    """Stands in for betfairlightweight.APIClient: already logged in, betting replayed."""
+
+    def __init__(self, replay, latency=False):
+        self.betting = ReplayBetting(replay, latency)
+        self.session_token = 'replay'
+
+    def login(self):
+        return None
+
+    def keep_alive(self):
+        return None
+
+
+class ReplayResponse:
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = dict(headers)
+        self.body = body
+        self.text = body if isinstance(body, str) else json.dumps(body)
+        self.content = self.text.encode('utf-8')
+
+    def json(self):
+        if isinstance(self.body, str):
+            raise ValueError("Response body is not JSON")
+        return self.body
+
+
+class ReplayOdds:
+    """requests.get for Odds API URLs answered from a TrafficReplay; unrecorded paths get the API's 404 shape."""
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.calls = 0
+        self.missing = 0
+
+    def __call__(self, url, params=None, **kwargs):
+        self.calls += 1
+        response = self.replay.odds.at(odds_key(url), clock.now())
+        if response is None:
+            self.missing += 1
+            return ReplayResponse(404, {}, {'message': f'Not recorded: {odds_key(url)}'})
+        return ReplayResponse(response['status'], response.get('headers', {}), response['body'])
@@ -0,0 +1,184 @@
+import os
+import time
+import logging
+import threading
+import clock
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# --- QUEUE SETTINGS ---
+# Pending market_feed rows + queued snapshot rows before producers are made to wait
+WRITE_QUEUE_MAX = int(os.getenv('WRITE_QUEUE_MAX', '5000'))
+
+
+class WriteBehind:
+    """
+    Dedicated writer thread between the producers (fetch_betfair, the stream,
+    run_spy, snapshots) and Supabase, so a slow PostgREST never delays the next
+    Betfair poll. market_feed rows coalesce per row in the RowStore (only the
+    latest state is sent); snapshot inserts and prunes queue in order. Producers
+    only block when the queue is full.
+    """
+
+    def __init__(self, supabase_client, row_store, max_pending=WRITE_QUEUE_MAX, spool=None):
+        self.supabase = supabase_client
+        self.store = row_store
+        self.spool = spool          # write_spool.WriteSpool for failed inserts + rate-limited replay
+        self.max_pending = max_pending
+        self.ops = deque()          # ('insert', table, rows) / ('delete_lt', table, column, value) /
+                                    # ('update_in', table, values, column, ids)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.wake = False
+        self.inline = False         # replay: kick() writes on the caller's thread (no writer thread)
+
+        # Metrics (reset after each report)
+        self.coalesced = 0          # row updates absorbed by a row already pending
+        self.blocked_seconds = 0.0  # producer time spent waiting on a full queue
+        self.max_depth = 0
+        self.flush_latency = 0.0    # last writer pass, seconds
+
+    # --- PRODUCER SIDE ---
+    def depth(self):
+        return self.store.pending() + sum(len(op[2]) for op in self.ops if op[0] == 'insert')
+
+    def _wait_for_room(self):
+        # Caller holds self.cond
+        if not self.running or self.depth() < self.max_pending:
+            return
+        started = time.time()
+        while self.running and self.depth() >= self.max_pending:
+            self.wake = True
+            self.cond.notify_all()
+            self.cond.wait(timeout=1.0)
+        self.blocked_seconds += time.time() - started
+
+    def update_many(self, rows):
+        """market_feed columns -> RowStore (flushed on the writer's cadence)."""
+        rows = list(rows)
+        with self.cond:
+            self._wait_for_room()
+            before = self.store.pending()
+            self.store.update_many(rows)
+            self.coalesced += len(rows) - (self.store.pending() - before)
+            self.max_depth = max(self.max_depth, self.depth())
+
+    def insert(self, table, rows):
+        with self.cond:
+            self._wait_for_room()
+            self.ops.append(('insert', table, rows))
+            self.max_depth = max(self.max_depth, self.depth())
+
+    def delete_older(self, table, column, value):
+        with self.cond:
+            self.ops.append(('delete_lt', table, column, value))
+
+    def update_in(self, table, values, column, ids):
+        """One batched UPDATE ... WHERE column IN (ids)."""
+        with self.cond:
+            self.ops.append(('update_in', table, values, column, list(ids)))
+
+    def kick(self):
+        """Flush now instead of waiting for the cadence."""
+        if self.inline:
+            self.flush_inline()
+            return
+        with self.cond:
+            self.wake = True
+            self.cond.notify_all()
+
+    # --- WRITER SIDE ---
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=30):
+        """Stops the thread after a final pass over everything queued."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def flush_inline(self):
+        """One writer pass on the caller's thread, so a stepped replay sees the same DB state every run."""
+        with self.cond:
+            ops = list(self.ops)
+            self.ops.clear()
+        self._write(ops)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.wake and not self.store.due():
+                    # The cadence is on the engine clock (N x faster in a replay), so re-check at least twice a second
+                    remaining = self.store.last_flush + self.store.flush_seconds - clock.now()
+                    self.cond.wait(timeout=max(0.05, min(remaining, 0.5)))
+                self.wake = False
+                ops = list(self.ops)
+                self.ops.clear()
+                stopping = not self.running
+
+            try:
+                self._write(ops)
+            except Exception as e:
+                logger.error(f"Write-behind error: {e}")
+
+            if stopping:
+                return
+
+    def _write(self, ops):
+        started = time.time()
+        written = self.store.flush()
+        for op in ops:
+            written += self._apply(op)
+        latency = time.time() - started
+
+        # Outage backlog goes after live writes, a few requests per pass
+        if self.spool is not None:
+            written += self.spool.replay(self.supabase)
+
+        with self.cond:
+            self.flush_latency = latency
+            self.cond.notify_all()  # release producers waiting on a full queue
+            if written:
+                self.report()
+
+    def _apply(self, op):
+        try:
+            if op[0] == 'insert':
+                return self._insert(*op[1:])
+            if op[0] == 'update_in':
+                _, table, values, column, ids = op
+                self.supabase.table(table).update(values).in_(column, ids).execute()
+                return len(ids)
+            _, table, column, value = op
+            self.supabase.table(table).delete().lt(column, value).execute()
+        except Exception as e:
+            logger.error(f"Write Error ({op[0]} {op[1]}): {e}")
+        return 0
+
+    def _insert(self, table, rows):
+        written = 0
+        for i in range(0, len(rows), 100):
+            chunk = rows[i:i+100]
+            try:
+                self.supabase.table(table).insert(chunk).execute()
+                written += len(chunk)
+            except Exception as e:
+                if self.spool is None:
+                    raise
+                logger.error(f"Snapshot Error: {e}")
+                self.spool.append_insert(table, chunk)
+        return written
+
+    def report(self):
+        # Caller holds self.cond
+        logger.info(f"🧵 Write-behind: depth {self.depth()} (max {self.max_depth}), flush {self.flush_latency:.2f}s, "
+                    f"{self.coalesced} updates coalesced, producers blocked {self.blocked_seconds:.1f}s")
+        self.coalesced = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
@@ -0,0 +1,124 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# --- SPOOL SETTINGS ---
+SPOOL_FILE = os.getenv('SPOOL_FILE', 'write_spool.db')
+SPOOL_REPLAY_REQUESTS = int(os.getenv('SPOOL_REPLAY_REQUESTS', '2'))  # per writer pass, after live writes
+SPOOL_REPLAY_SCAN = 1000
+SPOOL_BATCH_SIZE = 200
+
+
+class WriteSpool:
+    """
+    Append-only SQLite (WAL) spool for Supabase writes that failed while it was
+    unreachable. market_feed rows coalesce to the latest state per row (and are
+    dropped once a live write supersedes them); snapshot inserts are all kept.
+    replay() sends the oldest entries first, a few requests per call.
+    """
+
+    def __init__(self, path=SPOOL_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS spool (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,          -- 'upsert' (one row) / 'insert' (one batch)
+            table_name TEXT NOT NULL,
+            on_conflict TEXT,
+            row_key TEXT,                -- upserts only: coalescing key
+            payload TEXT NOT NULL
+        )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS spool_row_key ON spool (table_name, row_key)')
+        self.conn.commit()
+        self.pending = self.conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+        if self.pending:
+            logger.warning(f"💾 Write spool has {self.pending} entries from a previous run")
+
+    @staticmethod
+    def row_key(row, on_conflict):
+        return json.dumps([row.get(col.strip()) for col in on_conflict.split(',')])
+
+    def append_upserts(self, table, rows, on_conflict):
+        with self.lock, self.conn:
+            for row in rows:
+                key = self.row_key(row, on_conflict)
+                # Coalesce: only the latest state of each row is kept (and moves to the back)
+                self.pending -= self.conn.execute(
+                    'DELETE FROM spool WHERE table_name = ? AND row_key = ?', (table, key)).rowcount
+                self.conn.execute(
+                    'INSERT INTO spool (kind, table_name, on_conflict, row_key, payload) VALUES (?, ?, ?, ?, ?)',
+                    ('upsert', table, on_conflict, key, json.dumps(row)))
+                self.pending += 1
+        logger.warning(f"💾 Spooled {len(rows)} {table} rows ({self.pending} pending)")
+
+    def append_insert(self, table, rows):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO spool (kind, table_name, payload) VALUES (?, ?, ?)',
+                ('insert', table, json.dumps(rows)))
+            self.pending += 1
+        logger.warning(f"💾 Spooled {len(rows)} {table} rows ({self.pending} pending)")
+
+    def supersede(self, table, rows, on_conflict):
+        """A live write landed for these rows; their spooled states are now stale."""
+        if not self.pending:
+            return
+        with self.lock, self.conn:
+            for row in rows:
+                self.pending -= self.conn.execute(
+                    'DELETE FROM spool WHERE table_name = ? AND row_key = ?',
+                    (table, self.row_key(row, on_conflict))).rowcount
+
+    def _requests(self):
+        """Oldest entries grouped into requests, in spool order."""
+        entries = self.conn.execute(
+            'SELECT seq, kind, table_name, on_conflict, payload FROM spool ORDER BY seq LIMIT ?',
+            (SPOOL_REPLAY_SCAN,)).fetchall()
+        requests = []
+        for seq, kind, table, on_conflict, payload in entries:
+            data = json.loads(payload)
+            if kind == 'insert':
+                requests.append(('insert', table, None, data, [seq]))
+                continue
+            last = requests[-1] if requests else None
+            # Consecutive upserts share a request when table, conflict target and columns match
+            if (last and last[0] == 'upsert' and last[1] == table and last[2] == on_conflict
+                    and len(last[3]) < SPOOL_BATCH_SIZE and sorted(last[3][0]) == sorted(data)):
+                last[3].append(data)
+                last[4].append(seq)
+            else:
+                requests.append(('upsert', table, on_conflict, [data], [seq]))
+        return requests
+
+    def replay(self, supabase_client, max_requests=SPOOL_REPLAY_REQUESTS):
+        """Sends up to max_requests of the oldest entries. Stops at the first failure to keep order."""
+        if not self.pending:
+            return 0
+        with self.lock:
+            requests = self._requests()[:max_requests]
+
+        replayed = 0
+        for kind, table, on_conflict, rows, seqs in requests:
+            try:
+                if kind == 'upsert':
+                    supabase_client.table(table).upsert(rows, on_conflict=on_conflict).execute()
+                else:
+                    supabase_client.table(table).insert(rows).execute()
+            except Exception as e:
+                logger.error(f"Spool replay failed ({self.pending} pending): {e}")
+                break
+            with self.lock, self.conn:
+                self.pending -= self.conn.executemany(
+                    'DELETE FROM spool WHERE seq = ?', [(seq,) for seq in seqs]).rowcount
+            replayed += len(rows)
+
+        if replayed:
+            logger.info(f"♻️  Replayed {replayed} spooled rows ({self.pending} pending)")
+        return replayed